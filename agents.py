@@ -1,283 +1,579 @@
+import contextlib
+import contextvars
+import string
 import warnings
 warnings.filterwarnings('ignore')
-import google.generativeai as genai
-import os
 from dotenv import load_dotenv
+from cache import PrefixLedger, cache_from_env, make_key
+from clients import registry
+from context import estimate_tokens
+import deadlines
+import hedging
+import instrumentation
+from bullets import MAX_BULLETS, MIN_BULLETS, MissingBulletsError, parse_bullets, parse_stats
+import ratelimit
+import routing
+from singleflight import flights as shared_flights
 
 # Load environment variables from .env file
 load_dotenv()
 
 
 
+# Configure the model for concise analysis
+GENERATION_CONFIG = {
+    'temperature': 0.7,
+    'top_p': 0.9,
+    'top_k': 40,
+    'max_output_tokens': 1024,  # Limit output length
+    'candidate_count': 1,
+}
+EXPECTED_OUTPUT_TOKENS = 150
+# Follow-ups only ask for the one or two bullets that are missing
+FOLLOW_UP_CONFIG = dict(GENERATION_CONFIG, max_output_tokens=256)
+
+# Output rules shared by every agent; they live in the system instruction so
+# they are sent as part of a stable prefix rather than rebuilt into each prompt
+FORMAT_RULES = (
+    "STRICT REQUIREMENTS:\n"
+    "1. Provide exactly 3-4 bullet points only\n"
+    "2. Each point must be 1-2 lines maximum\n"
+    "3. Be specific and quantitative where possible\n"
+    "4. Focus on actionable insights only\n"
+    "5. No introductions, conclusions, or context\n\n"
+    "FORMAT:\n"
+    "• [Specific insight 1: max 2 lines]\n"
+    "• [Specific insight 2: max 2 lines]\n"
+    "• [Specific insight 3: max 2 lines]\n"
+    "• [Optional insight 4: max 2 lines]\n\n"
+    "Provide specific, detailed analysis focused on the startup idea you are given. Avoid generic responses."
+)
+
+# The per-call part of every prompt: the idea plus, for downstream tasks, the
+# CONTEXT_BLOCK of upstream results. Agents can have their own (see PromptTemplate)
+DEFAULT_PROMPT = "Provide exactly {count} key insights about:\n{idea}\n{context}"
+CONTEXT_BLOCK = "\nCONTEXT FROM PREVIOUS ANALYSES:\n{results}\nConsider the above context in your analysis.\n"
+
+# Which system instructions have already been sent, for cached vs. fresh token accounting
+prefix_ledger = PrefixLedger()
+
+
+# Stand-ins for sections a run with a deadline did not produce (see deadlines)
+PENDING_RESULT = "Pending: not finished within the time budget"
+SKIPPED_RESULT = "Skipped: not enough time left in the time budget"
+
+
+# Set by quiet() for runs that must not print, whatever their (shared) agents' verbose setting
+_quiet = contextvars.ContextVar('thinktank_quiet', default=False)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Silence every agent called in this context (and tasks started from it), for this run only."""
+    token = _quiet.set(True)
+    try:
+        yield
+    finally:
+        _quiet.reset(token)
+
+
+def is_error_result(result) -> bool:
+    """True for the error strings Agent.run returns instead of an analysis.
+
+    The pending and skipped stand-ins count too: like errors, they are not
+    passed on as context, stored as results or reused.
+    """
+    return result is None or result.startswith(("Error in ", "Pending: ", "Skipped: "))
+
+
+class PromptTemplate:
+    """A prompt with {placeholders}, checked once when compiled and filled in on every call.
+
+    Templates may use {idea}, {count} (how many insights to ask for) and
+    {context} (the CONTEXT_BLOCK, empty for tasks without upstream results);
+    idea and context are required.
+    """
+
+    FIELDS = ('idea', 'count', 'context')
+    REQUIRED = ('idea', 'context')
+
+    def __init__(self, text: str):
+        names = set()
+        try:
+            fields = list(string.Formatter().parse(text))
+        except ValueError as e:
+            raise ValueError(f"Prompt is not a valid template: {e}") from None
+        for _, name, spec, conversion in fields:
+            if name is None:
+                continue
+            if name not in self.FIELDS or spec or conversion:
+                expected = ', '.join('{' + field + '}' for field in self.FIELDS)
+                raise ValueError(f"Unknown placeholder {{{name}}} in prompt; expected {expected}")
+            names.add(name)
+        missing = [name for name in self.REQUIRED if name not in names]
+        if missing:
+            raise ValueError(f"Prompt is missing {', '.join('{' + name + '}' for name in missing)}")
+        self.text = text
+
+    def render(self, **values) -> str:
+        return self.text.format_map(values)
+
+
 class Agent:
-    def __init__(self, role, goal, backstory, allow_delegation=False, verbose=True):
+    def __init__(self, role, goal, backstory, allow_delegation=False, verbose=True, model=None, cache=None,
+                 flights=None, prompt=None):
         self.role = role
         self.goal = goal
         self.backstory = backstory
+        # The prompt template and system instruction are compiled once and reused for every call
+        if not isinstance(prompt, PromptTemplate):
+            prompt = PromptTemplate(prompt or DEFAULT_PROMPT)
+        self.prompt_template = prompt
+        self._system_instruction = f"You are the {role}. Your goal is to {goal}.\n{backstory}\n\n{FORMAT_RULES}"
         self.allow_delegation = allow_delegation
         self.verbose = verbose
-        # Initialize Gemini model
-        GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-        if not GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY environment variable not set")
-        genai.configure(api_key=GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
-
-    def run(self, input_data):
-        """Process input and generate analysis for the startup idea."""
+        self.model_name = 'gemini-2.0-flash'
+        # Optional cache.ResponseCache shared between agents
+        self.cache = cache
+        # Optional singleflight.SingleFlight so identical concurrent prompts share one call
+        self.flights = flights
+        # Injected backend (e.g. fake_model.FakeModel); otherwise the shared
+        # client from clients.registry is created on first use
+        self._model = model
+
+    @property
+    def verbose(self):
+        return self._verbose and not _quiet.get()
+
+    @verbose.setter
+    def verbose(self, verbose):
+        self._verbose = verbose
+
+    @property
+    def model(self):
+        if self._model is not None:
+            return self._model
+        return registry.get(self.model_name)
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    @property
+    def system_instruction(self):
+        """Stable per-agent prefix: who the agent is plus the output rules."""
+        return self._system_instruction
+
+    def _client(self, model_name=None):
+        """The model (by default the routed one) with this agent's system instruction attached."""
+        if self._model is None:
+            return registry.get(model_name or self._route().model, self.system_instruction)
+        # Injected stand-ins that understand system instructions get it too
+        if hasattr(self._model, 'with_system_instruction'):
+            return self._model.with_system_instruction(self.system_instruction)
+        return self._model
+
+    def _parse_input(self, input_data):
+        """Split the task input into the startup idea and previous results."""
+        startup_idea = ""
+        previous_results = {}
+
+        if isinstance(input_data, dict):
+            startup_idea = input_data.get('startup_idea', '')
+            previous_results = input_data.get('previous_results', {})
+        else:
+            startup_idea = input_data
+
+        # Validate input
+        if not startup_idea:
+            raise ValueError("Startup idea cannot be empty")
+        return startup_idea, previous_results
+
+    def _build_prompt(self, startup_idea, previous_results, brief=False):
+        """Fill in the per-call part of the prompt; the rules are in system_instruction."""
+        context = ''
+        # Add context from previous analyses if available
+        if previous_results:
+            context = CONTEXT_BLOCK.format(
+                results=''.join(f"{task_num}: {result}\n" for task_num, result in previous_results.items()))
+        return self.prompt_template.render(count=MIN_BULLETS if brief else "3-4", idea=startup_idea,
+                                           context=context)
+
+    def _finish(self, text, startup_idea):
+        """Validate and post-process the text of a model response."""
         try:
-            # Process input data
-            startup_idea = ""
-            previous_results = {}
-            
-            if isinstance(input_data, dict):
-                startup_idea = input_data.get('startup_idea', '')
-                previous_results = input_data.get('previous_results', {})
-            else:
-                startup_idea = input_data
-
-            # Validate input
-            if not startup_idea:
-                raise ValueError("Startup idea cannot be empty")
-
-            # Construct a structured prompt with strict formatting
-            prompt = (
-                f"As {self.role} with the goal to {self.goal}, provide exactly 3-4 key insights about:\n"
-                f"{startup_idea}\n\n"
-                "STRICT REQUIREMENTS:\n"
-                "1. Provide exactly 3-4 bullet points only\n"
-                "2. Each point must be 1-2 lines maximum\n"
-                "3. Be specific and quantitative where possible\n"
-                "4. Focus on actionable insights only\n"
-                "5. No introductions, conclusions, or context\n\n"
-                "FORMAT:\n"
-                "• [Specific insight 1: max 2 lines]\n"
-                "• [Specific insight 2: max 2 lines]\n"
-                "• [Specific insight 3: max 2 lines]\n"
-                "• [Optional insight 4: max 2 lines]\n\n"
+            if not text:
+                raise ValueError("Empty response from model")
+
+            # Post-process the response to ensure specificity
+            processed_response = self._process_response(text, startup_idea)
+        except ValueError as e:
+            instrumentation.emit('rejection', agent=self.role, reason=str(e))
+            raise
+
+        if self.verbose:
+            print(f"Result: {processed_response}")
+
+        return processed_response
+
+    def _error(self, e):
+        error_msg = f"Error in {self.role}: {str(e)}"
+        print(error_msg)
+        return error_msg
+
+    def _route(self):
+        """Model, output budget and fallback for this agent under the current profile."""
+        return routing.route_for(self.role, self.model_name)
+
+    def _config(self, brief=False):
+        """Generation config of this agent's route; brief caps it at deadlines.BRIEF_OUTPUT_TOKENS."""
+        config = self._route().generation_config(GENERATION_CONFIG)
+        if brief:
+            config['max_output_tokens'] = min(config['max_output_tokens'], deadlines.BRIEF_OUTPUT_TOKENS)
+        return config
+
+    def _key(self, prompt, generation_config=None, model=None):
+        """Content address of a prompt, shared by the cache and in-flight coalescing.
+
+        model defaults to the one the route would call now, its fallback while
+        the routed model cools down, so answers are only served for the model
+        that gave them.
+        """
+        config = generation_config or self._config()
+        return make_key(model or routing.router.pick(self._route()), config, prompt, self.system_instruction)
+
+    def _cached(self, key):
+        """Return the cached result for a key, or None."""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(key)
+        instrumentation.emit('cache', agent=self.role, hit=cached is not None)
+        if cached is not None and self.verbose:
+            print(f"Agent {self.role} served from cache")
+        return cached
+
+    def _store(self, key, result, answered=None, prompt=None, generation_config=None):
+        """Cache result under key, or under the key of answered['model'] if another model gave it."""
+        if self.cache is not None:
+            model = (answered or {}).get('model')
+            if model is not None:
+                key = self._key(prompt, generation_config, model)
+            self.cache.set(key, result)
+        return result
+
+    def _record_flight(self, shared):
+        instrumentation.emit('singleflight', agent=self.role, shared=shared)
+        if shared and self.verbose:
+            print(f"Agent {self.role} shared an identical in-flight request")
+
+    def _coalesce(self, key, compute):
+        """Run compute(), or wait for an identical call already in flight; returns (result, shared)."""
+        if self.flights is None:
+            return compute(), False
+        result, shared = self.flights.do(key, compute)
+        self._record_flight(shared)
+        return result, shared
+
+    async def _coalesce_async(self, key, compute):
+        if self.flights is None:
+            return await compute(), False
+        result, shared = await self.flights.do_async(key, compute)
+        self._record_flight(shared)
+        return result, shared
+
+    def _record_call(self, stats, response=None, error=None, answered=None):
+        """Emit the llm_call event (and one retry event per retried attempt).
+
+        stats holds this call's own figures; the model that answered is also
+        stored in answered['model'].
+        """
+        for name in stats.get('retried_errors', []):
+            instrumentation.emit('retry', agent=self.role, error=name)
+        usage = getattr(response, 'usage_metadata', None)
+        model = stats.get('model') or self._route().model
+        cached_tokens, cached_source = None, None
+        if error is None:
+            cached_tokens, cached_source = prefix_ledger.account(model, self.system_instruction, usage)
+        instrumentation.emit(
+            'llm_call',
+            agent=self.role,
+            model=model,
+            status='error' if error is not None else 'ok',
+            error=type(error).__name__ if error is not None else None,
+            queue_wait=round(stats.get('queue_wait', 0.0), 4),
+            model_time=round(stats.get('model_time', 0.0), 4),
+            attempts=stats.get('attempts', 0),
+            prompt_tokens=getattr(usage, 'prompt_token_count', None),
+            response_tokens=getattr(usage, 'candidates_token_count', None),
+            cached_tokens=cached_tokens,
+            cached_source=cached_source,
+        )
+        if answered is not None and error is None:
+            answered['model'] = model
+
+    def _generate(self, prompt, generation_config=None, stats=None):
+        """Call the routed model behind the shared rate limiter, retrying transient errors.
+
+        generation_config defaults to the route's. A throttled model falls
+        back to the route's faster one, and when hedging is configured an
+        attempt slower than usual gets a duplicate request. The model that
+        answered is stored in stats['model'], so several calls can share one
+        stats dict.
+        """
+        route = self._route()
+        config = generation_config or route.generation_config(GENERATION_CONFIG)
+        answered, stats = stats, {}
+        tokens = self._estimated_tokens(prompt)
+
+        def send(model_name):
+            return hedging.call(
+                lambda: self._client(model_name).generate_content(prompt, generation_config=config,
+                                                                  **deadlines.request_options()),
+                tokens=tokens,
+                agent=self.role
             )
+        try:
+            response = ratelimit.call(
+                lambda: routing.router.call(route, send, stats, self.role, tokens=tokens),
+                tokens=tokens,
+                stats=stats
+            )
+        except Exception as e:
+            self._record_call(stats, error=e)
+            raise
+        self._record_call(stats, response, answered=answered)
+        return response.text
 
-            # Add context from previous analyses if available
-            if previous_results:
-                prompt += "CONTEXT FROM PREVIOUS ANALYSES:\n"
-                for task_num, result in previous_results.items():
-                    prompt += f"{task_num}: {result}\n"
-                prompt += "\nConsider the above context in your analysis.\n"
-
-            prompt += "\nProvide specific, detailed analysis focused on this startup idea. Avoid generic responses."
-            
-            if self.verbose:
-                print(f"Agent {self.role} processing task...")
-            # Configure the model for concise analysis
-            response = self.model.generate_content(
-                prompt,
-                generation_config={
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                    'top_k': 40,
-                    'max_output_tokens': 1024,  # Limit output length
-                    'candidate_count': 1,
-                }
+    def _generate_stream(self, prompt, on_chunk, generation_config=None, stats=None):
+        """Stream the response, passing each text chunk to on_chunk as it arrives."""
+        parts = []
+        last_chunk = []
+        route = self._route()
+        config = generation_config or route.generation_config(GENERATION_CONFIG)
+        answered, stats = stats, {}
+        tokens = self._estimated_tokens(prompt)
+
+        def send(model_name):
+            response = self._client(model_name).generate_content(prompt, generation_config=config, stream=True,
+                                                                 **deadlines.request_options())
+            for chunk in response:
+                # Usage metadata for the whole response arrives with the last chunk
+                last_chunk[:] = [chunk]
+                text = chunk.text
+                if text:
+                    parts.append(text)
+                    if on_chunk is not None:
+                        on_chunk(text)
+            return ''.join(parts)
+
+        # Once chunks have been shown a retry would duplicate them, so only
+        # failures before the first chunk are retried
+        try:
+            text = ratelimit.call(
+                lambda: routing.router.call(route, send, stats, self.role, retryable=lambda e: not parts,
+                                            tokens=tokens),
+                tokens=tokens,
+                retryable=lambda e: not parts and ratelimit.is_retryable(e),
+                stats=stats
             )
-            
-            if not response.text:
-                raise ValueError("Empty response from model")
+        except Exception as e:
+            self._record_call(stats, error=e)
+            raise
+        self._record_call(stats, last_chunk[0] if last_chunk else None, answered=answered)
+        return text
 
-            # Post-process the response to ensure specificity
-            processed_response = self._process_response(response.text, startup_idea)
-            
-            if self.verbose:
-                print(f"Result: {processed_response}")
-                
-            return processed_response
+    async def _generate_async(self, prompt, generation_config=None, stats=None):
+        route = self._route()
+        config = generation_config or route.generation_config(GENERATION_CONFIG)
+        answered, stats = stats, {}
+        tokens = self._estimated_tokens(prompt)
+
+        async def send(model_name):
+            return await hedging.call_async(
+                lambda: self._client(model_name).generate_content_async(prompt, generation_config=config,
+                                                                        **deadlines.request_options()),
+                tokens=tokens,
+                agent=self.role
+            )
+        try:
+            response = await ratelimit.call_async(
+                lambda: routing.router.call_async(route, send, stats, self.role, tokens=tokens),
+                tokens=tokens,
+                stats=stats
+            )
+        except Exception as e:
+            self._record_call(stats, error=e)
+            raise
+        self._record_call(stats, response, answered=answered)
+        return response.text
+
+    def _estimated_tokens(self, prompt):
+        # System instruction, prompt and a typical 3-4 bullet answer, for the tokens/min budget
+        return estimate_tokens(self.system_instruction) + estimate_tokens(prompt) + EXPECTED_OUTPUT_TOKENS
+
+    def run(self, input_data, stream=False, on_chunk=None, deadline=None, brief=False):
+        """Process input and generate analysis for the startup idea.
+
+        With stream=True the response is streamed and on_chunk(text) is called
+        for every partial chunk; the processed result is still returned at the end.
+        deadline (a time.monotonic() value) bounds the model calls, which then
+        fail rather than wait or retry past it; brief asks for a shorter answer.
+        """
+        with deadlines.scope(deadline):
+            return self._run(input_data, stream, on_chunk, brief)
+
+    def _run(self, input_data, stream, on_chunk, brief):
+        try:
+            startup_idea, previous_results = self._parse_input(input_data)
+            prompt = self._build_prompt(startup_idea, previous_results, brief)
+            config = self._config(brief)
+            key = self._key(prompt, config)
+            cached = self._cached(key)
+            if cached is not None:
+                if stream and on_chunk is not None:
+                    on_chunk(cached)
+                return cached
+
+            answered = {}
+            result, shared = self._coalesce(
+                key, lambda: self._analyze(prompt, startup_idea, stream, on_chunk, config, answered))
+            if shared:
+                if stream and on_chunk is not None:
+                    # Chunks went to the caller that made the request
+                    on_chunk(result)
+                # ...which also cached the result
+                return result
+            return self._store(key, result, answered, prompt, config)
+
+        except Exception as e:
+            return self._error(e)
+
+    def _analyze(self, prompt, startup_idea, stream=False, on_chunk=None, generation_config=None, answered=None):
+        """The processed result of prompt; the model that answered is stored in answered['model']."""
+        if self.verbose:
+            print(f"Agent {self.role} processing task...")
+        if stream:
+            text = self._generate_stream(prompt, on_chunk, generation_config, answered)
+        else:
+            text = self._generate(prompt, generation_config, answered)
+        try:
+            return self._finish(text, startup_idea)
+        except MissingBulletsError as e:
+            # Ask only for the missing bullets instead of redoing the whole analysis
+            follow_up = self._generate(self._follow_up_prompt(e, startup_idea), FOLLOW_UP_CONFIG, answered)
+            return self._merge_follow_up(e, follow_up)
+
+    async def arun(self, input_data, deadline=None, brief=False):
+        """Async counterpart of run() that does not hold a thread while the model responds."""
+        with deadlines.scope(deadline):
+            return await self._arun(input_data, brief)
+
+    async def _arun(self, input_data, brief):
+        try:
+            startup_idea, previous_results = self._parse_input(input_data)
+            prompt = self._build_prompt(startup_idea, previous_results, brief)
+            config = self._config(brief)
+            key = self._key(prompt, config)
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+
+            answered = {}
+            result, shared = await self._coalesce_async(
+                key, lambda: self._analyze_async(prompt, startup_idea, config, answered))
+            if shared:
+                return result
+            return self._store(key, result, answered, prompt, config)
 
         except Exception as e:
-            error_msg = f"Error in {self.role}: {str(e)}"
-            print(error_msg)
-            return error_msg
+            return self._error(e)
+
+    async def _analyze_async(self, prompt, startup_idea, generation_config=None, answered=None):
+        if self.verbose:
+            print(f"Agent {self.role} processing task...")
+        text = await self._generate_async(prompt, generation_config, answered)
+        try:
+            return self._finish(text, startup_idea)
+        except MissingBulletsError as e:
+            follow_up = await self._generate_async(self._follow_up_prompt(e, startup_idea), FOLLOW_UP_CONFIG,
+                                                   answered)
+            return self._merge_follow_up(e, follow_up)
 
     def _process_response(self, response: str, startup_idea: str) -> str:
         """Process and structure the response for clarity and conciseness."""
         if len(response.strip()) < 20:  # Check if response is too short
             raise ValueError("Response too short - lacks analysis")
-        
-        # Clean and structure the response
-        clean_response = response.strip()
-        
-        # Split into lines and filter
-        lines = clean_response.split('\n')
-        
-        # Keep only bullet points and ensure max length
-        bullet_lines = []
-        for line in lines:
-            line = line.strip()
-            if line.startswith('•'):
-                # Limit each line to roughly 100 characters
-                if len(line) > 100:
-                    line = line[:97] + '...'
-                bullet_lines.append(line)
-        
+
+        # Keep only bullet points (any common list format) and ensure max length
+        bullet_lines, normalized = parse_bullets(response)
+
         # Ensure we have 3-4 bullet points only
-        if len(bullet_lines) > 4:
-            bullet_lines = bullet_lines[:4]
-        elif len(bullet_lines) < 3:
-            raise ValueError("Not enough bullet points in response")
-        
-        return '\n'.join(bullet_lines).strip()
-
-# Define agents with detailed roles, goals, and backstories
-
-market_research_agent = Agent(
-    role="Market Research Agent",
-    goal="Gather market data, trends, and competitor insights for startup idea validation",
-    backstory=(
-        "You are an expert market analyst with deep expertise in data mining, trend analysis, and competitive intelligence. "
-        "Using advanced web scraping tools and APIs, you collect comprehensive market data including industry trends, "
-        "competitor movements, and emerging opportunities. Your analysis forms the foundation for other agents' work - "
-        "particularly informing the Feasibility Analysis Agent and Business Model Agent. You excel at identifying "
-        "market gaps and potential disruption points, using both quantitative data and qualitative insights. "
-        "Your approach combines traditional market research methodologies with modern data analytics techniques."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
+        if len(bullet_lines) < MIN_BULLETS:
+            raise MissingBulletsError(bullet_lines)
+        self._record_parse('normalized' if normalized else 'direct')
+        return '\n'.join(bullet_lines[:MAX_BULLETS])
 
-feasibility_analysis_agent = Agent(
-    role="Feasibility Analysis Agent",
-    goal="Evaluate technical feasibility, financial viability, and legal viability of startup ideas",
-    backstory=(
-        "You are a seasoned technical architect and financial analyst with expertise in assessing startup viability. "
-        "Your background includes successful evaluations of numerous tech startups and deep understanding of various "
-        "technology stacks and scalability patterns. Working closely with the Market Research Agent and Tech Stack "
-        "Recommender, you perform thorough technical feasibility studies incorporating emerging technologies and industry "
-        "standards. Your financial analysis includes detailed ROI calculations, cash flow projections, and resource "
-        "requirement estimations. You also evaluate legal and regulatory compliance, considering intellectual property "
-        "rights, industry regulations, and potential legal challenges. Your balanced approach ensures recommendations "
-        "are both technically sound and financially prudent."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
+    def _record_parse(self, path):
+        parse_stats.record(path)
+        instrumentation.emit('parse', agent=self.role, path=path)
 
-customer_persona_agent = Agent(
-    role="Customer Persona Agent",
-    goal="Define target customer segments and identify their pain points for the startup idea",
-    backstory=(
-        "You are a consumer behavior expert with extensive experience in market segmentation and user research. "
-        "Using advanced data analytics and psychological profiling techniques, you create comprehensive customer "
-        "personas that go beyond basic demographics. You collaborate closely with the Market Research Agent to "
-        "validate market segments and with the GTM Strategy Agent to inform targeting strategies. Your analysis "
-        "incorporates both quantitative data (demographics, purchasing patterns, digital behavior) and qualitative "
-        "insights (motivations, pain points, aspirations). You excel at identifying unmet needs and opportunities "
-        "in the market, using techniques like sentiment analysis, social listening, and trend mapping. Your insights "
-        "are crucial for validating product-market fit and shaping the overall business strategy."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
+    def _follow_up_prompt(self, error: MissingBulletsError, startup_idea: str) -> str:
+        """A short prompt asking only for the bullets that are missing."""
+        self._record_parse('follow_up')
+        prompt = (
+            f"As {self.role}, give exactly {error.missing} more key insight(s) about:\n"
+            f"{startup_idea}\n\n"
+        )
+        if error.bullets:
+            prompt += "Do not repeat these existing insights:\n" + '\n'.join(error.bullets) + "\n\n"
+        prompt += "Reply with one line per insight starting with '• ', max 2 lines each, nothing else."
+        return prompt
 
-business_model_agent = Agent(
-    role="Business Model Agent",
-    goal="Design robust business models and revenue frameworks for the startup",
-    backstory=(
-        "You are a strategic business architect with deep expertise in developing innovative business models and "
-        "revenue frameworks. Your background includes consulting for successful startups across various industries, "
-        "giving you unique insights into what makes business models scalable and sustainable. Working in tandem with "
-        "the Monetization Optimization Agent and Feasibility Analysis Agent, you craft comprehensive business strategies "
-        "that balance growth potential with operational feasibility. Your approach incorporates modern business model "
-        "patterns like platform economics, subscription models, and marketplace dynamics. You excel at identifying "
-        "revenue streams, cost structures, and key partnerships, while ensuring alignment with market conditions and "
-        "customer needs. Your models are backed by detailed financial projections and market validation data."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
+    def _merge_follow_up(self, error: MissingBulletsError, text: str) -> str:
+        bullet_lines = list(error.bullets)
+        for line in parse_bullets(text or '')[0]:
+            if line not in bullet_lines:
+                bullet_lines.append(line)
+        if len(bullet_lines) < MIN_BULLETS:
+            self._record_parse('failed')
+            raise ValueError("Not enough bullet points in response")
+        self._record_parse('recovered')
+        processed_response = '\n'.join(bullet_lines[:MAX_BULLETS])
+        if self.verbose:
+            print(f"Result: {processed_response}")
+        return processed_response
 
-competitive_advantage_agent = Agent(
-    role="Competitive Advantage Agent",
-    goal="Identify unique selling propositions and strategic differentiators for the startup idea",
-    backstory=(
-        "You are a strategic competitive analyst with expertise in identifying and developing sustainable competitive "
-        "advantages. Your background spans competitive intelligence, strategic planning, and industry analysis across "
-        "multiple sectors. Working closely with the Market Research Agent and Business Model Agent, you conduct "
-        "detailed competitor analysis using frameworks like Porter's Five Forces and Blue Ocean Strategy. Your expertise "
-        "includes analyzing both direct and indirect competitors, identifying market positioning opportunities, and "
-        "evaluating potential market entry barriers. You excel at uncovering unique value propositions and sustainable "
-        "competitive moats, whether through technology, network effects, brand positioning, or operational excellence. "
-        "Your recommendations are based on deep market understanding and future trend anticipation."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
+# Responses are cached by content address and shared by the agents of every
+# crew spec (see crew_spec), and identical prompts that are in flight at the
+# same time are sent only once
+response_cache = cache_from_env()
 
-gtm_strategy_agent = Agent(
-    role="GTM Strategy Agent",
-    goal="Develop effective go-to-market strategies for launching the startup",
-    backstory=(
-        "You are a go-to-market strategist with extensive experience in launching successful startups and products. "
-        "Your expertise spans digital marketing, channel strategy, and growth hacking techniques. Working in close "
-        "coordination with the Customer Persona Agent and Competitive Advantage Agent, you develop comprehensive "
-        "launch strategies that maximize market penetration and user acquisition. Your approach combines traditional "
-        "marketing channels with innovative growth tactics, utilizing data-driven decision making and market feedback "
-        "loops. You excel at designing scalable distribution strategies, identifying key partnerships, and creating "
-        "viral growth mechanisms. Your methodology includes detailed launch timelines, channel optimization strategies, "
-        "and metrics-driven success criteria, ensuring efficient resource allocation and maximum market impact."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
+# The agents this module used to define, by the key the default crew spec
+# (crews/startup_analysis.json) gives them
+SPEC_AGENTS = {
+    'market_research_agent': 'market_research',
+    'feasibility_analysis_agent': 'feasibility_analysis',
+    'customer_persona_agent': 'customer_persona',
+    'business_model_agent': 'business_model',
+    'competitive_advantage_agent': 'competitive_advantage',
+    'gtm_strategy_agent': 'gtm_strategy',
+    'monetization_optimization_agent': 'monetization_optimization',
+    'tech_stack_recommender': 'tech_stack',
+    'investor_pitch_agent': 'investor_pitch',
+}
 
-monetization_optimization_agent = Agent(
-    role="Monetization Optimization Agent",
-    goal="Identify and refine revenue-generation strategies for the startup idea",
-    backstory=(
-        "You are a revenue optimization specialist with deep expertise in pricing strategies, sales models, and "
-        "financial growth optimization. Your background includes successful revenue scaling for various startups "
-        "and established businesses. Working closely with the Business Model Agent and GTM Strategy Agent, you "
-        "develop sophisticated pricing models and revenue optimization strategies. Your expertise covers subscription "
-        "economics, freemium models, dynamic pricing, and enterprise sales frameworks. You excel at identifying "
-        "revenue leakage points, optimizing conversion funnels, and developing upsell/cross-sell strategies. "
-        "Your approach combines behavioral economics with data-driven analytics to maximize customer lifetime value "
-        "while maintaining competitive market positioning. You ensure that monetization strategies align with both "
-        "market conditions and long-term business sustainability."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
 
-tech_stack_recommender = Agent(
-    role="Tech Stack Recommender",
-    goal="Recommend an optimal technology stack for building the startup",
-    backstory=(
-        "You are a technology architect with extensive experience in modern software development stacks and cloud "
-        "infrastructure. Your expertise spans full-stack development, cloud services, DevOps practices, and emerging "
-        "technologies. Working in conjunction with the Feasibility Analysis Agent, you evaluate and recommend optimal "
-        "technology stacks that balance innovation with practicality. Your analysis considers factors like scalability, "
-        "maintenance costs, team expertise requirements, and future extensibility. You excel at mapping business "
-        "requirements to technical solutions, incorporating both established platforms and cutting-edge technologies. "
-        "Your recommendations include detailed architecture blueprints, development roadmaps, and infrastructure "
-        "scaling plans, ensuring technical decisions support long-term business objectives."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
+def __getattr__(name):
+    """market_research_agent and the other standard agents, as the current crew spec defines them."""
+    if name not in SPEC_AGENTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import crew_spec
+    spec = crew_spec.current()
+    try:
+        return spec.agents[SPEC_AGENTS[name]]
+    except KeyError:
+        raise AttributeError(f"Crew spec '{spec.name}' has no agent {SPEC_AGENTS[name]!r} ({name})") from None
 
-investor_pitch_agent = Agent(
-    role="Investor Pitch Agent",
-    goal="Create compelling pitch decks and executive summaries for the startup idea",
-    backstory=(
-        "You are an expert pitch deck creator and storyteller with extensive experience in startup fundraising and "
-        "investor communications. Your background includes helping numerous startups secure funding through compelling "
-        "presentations and documentation. As the final synthesizer of all agents' insights, you excel at weaving "
-        "together market research, financial projections, and strategic plans into powerful investment narratives. "
-        "Working with inputs from all other agents, you create comprehensive pitch materials that address key investor "
-        "concerns while highlighting unique opportunities. Your expertise includes crafting memorable elevator pitches, "
-        "detailed financial models, and visually striking presentation decks. You understand what different types of "
-        "investors look for, from angel investors to venture capitalists, and tailor materials accordingly."
-    ),
-    allow_delegation=False,
-    verbose=True
-)
 
 if __name__ == '__main__':
     # Test with a specific startup idea
@@ -287,9 +583,13 @@ if __name__ == '__main__':
     learning algorithms that analyze spending patterns and financial goals.
     """
     
+    # The standard agents are defined in crews/startup_analysis.json
+    import crew_spec
+    agents = crew_spec.current().agents
+
     # Test with direct input
     print("\nTesting with direct input:")
-    result = market_research_agent.run(test_idea)
+    result = agents['market_research'].run(test_idea)
     print(f"\nDirect input result: {result}")
     
     # Test with dictionary input including context
@@ -300,5 +600,5 @@ if __name__ == '__main__':
             'Task 1': 'Market size estimated at $5B annually'
         }
     }
-    result = feasibility_analysis_agent.run(test_input)
+    result = agents['feasibility_analysis'].run(test_input)
     print(f"\nDictionary input result: {result}")
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""HTTP API for running startup analyses as background jobs.
+
+Endpoints (JSON unless noted):
+    POST /jobs                 {"idea": "...", "mode": "crew" | "fused",
+                                "profile": "fast" | "balanced" | "thorough",
+                                "deadline": seconds} -> 202 {"id", "status", ...};
+                               429 when the queue is full
+    GET  /jobs/<id>            status and which tasks have finished
+    GET  /jobs/<id>/events     per-task events as Server-Sent Events until the job ends
+    GET  /jobs/<id>/result     results once finished (409 while still running), with each task's
+                               status; sections left pending at the deadline are completed by
+                               the job named in followup
+    GET  /analyses?q=&before=  stored analyses matching q, newest first, 20 per page;
+                               pass the returned next_before as before= for the next page
+                               (404 unless started with --store)
+    GET  /analyses/<id>        one stored analysis with its per-task results and timings
+    GET  /health               queue statistics
+
+Clients are told apart by an X-Client-Id header, or their address without one.
+
+Example:
+    python api.py --port 8000 --workers 4 --fake
+    python api.py --port 8000 --processes 4 --workers 4 --store analyses.db
+    python api.py --port 8000 --cassette calls.jsonl.gz --cassette-timing zero
+    curl -s -XPOST localhost:8000/jobs -d '{"idea": "A marketplace for local repair shops"}'
+"""
+import argparse
+import json
+import re
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import crew_spec
+import ratelimit
+import routing
+from example_task_flow import MODES
+from jobs import Backpressure, JobQueue
+from store import AnalysisStore
+from workers import WorkerPool
+
+JOB_PATH = re.compile(r'^/jobs/([0-9a-f]+)(/events|/result)?/?$')
+ANALYSIS_PATH = re.compile(r'^/analyses(?:/(\d+))?/?$')
+# Stored analyses returned per page of GET /analyses
+PAGE_SIZE = 20
+# Largest request body accepted, in bytes
+MAX_BODY = 64 * 1024
+# Seconds an SSE stream waits for a new event before sending a keep-alive comment
+SSE_KEEPALIVE = 15
+
+
+def result_map(results):
+    """Turn kickoff's "Task N: description\\nResult: text" strings into {description: text}."""
+    mapped = {}
+    for result in results:
+        header, _, text = result.partition("\nResult: ")
+        mapped[header.split(': ', 1)[-1]] = text
+    return mapped
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = 'ThinkTankAPI/1.0'
+    # Set by make_server
+    queue = None
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send_json(status, {'error': message}, headers)
+
+    def _client(self):
+        return self.headers.get('X-Client-Id') or self.client_address[0]
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip('/') != '/jobs':
+            return self._error(404, "Not found")
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            # The body cannot be read (or skipped) reliably, so do not reuse the connection
+            self.close_connection = True
+            return self._error(400, "Invalid Content-Length header")
+        if length > MAX_BODY:
+            return self._error(413, "Request body too large")
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self._error(400, "Body must be JSON")
+        idea = body.get('idea') if isinstance(body, dict) else None
+        if not isinstance(idea, str) or not idea.strip():
+            return self._error(400, "Field 'idea' is required")
+        mode = body.get('mode', 'crew')
+        if mode not in MODES:
+            return self._error(400, f"Field 'mode' must be one of {', '.join(MODES)}")
+        profile = body.get('profile')
+        if profile is not None and profile not in routing.PROFILES:
+            return self._error(400, f"Field 'profile' must be one of {', '.join(routing.PROFILES)}")
+        deadline = body.get('deadline')
+        if deadline is not None and (isinstance(deadline, bool) or not isinstance(deadline, (int, float))
+                                     or deadline <= 0):
+            return self._error(400, "Field 'deadline' must be a positive number of seconds")
+        try:
+            job = self.queue.submit(idea.strip(), client=self._client(), mode=mode, profile=profile,
+                                    deadline=deadline)
+        except Backpressure as e:
+            return self._error(429, str(e), {'Retry-After': str(e.retry_after)})
+        self._send_json(202, {
+            'id': job.id,
+            'status': job.status,
+            'status_url': f'/jobs/{job.id}',
+            'events_url': f'/jobs/{job.id}/events',
+            'result_url': f'/jobs/{job.id}/result',
+        }, {'Location': f'/jobs/{job.id}'})
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') == '/health':
+            return self._send_json(200, {'status': 'ok', **self.queue.stats()})
+        stored = ANALYSIS_PATH.match(url.path)
+        if stored:
+            return self._analyses(stored.group(1), parse_qs(url.query))
+        match = JOB_PATH.match(url.path)
+        job = self.queue.get(match.group(1)) if match else None
+        if job is None:
+            return self._error(404, "Not found")
+        if match.group(2) == '/events':
+            return self._stream_events(job)
+        if match.group(2) == '/result':
+            return self._result(job)
+        progress = job.snapshot()
+        self._send_json(200, {
+            'id': job.id,
+            'status': progress['status'],
+            'finished_tasks': list(progress['finished']),
+            'running_tasks': list(progress['partial']),
+            'error': progress['error'],
+            'followup': job.followup.id if job.followup is not None else None,
+        })
+
+    def _result(self, job):
+        if not job.done:
+            return self._send_json(409, {'id': job.id, 'status': job.status})
+        if job.status == 'failed':
+            return self._send_json(500, {'id': job.id, 'status': job.status, 'error': job.error})
+        self._send_json(200, {
+            'id': job.id,
+            'status': job.status,
+            'idea': job.idea,
+            'results': result_map(job.results),
+            'summary': getattr(job.results, 'summary', None),
+            'followup': job.followup.id if job.followup is not None else None,
+        })
+
+    def _analyses(self, analysis_id, query):
+        store = self.queue.store
+        if store is None:
+            return self._error(404, "No analysis store configured")
+        if analysis_id is not None:
+            record = store.get(int(analysis_id))
+            if record is None:
+                return self._error(404, "Not found")
+            return self._send_json(200, record)
+        before = query.get('before', [None])[0]
+        if before is not None and not before.isdigit():
+            return self._error(400, "Parameter 'before' must be an analysis id")
+        rows, cursor = store.search(query.get('q', [None])[0], PAGE_SIZE, int(before) if before else None)
+        self._send_json(200, {'analyses': rows, 'next_before': cursor})
+
+    def _stream_events(self, job):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        index = 0
+        try:
+            while True:
+                events, finished = job.events_since(index, timeout=SSE_KEEPALIVE)
+                if not events and not finished:
+                    self.wfile.write(b': keep-alive\n\n')
+                for event in events:
+                    self.wfile.write(f"event: {event['kind']}\ndata: {json.dumps(event)}\n\n".encode('utf-8'))
+                index += len(events)
+                if finished:
+                    end = {'status': job.status, 'error': job.error}
+                    self.wfile.write(f"event: end\ndata: {json.dumps(end)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                    return
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client went away; the job keeps running
+
+
+def make_server(host, port, queue, verbose=False):
+    handler = type('Handler', (ApiHandler,), {'queue': queue})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+
+def configure_process(fake=False, fake_latency=0.2, rpm=None, verbose=False, cassette_path=None,
+                      cassette_timing='original'):
+    """Set up model backend, rate limit and logging; also runs in every worker process."""
+    if cassette_path:
+        from cassette import Cassette
+        Cassette(cassette_path, mode='replay', timing=cassette_timing).install()
+    elif fake:
+        from clients import registry
+        from fake_model import FakeModel
+        model = FakeModel(latency=fake_latency)
+        registry.set_backend(lambda name: model)
+    if rpm:
+        ratelimit.configure(rpm)
+    if not verbose:
+        crew_spec.configure_agents(verbose=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve startup analyses over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=4, help="Analyses run at once (per process with --processes)")
+    parser.add_argument('--processes', type=int, default=0, help="Run analyses in this many worker processes")
+    parser.add_argument('--queue', type=int, default=16, help="Jobs allowed to wait for a worker")
+    parser.add_argument('--per-client', type=int, default=2, help="Jobs in progress per client")
+    parser.add_argument('--rpm', type=float, help="Model requests per minute across all jobs")
+    parser.add_argument('--compact-context', action='store_true', help="Digest upstream context")
+    parser.add_argument('--store', metavar='PATH', help="SQLite file of past analyses to serve and search")
+    parser.add_argument('--fake', action='store_true', help="Serve every agent from fake_model.FakeModel")
+    parser.add_argument('--fake-latency', type=float, default=0.2, help="Seconds per fake model call")
+    parser.add_argument('--cassette', metavar='PATH', help="Replay model calls recorded with cassette.py")
+    parser.add_argument('--cassette-timing', choices=('original', 'zero'), default='original',
+                        help="Replay with the recorded latency or none")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    store = AnalysisStore(args.store) if args.store else None
+    if args.processes:
+        # Each process gets an equal share of the request budget
+        rpm = args.rpm / args.processes if args.rpm else None
+        queue = WorkerPool(args.processes, args.workers, args.queue, args.per_client,
+                           compact_context=args.compact_context, store_path=args.store,
+                           initializer=configure_process,
+                           initargs=(args.fake, args.fake_latency, rpm, args.verbose, args.cassette, args.cassette_timing))
+        # The store is still read here for GET /analyses
+        queue.store = store
+    else:
+        configure_process(args.fake, args.fake_latency, args.rpm, args.verbose, args.cassette, args.cassette_timing)
+        queue = JobQueue(args.workers, args.queue, args.per_client, compact_context=args.compact_context, store=store)
+    server = make_server(args.host, args.port, queue, verbose=args.verbose)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        queue.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,23 @@
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-from example_task_flow import create_startup_analysis_flow
+import cassette
+import crew_spec
+import routing
+from incremental import IncrementalAnalyzer
+from jobs import AnalysisJob, Backpressure, submit
+from store import WARM_SIMILARITY, store_from_env
+from workers import WorkerPool
+
+# Seconds between refreshes while an analysis runs in the background
+POLL_SECONDS = 0.5
+# Past analyses kept in each session's history
+HISTORY_SIZE = 20
+# Seconds before an analysis shows what it has, completing the rest in the background (unset: no limit)
+APP_DEADLINE = float(os.getenv('THINKTANK_APP_DEADLINE', '0')) or None
 
 def format_result(result_text):
     # Extract task number, description and result
@@ -17,12 +35,236 @@ def format_result(result_text):
     except:
         return "Unknown Task", result_text
 
+def show_content(placeholder, content):
+    placeholder.markdown('<div class="expander-content">' + content + '</div>', unsafe_allow_html=True)
+
+def render_card(card, placeholders, refreshed=None):
+    """Render a results card with one (initially empty) expander per task.
+
+    Sections in refreshed (when given) are marked as re-analyzed.
+    """
+    title, sections = card
+    st.markdown('<div class="results-card">', unsafe_allow_html=True)
+    st.markdown(f'<p class="section-title">{title}</p>', unsafe_allow_html=True)
+    for task_desc, label in sections:
+        if refreshed is not None and task_desc in refreshed:
+            label += " · 🔄 refreshed"
+        with st.expander(label, expanded=True):
+            placeholders[task_desc] = st.empty()
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def render_sections(content, refreshed=None):
+    """Lay out every section of the crew spec's layout, filling in whichever ones content already has."""
+    layout = crew_spec.current().layout
+    placeholders = {}
+    if layout['columns']:
+        for column, cards in zip(st.columns(len(layout['columns'])), layout['columns']):
+            with column:
+                for card in cards:
+                    render_card(card, placeholders, refreshed)
+    for card in layout['full_width']:
+        render_card(card, placeholders, refreshed)
+    for task_desc, placeholder in placeholders.items():
+        if task_desc in content:
+            show_content(placeholder, content[task_desc])
+
+@st.cache_resource
+def model_cassette():
+    """Recorded model calls to serve instead of Gemini, when THINKTANK_CASSETTE is set."""
+    return cassette.install_from_env()
+
+@st.cache_resource
+def analysis_executor():
+    """Worker pool shared by every session served by this process."""
+    return ThreadPoolExecutor(max_workers=int(os.getenv('THINKTANK_APP_WORKERS', '8')))
+
+@st.cache_resource
+def worker_pool():
+    """Worker processes shared by every session, when THINKTANK_APP_PROCESSES is set."""
+    processes = int(os.getenv('THINKTANK_APP_PROCESSES', '0'))
+    if not processes:
+        return None
+    threads = int(os.getenv('THINKTANK_APP_WORKERS', '8'))
+    # Each session runs one analysis at a time, so only the total is capped
+    # Sections left pending are completed by the session itself (see finish_analysis)
+    return WorkerPool(processes, threads, max_queued=processes * threads, per_client=2 * processes * threads,
+                      complete_pending=False, initializer=cassette.install_from_env)
+
+@st.cache_resource
+def analysis_store():
+    """Past analyses from every session (on disk when THINKTANK_STORE_PATH is set)."""
+    return store_from_env()
+
+def idea_key(idea, profile=None):
+    """Session key of an analysis: the normalised idea and the routing profile it ran with."""
+    text = f"{profile or routing.current_profile()}\n{' '.join(idea.split())}"
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def init_state():
+    defaults = {
+        'analyzer': IncrementalAnalyzer,  # Last analysis, so edits only re-run what they affect
+        'baseline_profile': lambda: None, # Routing profile the analyzer's results were made with
+        'analyses': dict,                 # idea_key -> completed analysis, oldest first
+        'selected': lambda: None,         # idea_key of the analysis on screen
+        'running': lambda: None,          # Background job in progress, if any
+    }
+    for name, factory in defaults.items():
+        if name not in st.session_state:
+            st.session_state[name] = factory()
+
+def restore_baseline(idea, results, profile):
+    """Make results, made with routing profile `profile`, what the next analysis edits."""
+    st.session_state.analyzer.restore(idea, results)
+    st.session_state.baseline_profile = profile
+
+def select_analysis(key):
+    record = st.session_state.analyses[key]
+    st.session_state.selected = key
+    restore_baseline(record['idea'], record['results'], record['profile'])
+
+def remember(key, record):
+    state = st.session_state
+    state.analyses.pop(key, None)
+    state.analyses[key] = record
+    while len(state.analyses) > HISTORY_SIZE:
+        state.analyses.pop(next(iter(state.analyses)))
+    state.selected = key
+
+def start_analysis(idea, profile=None, deadline=APP_DEADLINE):
+    """Serve idea from the store if a near-identical one was analyzed, else start a background job.
+
+    profile is the routing profile the job runs with, deadline its time budget in seconds.
+    """
+    analyzer = st.session_state.analyzer
+    profile = profile or routing.current_profile()
+    served = analysis_store().serve(idea, profile=profile)
+    if served is not None:
+        remember(idea_key(idea, profile), {
+            'idea': idea,
+            'profile': profile,
+            'results': served['results'],
+            'summary': served['summary'],
+            'refreshed': None,
+            'served': served['similarity'],
+            'created': time.strftime('%H:%M:%S'),
+        })
+        restore_baseline(idea, served['results'], profile)
+        return
+    if st.session_state.baseline_profile != profile:
+        # Sections made with another profile are not reused for this one
+        restore_baseline(None, {}, None)
+    match = analysis_store().warm_start(idea, WARM_SIMILARITY, profile=profile)
+    if match is not None and analyzer.idea is None:
+        # Nothing analyzed in this session yet: start from the closest past analysis
+        restore_baseline(match['idea'], match['results'], profile)
+    plan = analyzer.plan(idea)
+    reused = {task_desc: analyzer.results[task_desc] for task_desc in plan['reused']}
+    pool = worker_pool()
+    if pool is not None:
+        try:
+            job = pool.submit(idea, client='app', completed=reused, profile=profile, deadline=deadline)
+        except Backpressure:
+            st.warning("The analyzer is busy right now. Please try again in a few seconds.")
+            return
+    else:
+        job = AnalysisJob(idea, lambda: analyzer.stream(idea), deadline=deadline, profile=profile)
+        submit(analysis_executor(), job)
+    st.session_state.running = {
+        'job': job,
+        'profile': profile,
+        # Set when the job completes sections an earlier run left pending
+        'completing': False,
+        'reused': reused,
+        'refreshed': plan['rerun'] if plan['reused'] else None,
+        'total': len(plan['rerun']) + len(plan['reused']),
+    }
+
+def show_progress(running):
+    progress = running['job'].snapshot()
+    done = len(running['reused']) + len(progress['finished'])
+    st.progress(done / running['total'])
+    if running['completing']:
+        st.caption(f"Completing the sections that missed the time budget... {done} of {running['total']} done")
+    else:
+        st.caption(f"Analysis in progress... {done} of {running['total']} sections done")
+    render_sections({**running['reused'], **progress['partial'], **progress['finished']}, running['refreshed'])
+
+def finish_analysis(running):
+    """Store a finished background job in the session history; False if it failed."""
+    state = st.session_state
+    job = running['job']
+    state.running = None
+    if job.status != 'done':
+        st.error(f"Analysis failed: {job.error}")
+        return False
+    analysis_store().save(job.idea, job.results, mode='crew', profile=running['profile'])
+    results = dict(format_result(result) for result in job.results)
+    # Jobs run in a worker process do not update this session's analyzer
+    restore_baseline(job.idea, results, running['profile'])
+    remember(idea_key(job.idea, running['profile']), {
+        'idea': job.idea,
+        'profile': running['profile'],
+        'results': results,
+        'summary': getattr(job.results, 'summary', None),
+        'refreshed': None if running['completing'] else running['refreshed'],
+        'served': None,
+        'created': time.strftime('%H:%M:%S'),
+    })
+    status = (getattr(job.results, 'summary', None) or {}).get('task_status', {})
+    if any(value in ('pending', 'skipped') for value in status.values()):
+        # Show what was ready by the deadline, and finish the rest without one
+        start_analysis(job.idea, running['profile'], deadline=None)
+        if state.running is not None:
+            state.running.update(completing=True, refreshed=None)
+    return True
+
+def render_history():
+    """Sidebar listing this session's analyses; clicking one shows it again."""
+    state = st.session_state
+    with st.sidebar:
+        st.markdown("### 🕘 History")
+        if not state.analyses:
+            st.caption("Analyses you run appear here.")
+        for key, record in reversed(list(state.analyses.items())):
+            label = record['idea'] if len(record['idea']) <= 60 else record['idea'][:57] + '...'
+            if st.button(label, key=f"history-{key}", help=f"Analyzed at {record['created']}",
+                         disabled=state.running is not None, use_container_width=True):
+                select_analysis(key)
+
+def render_profile(summary):
+    """Show where the time and tokens of the last run went."""
+    if not summary:
+        return
+    with st.expander("⏱️ Run profile"):
+        metrics = st.columns(4)
+        metrics[0].metric("Wall time", f"{summary['wall_time']:.1f}s")
+        metrics[1].metric("Critical path", f"{summary.get('critical_path_seconds', 0):.1f}s")
+        metrics[2].metric("Tokens (in / out)", f"{summary['prompt_tokens']} / {summary['response_tokens']}")
+        metrics[3].metric("Retries / cache hits", f"{summary['retries']} / {summary['cache_hits']}")
+        if summary.get('critical_path'):
+            st.caption("Critical path: " + " → ".join(summary['critical_path']))
+        if summary.get('models'):
+            models = ', '.join(f"{model} × {usage['calls']}" for model, usage in summary['models'].items())
+            st.caption(f"Models: {models} · estimated cost ${summary.get('cost_usd', 0.0):.4f}")
+        st.table([
+            {
+                'Task': task,
+                'Start (s)': info['start'],
+                'Duration (s)': info['duration'],
+                'Model (s)': info.get('model_time', 0.0),
+                'Queue wait (s)': info.get('queue_wait', 0.0),
+                'Status': info['status'],
+            }
+            for task, info in sorted(summary['tasks'].items(), key=lambda item: item[1]['start'])
+        ])
+
 def main():
     st.set_page_config(
         page_title="ThinkTank AI - Startup Idea Analyzer",
         page_icon="🚀",
         layout="wide"
     )
+    model_cassette()
 
     # Custom CSS
     st.markdown("""
@@ -87,6 +329,9 @@ def main():
     st.markdown('<h1 class="main-title">🚀 ThinkTank AI</h1>', unsafe_allow_html=True)
     st.markdown('<p class="subtitle">Transform your startup idea into actionable insights</p>', unsafe_allow_html=True)
 
+    init_state()
+    render_history()
+
     # Input section
     startup_idea = st.text_area(
         "✍️ Enter your startup idea",
@@ -94,112 +339,53 @@ def main():
         placeholder="Describe your startup idea in detail...",
         help="Be specific about your target market, core features, and value proposition"
     )
+    profile = st.radio(
+        "Analysis depth",
+        list(routing.PROFILES),
+        index=list(routing.PROFILES).index(routing.DEFAULT_PROFILE),
+        horizontal=True,
+        help="fast uses the lightest model; thorough uses a larger model for the pitch and business sections"
+    )
 
+    state = st.session_state
     # Analysis button
-    if st.button("Analyze Startup Idea", type="primary"):
+    if st.button("Analyze Startup Idea", type="primary", disabled=state.running is not None):
         if not startup_idea:
             st.error("Please enter a startup idea to analyze")
             return
 
-        # Show progress
-        progress_text = "Analysis in progress..."
-        progress_bar = st.progress(0)
-        
-        with st.spinner(progress_text):
-            # Run the analysis
-            results = create_startup_analysis_flow(startup_idea)
-            
-            # Create columns for displaying results
-            col1, col2 = st.columns(2)
-            
-            # Process results
-            formatted_results = {}
-            total_tasks = len(results)
-            for i, result in enumerate(results):
-                task_desc, content = format_result(result)
-                formatted_results[task_desc] = content
-                progress_bar.progress((i + 1) / total_tasks)
-
-            # Display results in organized sections with improved styling
-            with col1:
-                # Market & Customer Analysis Card
-                st.markdown('<div class="results-card">', unsafe_allow_html=True)
-                st.markdown('<p class="section-title">📊 Market & Customer Analysis</p>', unsafe_allow_html=True)
-                if "Analyze market size, trends, and competitor landscape" in formatted_results:
-                    with st.expander("📈 Market Research"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Analyze market size, trends, and competitor landscape"] +
-                                  '</div>', unsafe_allow_html=True)
-                
-                if "Define target customers and their needs" in formatted_results:
-                    with st.expander("👥 Customer Personas"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Define target customers and their needs"] +
-                                  '</div>', unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # Business Strategy Card
-                st.markdown('<div class="results-card">', unsafe_allow_html=True)
-                st.markdown('<p class="section-title">💼 Business Strategy</p>', unsafe_allow_html=True)
-                if "Design comprehensive business model" in formatted_results:
-                    with st.expander("📑 Business Model"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Design comprehensive business model"] +
-                                  '</div>', unsafe_allow_html=True)
-                
-                if "Identify key differentiators and advantages" in formatted_results:
-                    with st.expander("⚡ Competitive Edge"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Identify key differentiators and advantages"] +
-                                  '</div>', unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-
-            with col2:
-                # Technical & Financial Card
-                st.markdown('<div class="results-card">', unsafe_allow_html=True)
-                st.markdown('<p class="section-title">🔧 Technical & Financial</p>', unsafe_allow_html=True)
-                if "Evaluate technical and financial feasibility" in formatted_results:
-                    with st.expander("📊 Feasibility Study"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Evaluate technical and financial feasibility"] +
-                                  '</div>', unsafe_allow_html=True)
-                
-                if "Recommend optimal technology stack" in formatted_results:
-                    with st.expander("💻 Tech Stack"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Recommend optimal technology stack"] +
-                                  '</div>', unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-                
-                # Go-to-Market Card
-                st.markdown('<div class="results-card">', unsafe_allow_html=True)
-                st.markdown('<p class="section-title">🎯 Go-to-Market</p>', unsafe_allow_html=True)
-                if "Develop revenue generation strategies" in formatted_results:
-                    with st.expander("💰 Revenue Model"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Develop revenue generation strategies"] +
-                                  '</div>', unsafe_allow_html=True)
-                
-                if "Create launch and market entry strategy" in formatted_results:
-                    with st.expander("🚀 Launch Plan"):
-                        st.markdown('<div class="expander-content">' + 
-                                  formatted_results["Create launch and market entry strategy"] +
-                                  '</div>', unsafe_allow_html=True)
-                st.markdown('</div>', unsafe_allow_html=True)
-
-            # Investment Summary Card
-            st.markdown('<div class="results-card">', unsafe_allow_html=True)
-            st.markdown('<p class="section-title">💰 Investment Summary</p>', unsafe_allow_html=True)
-            if "Create compelling pitch materials" in formatted_results:
-                with st.expander("📊 Investor Pitch"):
-                    st.markdown('<div class="expander-content">' + 
-                              formatted_results["Create compelling pitch materials"] +
-                              '</div>', unsafe_allow_html=True)
-            st.markdown('</div>', unsafe_allow_html=True)
-
-            # Success message
-            st.markdown('<div class="success-message">✨ Analysis completed! Review your detailed insights above.</div>', 
-                       unsafe_allow_html=True)
+        key = idea_key(startup_idea, profile)
+        if key in state.analyses:
+            # Already analyzed in this session: show the stored result instead of recomputing
+            select_analysis(key)
+        else:
+            start_analysis(startup_idea, profile)
+
+    # The pipeline runs on a worker thread; poll it until it finishes
+    if state.running is not None:
+        show_progress(state.running)
+        if state.running['job'].done:
+            if not finish_analysis(state.running):
+                return
+        else:
+            time.sleep(POLL_SECONDS)
+        st.rerun()
+
+    record = state.analyses.get(state.selected)
+    if record is None:
+        return
+    if record['served']:
+        st.info(f"Served from a past analysis of a {record['served']:.0%} similar idea.")
+    if record['refreshed']:
+        st.info(f"Refreshed {len(record['refreshed'])} sections affected by your edit; "
+                f"the rest were reused from the previous analysis.")
+    render_sections(record['results'], record['refreshed'])
+
+    # Success message
+    st.markdown('<div class="success-message">✨ Analysis completed! Review your detailed insights above.</div>', 
+               unsafe_allow_html=True)
+
+    render_profile(record['summary'])
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,260 @@
+"""Batch analysis of many startup ideas from a CSV, JSONL or text file.
+
+Example:
+    python batch.py ideas.csv --out results.jsonl --concurrency 8 --rpm 300
+
+Each finished task is appended to a checkpoint file as soon as it completes,
+so re-running the same command after an interruption only redoes the
+(idea, task) pairs that had not finished. An idea whose analysis fails
+outright, or a JSONL line that cannot be read, is written with status
+'failed' and the rest of the batch goes on.
+
+--concurrency caps the model calls in flight across all ideas (and the ideas
+analyzed at once); --rpm caps the model calls started per minute. Both apply
+for the duration of the batch only.
+"""
+import argparse
+import contextlib
+import contextvars
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import agents
+import ratelimit
+from agents import is_error_result
+from example_task_flow import build_startup_analysis_crew
+
+
+def read_ideas(path):
+    """Stream {'id', 'idea'} records from a .csv, .jsonl or plain text file.
+
+    CSV files need a header row with an 'idea' column (ValueError otherwise)
+    and may have an 'id' column; an empty CSV has no ideas. JSONL records
+    need an 'idea' key; a line that is not a JSON object is yielded with an
+    'error' instead of stopping the file. Without an id the 1-based record
+    number is used.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            reader = csv.DictReader(f)
+            if not reader.fieldnames:
+                return
+            if 'idea' not in reader.fieldnames:
+                raise ValueError(f"{path} has no 'idea' column (columns: {', '.join(reader.fieldnames)})")
+            for number, row in enumerate(reader, 1):
+                idea = (row.get('idea') or '').strip()
+                if idea:
+                    yield {'id': str(row.get('id') or number), 'idea': idea}
+        elif extension in ('.jsonl', '.ndjson'):
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    idea = (record.get('idea') or '').strip()
+                except (ValueError, AttributeError) as e:
+                    yield {'id': str(number), 'idea': line.strip(),
+                           'error': f"Line {number} is not a JSON object with an 'idea' string: {e}"}
+                    continue
+                if idea:
+                    yield {'id': str(record.get('id') or number), 'idea': idea}
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield {'id': str(number), 'idea': line.strip()}
+
+
+class Checkpoint:
+    """Append-only record of finished (idea id, task) results."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._results = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # Partially written last line from an interrupted run
+                    self._results.setdefault(record['id'], {})[record['task']] = record['result']
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def completed(self, idea_id):
+        with self._lock:
+            return dict(self._results.get(idea_id, {}))
+
+    def record(self, idea_id, task, result):
+        with self._lock:
+            self._results.setdefault(idea_id, {})[task] = result
+            self._file.write(json.dumps({'id': idea_id, 'task': task, 'result': result}) + '\n')
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BatchRunner:
+    """Analyzes ideas, `concurrency` model calls at a time, appending one JSON line per idea to output_path."""
+
+    def __init__(self, output_path, concurrency=4, requests_per_minute=None, checkpoint_path=None,
+                 compact_context=False, verbose=False):
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.requests_per_minute = requests_per_minute
+        self.checkpoint_path = checkpoint_path or output_path + '.checkpoint'
+        self.compact_context = compact_context
+        self.verbose = verbose
+        self._write_lock = threading.Lock()
+
+    def _finished_ids(self):
+        """Ids whose complete results are already in the output file."""
+        finished = set()
+        if os.path.exists(self.output_path):
+            with open(self.output_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if record.get('status') == 'complete':
+                        finished.add(record['id'])
+        return finished
+
+    def _analyze(self, record, checkpoint, output):
+        """Analyze one idea and write its line; returns 'complete', 'incomplete' or 'failed'."""
+        started = time.perf_counter()
+        try:
+            return self._run_idea(record, checkpoint, output, started)
+        except Exception as e:
+            # One broken idea must not take the rest of the batch down with it
+            return self._fail(record, output, f"{type(e).__name__}: {e}", started)
+
+    def _fail(self, record, output, error, started):
+        self._write(output, {
+            'id': record['id'],
+            'idea': record['idea'],
+            'status': 'failed',
+            'error': error,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        })
+        return 'failed'
+
+    def _write(self, output, line):
+        with self._write_lock:
+            output.write(json.dumps(line) + '\n')
+            output.flush()
+
+    def _run_idea(self, record, checkpoint, output, started):
+        crew = build_startup_analysis_crew(self.compact_context, verbose=1 if self.verbose else 0)
+
+        def on_event(event):
+            if event.kind == 'completed' and not is_error_result(event.text):
+                checkpoint.record(record['id'], event.description, event.text)
+
+        done = checkpoint.completed(record['id'])
+        # The crew's agents are shared with the rest of the process, so quiet only this run
+        with contextlib.nullcontext() if self.verbose else agents.quiet():
+            results = crew.kickoff(record['idea'], callback=on_event, completed=done)
+        failed = [task.description for task in crew.tasks if is_error_result(task.result)]
+        line = {
+            'id': record['id'],
+            'idea': record['idea'],
+            'status': 'incomplete' if failed else 'complete',
+            'failed_tasks': failed,
+            'reused_tasks': len(done),
+            'results': results,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+        }
+        self._write(output, line)
+        return 'incomplete' if failed else 'complete'
+
+    def run(self, ideas):
+        """Analyze every idea from the iterable and return throughput statistics."""
+        with ratelimit.configured(self.requests_per_minute, max_in_flight=self.concurrency):
+            return self._run(ideas)
+
+    def _run(self, ideas):
+        finished = self._finished_ids()
+        checkpoint = Checkpoint(self.checkpoint_path)
+        stats = {'completed': 0, 'incomplete': 0, 'failed': 0, 'skipped': 0}
+        started = time.perf_counter()
+
+        def report(final=False):
+            elapsed = time.perf_counter() - started
+            stats['elapsed_seconds'] = round(elapsed, 3)
+            stats['ideas_per_minute'] = round(stats['completed'] / elapsed * 60, 2) if elapsed else 0.0
+            if final or self.verbose:
+                print(f"{stats['completed']} ideas complete, {stats['incomplete']} incomplete, "
+                      f"{stats['failed']} failed, {stats['skipped']} skipped - {stats['ideas_per_minute']} ideas/min")
+
+        try:
+            with open(self.output_path, 'a', encoding='utf-8') as output, \
+                    ThreadPoolExecutor(max_workers=max(1, self.concurrency)) as executor:
+                running = set()
+                for record in ideas:
+                    if record['id'] in finished:
+                        stats['skipped'] += 1
+                        continue
+                    if 'error' in record:
+                        stats['failed'] += 1
+                        self._fail(record, output, record['error'], time.perf_counter())
+                        continue
+                    # Keep only a bounded number of ideas in flight so huge files stream
+                    if len(running) >= self.concurrency * 2:
+                        done, running = wait(running, return_when=FIRST_COMPLETED)
+                        self._collect(done, stats)
+                        report()
+                    # In a copy of this context, so ideas run under the caller's routing profile
+                    running.add(executor.submit(contextvars.copy_context().run, self._analyze, record, checkpoint,
+                                                output))
+                while running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    self._collect(done, stats)
+                    report()
+        finally:
+            checkpoint.close()
+        report(final=True)
+        return stats
+
+    def _collect(self, done, stats):
+        for future in done:
+            status = future.result()
+            stats['completed' if status == 'complete' else status] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze a file of startup ideas")
+    parser.add_argument('ideas', help="CSV, JSONL or text file with one idea per record")
+    parser.add_argument('--out', required=True, help="JSONL file results are appended to")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <out>.checkpoint)")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Model calls in flight at once across all ideas")
+    parser.add_argument('--rpm', type=float, help="Model requests per minute across all ideas")
+    parser.add_argument('--compact-context', action='store_true', help="Digest upstream context")
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    runner = BatchRunner(
+        args.out,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        checkpoint_path=args.checkpoint,
+        compact_context=args.compact_context,
+        verbose=args.verbose
+    )
+    try:
+        stats = runner.run(read_ideas(args.ideas))
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
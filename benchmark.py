@@ -0,0 +1,373 @@
+"""Offline benchmarks for the analysis pipeline against a simulated model.
+
+Every agent is served by fake_model.FakeModel, so no API key or network is
+needed and runs are reproducible for a given --seed. Each scenario runs N
+analyses at once for every level in --concurrency and records latency
+percentiles, throughput, peak traced memory and error counts.
+
+Examples:
+    python benchmark.py --out baseline.json
+    python benchmark.py --scenarios kickoff async --concurrency 1 10 100 --out new.json --compare baseline.json
+    python benchmark.py --scenarios kickoff --distribution pareto --concurrency 10 --rounds 10 --hedge
+    python benchmark.py --scenarios kickoff --concurrency 10 --profiles fast balanced thorough --seconds-per-token 0.001
+    python benchmark.py --scenarios kickoff --concurrency 10 --cassette calls.jsonl.gz --cassette-mode record
+    python benchmark.py --scenarios kickoff --concurrency 10 --cassette calls.jsonl.gz --cassette-timing zero
+
+Each model has its own fake, slowed down by MODEL_SPEED, so routing
+profiles can be compared on latency and (list-price) cost_usd.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import crew_spec
+import fake_model
+import fused
+import hedging
+import instrumentation
+import routing
+from agents import is_error_result
+from batch import BatchRunner
+from cassette import Cassette
+from clients import registry
+from example_task_flow import (
+    build_startup_analysis_crew, create_startup_analysis_flow, create_startup_analysis_flow_async
+)
+
+SCENARIOS = ('kickoff', 'flow', 'async', 'batch', 'duplicate', 'fused')
+DEFAULT_LEVELS = (1, 10, 100, 1000)
+# Metrics where a larger value is worse, and where a smaller value is worse
+LATENCY_METRICS = ('p50', 'p95', 'p99')
+THROUGHPUT_METRICS = ('analyses_per_second',)
+# Extra build_startup_analysis_crew options for the kickoff, flow and duplicate scenarios
+CREW_OPTIONS = {}
+# Latency of each model's fake relative to --latency and --seconds-per-token
+MODEL_SPEED = {'gemini-2.0-flash-lite': 0.6, 'gemini-2.0-flash': 1.0, 'gemini-1.5-pro': 2.5}
+
+
+def percentile(values, q):
+    """Linear-interpolated percentile (q in 0-100) of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _idea(n):
+    # Distinct ideas so the response cache can never short-circuit a run
+    return f"Benchmark startup idea #{n}: a marketplace connecting local repair shops with customers"
+
+
+def _failed(results):
+    return sum(1 for result in results if is_error_result(result.split("\nResult: ", 1)[-1]))
+
+
+def _timed(fn, n):
+    started = time.perf_counter()
+    results = fn(n)
+    return time.perf_counter() - started, _failed(results)
+
+
+def _run_threads(concurrency, one, total):
+    """_timed(one, n) for every n on concurrency threads, each in a copy of the caller's context (its profile)."""
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _timed, one, n) for n in range(total)]
+        return [future.result() for future in futures]
+
+
+def run_kickoff(concurrency, total):
+    def one(n):
+        return build_startup_analysis_crew(verbose=0, **CREW_OPTIONS).kickoff(_idea(n))
+    return _run_threads(concurrency, one, total)
+
+
+def run_flow(concurrency, total):
+    def one(n):
+        return create_startup_analysis_flow(_idea(n), verbose=0, **CREW_OPTIONS)
+    return _run_threads(concurrency, one, total)
+
+
+def run_fused(concurrency, total):
+    # Same as run_flow, with every section requested in one structured call
+    def one(n):
+        return create_startup_analysis_flow(_idea(n), verbose=0, mode='fused', **CREW_OPTIONS)
+    return _run_threads(concurrency, one, total)
+
+
+def run_async(concurrency, total):
+    async def main():
+        # Bound analyses in flight; each analysis bounds its own model calls
+        analyses = asyncio.Semaphore(concurrency)
+
+        async def one(n):
+            async with analyses:
+                started = time.perf_counter()
+                results = await create_startup_analysis_flow_async(_idea(n), verbose=0)
+                return time.perf_counter() - started, _failed(results)
+        return await asyncio.gather(*(one(n) for n in range(total)))
+    return asyncio.run(main())
+
+
+def run_duplicate(concurrency, total):
+    # Everyone submits the same idea at once, as during a launch or demo
+    def one(n):
+        return build_startup_analysis_crew(verbose=0, **CREW_OPTIONS).kickoff(_idea(0))
+    return _run_threads(concurrency, one, total)
+
+
+def run_batch(concurrency, total):
+    with tempfile.TemporaryDirectory() as workdir:
+        output = os.path.join(workdir, 'results.jsonl')
+        runner = BatchRunner(output, concurrency=concurrency)
+        runner.run({'id': str(n), 'idea': _idea(n)} for n in range(total))
+        with open(output, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+    return [(record['elapsed_seconds'], len(record['failed_tasks'])) for record in records]
+
+
+RUNNERS = {
+    'kickoff': run_kickoff, 'flow': run_flow, 'async': run_async, 'batch': run_batch,
+    'duplicate': run_duplicate, 'fused': run_fused,
+}
+
+
+class UsageCounter:
+    """Instrumentation sink adding up token usage, fused-call fallbacks, hedges and call latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {'prompt_tokens': 0, 'response_tokens': 0, 'fallback_sections': 0, 'hedges': 0,
+                       'hedge_wins': 0, 'model_fallbacks': 0}
+        self.call_seconds = []
+        self.models = {}
+
+    def handle(self, event):
+        with self._lock:
+            if event['type'] == 'llm_call':
+                self.counts['prompt_tokens'] += event.get('prompt_tokens') or 0
+                self.counts['response_tokens'] += event.get('response_tokens') or 0
+                self.call_seconds.append(event.get('model_time', 0.0))
+                usage = self.models.setdefault(event.get('model'), {'prompt_tokens': 0, 'response_tokens': 0})
+                usage['prompt_tokens'] += event.get('prompt_tokens') or 0
+                usage['response_tokens'] += event.get('response_tokens') or 0
+            elif event['type'] == 'fallback':
+                self.counts['model_fallbacks'] += 1
+            elif event['type'] == 'fused':
+                self.counts['fallback_sections'] += event.get('sections', 0) - event.get('valid', 0)
+            elif event['type'] == 'hedge':
+                self.counts['hedges'] += 1
+                self.counts['hedge_wins'] += 1 if event.get('won') else 0
+
+    def take(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+            self.counts = dict.fromkeys(counts, 0)
+            seconds, self.call_seconds = self.call_seconds, []
+            models, self.models = self.models, {}
+        counts['cost_usd'] = routing.cost(models)
+        # Latency of individual model calls as agents saw them (after any hedging)
+        counts['call_p50'] = round(percentile(seconds, 50), 4)
+        counts['call_p99'] = round(percentile(seconds, 99), 4)
+        counts['hedge_rate'] = round(counts['hedges'] / len(seconds), 4) if seconds else 0.0
+        return counts
+
+
+def fake_backend(models):
+    # Models without a speed of their own behave like flash
+    return lambda name: models.get(name, models['gemini-2.0-flash'])
+
+
+def configure_fake(args):
+    """Install one fake per model; returns them by model name."""
+    samplers = {
+        'constant': lambda latency: fake_model.constant(latency),
+        'uniform': lambda latency: fake_model.uniform(latency / 2, latency * 1.5),
+        'lognormal': lambda latency: fake_model.lognormal(latency, args.sigma),
+        'pareto': lambda latency: fake_model.pareto(latency, args.alpha, cap=latency * 50),
+    }
+    models = {
+        name: fake_model.FakeModel(
+            model_name=name,
+            latency=samplers[args.distribution](args.latency * speed),
+            seed=args.seed,
+            failure_rate=args.failure_rate,
+            throttle_rate=args.throttle_rate,
+            bullet_words=args.bullet_words,
+            seconds_per_token=args.seconds_per_token * speed,
+        )
+        for name, speed in MODEL_SPEED.items()
+    }
+    registry.set_backend(fake_backend(models))
+    # Keep output quiet and make every call reach the model unless asked otherwise
+    options = {'verbose': False}
+    if not args.cache:
+        options['cache'] = None
+    if args.no_singleflight:
+        options['flights'] = None
+    crew_spec.configure_agents(**options)
+    if not args.cache:
+        fused.cache = None
+    if args.no_singleflight:
+        fused.flights = None
+    return models
+
+
+def configure_cassette(args, models):
+    """Record the fakes' calls to --cassette, or replay them from it; returns the cassette."""
+    cassette = Cassette(args.cassette, mode=args.cassette_mode, timing=args.cassette_timing, inner=fake_backend(models))
+    return cassette.install()
+
+
+def run_scenario(name, concurrency, rounds, measure_memory=True):
+    total = concurrency * rounds
+    if measure_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    samples = RUNNERS[name](concurrency, total)
+    elapsed = time.perf_counter() - started
+    peak = 0
+    if measure_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    latencies = [seconds for seconds, _ in samples]
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'analyses': len(samples),
+        'p50': round(percentile(latencies, 50), 4),
+        'p90': round(percentile(latencies, 90), 4),
+        'p95': round(percentile(latencies, 95), 4),
+        'p99': round(percentile(latencies, 99), 4),
+        'max': round(max(latencies, default=0.0), 4),
+        'analyses_per_second': round(len(samples) / elapsed, 3) if elapsed else 0.0,
+        'elapsed_seconds': round(elapsed, 3),
+        'failed_tasks': sum(failed for _, failed in samples),
+        'peak_memory_mb': round(peak / 2 ** 20, 2),
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print per-metric changes against a baseline; return the list of regressions."""
+    def key(r):
+        return r['scenario'], r['concurrency'], r.get('profile', routing.DEFAULT_PROFILE)
+    previous = {key(r): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'scenario':<10}{'conc':>6}  {'metric':<22}{'baseline':>12}{'current':>12}{'change':>10}")
+    for result in current['results']:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        for metric in LATENCY_METRICS + THROUGHPUT_METRICS:
+            before, after = old[metric], result[metric]
+            change = (after - before) / before if before else 0.0
+            worse = change > threshold if metric in LATENCY_METRICS else change < -threshold
+            flag = '  REGRESSION' if worse else ''
+            print(f"{result['scenario']:<10}{result['concurrency']:>6}  {metric:<22}"
+                  f"{before:>12.4f}{after:>12.4f}{change:>+10.1%}{flag}")
+            if worse:
+                regressions.append((result['scenario'], result['concurrency'], metric, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis pipeline offline")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', nargs='+', type=int, default=list(DEFAULT_LEVELS),
+                        help="Concurrent analyses per level")
+    parser.add_argument('--rounds', type=int, default=1, help="Analyses per level = concurrency * rounds")
+    parser.add_argument('--distribution', choices=('constant', 'uniform', 'lognormal', 'pareto'), default='lognormal')
+    parser.add_argument('--latency', type=float, default=0.05, help="Median/scale of a model call in seconds")
+    parser.add_argument('--sigma', type=float, default=0.5, help="Lognormal spread")
+    parser.add_argument('--alpha', type=float, default=1.5, help="Pareto tail index")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Fraction of calls failing with 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Fraction of calls failing with 429")
+    parser.add_argument('--bullet-words', type=int, default=8, help="Words per bullet in fake responses")
+    parser.add_argument('--seconds-per-token', type=float, default=0.0,
+                        help="Generation time per response token (scaled by MODEL_SPEED)")
+    parser.add_argument('--profiles', nargs='+', choices=list(routing.PROFILES), default=[routing.DEFAULT_PROFILE],
+                        help="Routing profiles to run every scenario with")
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--cache', action='store_true', help="Keep the response cache enabled")
+    parser.add_argument('--no-singleflight', action='store_true', help="Send identical concurrent prompts separately")
+    parser.add_argument('--speculate', action='store_true', help="Start tasks on partial upstream output")
+    parser.add_argument('--hedge', action='store_true', help="Send a duplicate request for calls past the p95")
+    parser.add_argument('--hedge-budget', type=float, default=0.05, help="Most duplicate requests per call")
+    parser.add_argument('--cassette', metavar='PATH', help="Record model calls to, or replay them from, this cassette")
+    parser.add_argument('--cassette-mode', choices=('record', 'replay'), default='replay')
+    parser.add_argument('--cassette-timing', choices=('original', 'zero'), default='original',
+                        help="Replay with the recorded latency, or none to measure the pipeline's own overhead")
+    parser.add_argument('--no-memory', action='store_true', help="Skip tracemalloc (it slows runs down)")
+    parser.add_argument('--out', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10, help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    models = configure_fake(args)
+    cassette = configure_cassette(args, models) if args.cassette else None
+    usage = instrumentation.add_sink(UsageCounter())
+    if args.speculate:
+        CREW_OPTIONS['speculate'] = True
+    if args.hedge:
+        hedging.configure(budget=args.hedge_budget)
+    report = {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'config': {k: v for k, v in vars(args).items() if k not in ('out', 'compare')},
+        },
+        'results': [],
+    }
+    for profile in args.profiles:
+        routing.router.reset()
+        for name in args.scenarios:
+            for level in args.concurrency:
+                calls = sum(model.calls for model in models.values())
+                usage.take()
+                with routing.use_profile(profile):
+                    result = run_scenario(name, level, args.rounds, measure_memory=not args.no_memory)
+                result['profile'] = profile
+                # Requests that actually reached the model, after caching and coalescing
+                result['model_calls'] = sum(model.calls for model in models.values()) - calls
+                # Cost (tokens, USD) and, for fused runs, how many sections needed a per-agent call
+                result.update(usage.take())
+                report['results'].append(result)
+                print(f"{name:<8} x{level:<5} {profile:<9} p50={result['p50']:.3f}s p95={result['p95']:.3f}s "
+                      f"p99={result['p99']:.3f}s {result['analyses_per_second']:.2f}/s "
+                      f"peak={result['peak_memory_mb']}MB failed={result['failed_tasks']} "
+                      f"calls={result['model_calls']} tokens={result['prompt_tokens']}/{result['response_tokens']} "
+                      f"cost=${result['cost_usd']:.4f} fallback={result['fallback_sections']} "
+                      f"call_p99={result['call_p99']:.3f}s hedge_rate={result['hedge_rate']:.3f}")
+
+    if cassette is not None:
+        cassette.close()
+        report['cassette'] = cassette.report()
+        print(f"\nCassette {args.cassette} ({args.cassette_mode}): {report['cassette']['hits']} hits, "
+              f"{report['cassette']['loose_hits']} prompt-only hits, {report['cassette']['misses']} misses, "
+              f"{report['cassette']['recorded']} recorded")
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
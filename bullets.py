@@ -0,0 +1,71 @@
+import re
+import threading
+
+MAX_BULLET_LENGTH = 100
+MIN_BULLETS = 3
+MAX_BULLETS = 4
+
+# One pass over the response: "•", "●", "▪" bullets (space optional), and
+# "-", "*", "–" bullets or "1." / "1)" numbering followed by a space
+BULLET_PATTERN = re.compile(
+    r'^[ \t]*(?:([•●▪])[ \t]*|(?:[-*–]|\d{1,2}[.)])[ \t]+)(\S.*?)[ \t]*$',
+    re.MULTILINE
+)
+
+
+class MissingBulletsError(ValueError):
+    """Raised when a response has fewer than MIN_BULLETS usable bullet points."""
+
+    def __init__(self, bullets):
+        super().__init__("Not enough bullet points in response")
+        self.bullets = bullets
+        self.missing = MIN_BULLETS - len(bullets)
+
+
+def _clip(text):
+    line = f"• {text}"
+    # Limit each line to roughly 100 characters
+    if len(line) > MAX_BULLET_LENGTH:
+        line = line[:MAX_BULLET_LENGTH - 3] + '...'
+    return line
+
+
+def parse_bullets(response: str):
+    """Extract bullet points in any common list format, normalized to "• text".
+
+    Returns (bullets, normalized) where normalized is True if any bullet used
+    a marker other than "•".
+    """
+    bullets = []
+    normalized = False
+    for match in BULLET_PATTERN.finditer(response):
+        if not match.group(1):
+            normalized = True
+        bullets.append(_clip(match.group(2)))
+    return bullets, normalized
+
+
+class ParseStats:
+    """Counts how often each response-processing path is taken.
+
+    direct: bullets came back as requested; normalized: accepted after
+    converting another list format; follow_up: a follow-up request was
+    needed for missing bullets; recovered / failed: outcome of follow-ups.
+    """
+
+    PATHS = ('direct', 'normalized', 'follow_up', 'recovered', 'failed')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.PATHS, 0)
+
+    def record(self, path):
+        with self._lock:
+            self._counts[path] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+parse_stats = ParseStats()
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from context import estimate_tokens
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so ideas that differ only in spacing share a key."""
+    return re.sub(r'\s+', ' ', prompt).strip()
+
+
+def make_key(model_name: str, generation_config: dict, prompt: str, system_instruction: str = None) -> str:
+    """Content address for a model call: hash of model, config, system instruction and prompt."""
+    parts = [model_name, generation_config, normalize_prompt(prompt)]
+    if system_instruction is not None:
+        parts.append(normalize_prompt(system_instruction))
+    payload = json.dumps(
+        parts,
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Base class for response caches; subclasses implement _get and _set."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str):
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: str):
+        self._set(key, value)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+
+class MemoryCache(ResponseCache):
+    """In-process LRU cache with a TTL and entry/byte size limits."""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, max_bytes: int = None):
+        super().__init__()
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if self.ttl is not None and expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at)
+            self._bytes += len(value.encode('utf-8'))
+            # Evict least recently used entries until both limits hold
+            while self._entries and (
+                len(self._entries) > self.max_entries
+                or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        value, _ = self._entries.pop(key)
+        self._bytes -= len(value.encode('utf-8'))
+
+
+class SQLiteCache(ResponseCache):
+    """On-disk cache that survives restarts, with TTL and LRU size limit."""
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 100000):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'created_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)')
+        self._conn.commit()
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl is not None and created_at + self.ttl < now:
+                self._conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            return value
+
+    def _set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, value, now, now),
+            )
+            count = self._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    'DELETE FROM responses WHERE key IN '
+                    '(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)',
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def cache_from_env() -> ResponseCache:
+    """Build the shared cache: SQLite when THINKTANK_CACHE_PATH is set, else in-memory."""
+    path = os.getenv('THINKTANK_CACHE_PATH')
+    if path:
+        return SQLiteCache(path)
+    return MemoryCache()
+
+
+class PrefixLedger:
+    """Accounts for prompt tokens served from the provider's prefix cache.
+
+    Gemini reports cached_content_token_count when a system instruction (or
+    other prefix) was served from its cache. When a response carries no such
+    figure, the ledger estimates it: the first call with a given model and
+    system instruction pays for the whole prefix, later calls are assumed to
+    reuse it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seen = set()
+
+    def account(self, model_name: str, system_instruction: str, usage=None):
+        """Return (cached prompt tokens, 'provider' or 'estimate') for one call."""
+        key = (model_name, hashlib.sha256(system_instruction.encode('utf-8')).hexdigest())
+        with self._lock:
+            reused = key in self._seen
+            self._seen.add(key)
+        reported = getattr(usage, 'cached_content_token_count', None)
+        if reported is not None:
+            return reported, 'provider'
+        return (estimate_tokens(system_instruction) if reused else 0), 'estimate'
+
+    def reset(self):
+        with self._lock:
+            self._seen.clear()
@@ -0,0 +1,391 @@
+"""Record model calls to a cassette once, then replay them without the network.
+
+A Cassette sits under Agent.run as the model backend (clients.registry). In
+'record' mode every call goes to the real model (Gemini, or the factory
+given as inner) and the exchange is written down: model, generation config,
+prompt hashes, response text (and stream chunks), usage and latency. In
+'replay' mode calls are answered from the cassette, with their original
+timing or with none ('zero'), and calls it has no recording of fail with
+CassetteMiss and are listed by report(). 'auto' replays what it can and
+records the rest.
+
+Calls match on the hash of model, generation config, system instruction and
+prompt. When only the prompt (with its system instruction) matches, for
+example because the run uses another routing profile, the closest recording
+is used unless strict=True. A prompt recorded several times is replayed in
+the order it was recorded.
+
+A cassette is a gzip-compressed JSON Lines file: a header line, then one line
+per call. Records are flushed as they are written, so a cassette cut short by
+a crash still replays everything up to that point. Record from one process at
+a time; any number of processes can replay the same cassette.
+
+Example:
+    python cassette.py record calls.jsonl.gz --idea "A marketplace for local repair shops"
+    python cassette.py replay calls.jsonl.gz --idea "A marketplace for local repair shops" --timing zero --cprofile
+    THINKTANK_CASSETTE=calls.jsonl.gz streamlit run app.py
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import threading
+import time
+
+from cache import make_key
+from clients import registry
+
+VERSION = 1
+MODES = ('record', 'replay', 'auto')
+TIMINGS = ('original', 'zero')
+# Misses kept for report(); the count covers all of them
+MAX_REPORTED_MISSES = 50
+# Characters of a missed prompt shown in report()
+PREVIEW_CHARS = 80
+USAGE_FIELDS = ('prompt_token_count', 'candidates_token_count', 'total_token_count', 'cached_content_token_count')
+
+
+class CassetteMiss(LookupError):
+    """Raised on replay for a call the cassette has no recording of."""
+
+
+class RecordedUsage:
+    def __init__(self, usage: dict):
+        for field in USAGE_FIELDS:
+            setattr(self, field, usage.get(field))
+
+
+class RecordedResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+def prompt_hash(prompt: str, system_instruction: str = None) -> str:
+    """Hash of what a call asks, whatever the model and config it was sent with."""
+    return make_key('', None, prompt, system_instruction)[:16]
+
+
+def call_key(model_name: str, generation_config: dict, prompt: str, system_instruction: str = None) -> str:
+    return make_key(model_name, generation_config, prompt, system_instruction)[:16]
+
+
+def _usage(response) -> dict:
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return {}
+    return {field: getattr(usage, field, None) for field in USAGE_FIELDS if getattr(usage, field, None) is not None}
+
+
+class Cassette:
+    """Model backend that records calls to, or replays them from, the cassette at path.
+
+    inner is the factory (like clients.ModelRegistry.set_backend's) calls are
+    recorded from; None records from Gemini. timing is 'original' or 'zero'.
+    """
+
+    def __init__(self, path: str, mode: str = 'replay', timing: str = 'original', inner=None, strict: bool = False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {', '.join(MODES)}")
+        if timing not in TIMINGS:
+            raise ValueError(f"Unknown cassette timing {timing!r}; expected one of {', '.join(TIMINGS)}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.inner = inner
+        self.strict = strict
+        self.hits = 0
+        self.loose_hits = 0
+        self.recorded = 0
+        self.misses = 0
+        self.missed = []
+        self._lock = threading.Lock()
+        self._records = {}  # prompt hash -> records, in recorded order
+        self._replayed = {}  # prompt hash -> how many of its records were replayed
+        self._file = None
+        if mode != 'record' and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            records = []
+            try:
+                for line in f:
+                    records.append(json.loads(line))
+            except (EOFError, json.JSONDecodeError):
+                # Cut short while recording: keep every complete record before the break
+                pass
+        for record in records:
+            if 'cassette' in record:
+                if record['cassette'] > VERSION:
+                    raise ValueError(f"{self.path}: cassette version {record['cassette']} is not supported")
+                continue
+            self._records.setdefault(record['prompt_hash'], []).append(record)
+
+    def __len__(self):
+        return sum(len(records) for records in self._records.values())
+
+    def model(self, model_name: str):
+        """Factory for clients.ModelRegistry.set_backend()."""
+        return CassetteModel(self, model_name)
+
+    def install(self, models=registry):
+        """Serve every model call in this process through the cassette."""
+        models.set_backend(self.model)
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _lookup(self, model_name, config, prompt, system_instruction):
+        """The next recording for a call, or None."""
+        phash = prompt_hash(prompt, system_instruction)
+        key = call_key(model_name, config, prompt, system_instruction)
+        with self._lock:
+            records = self._records.get(phash, [])
+            exact = [record for record in records if record['key'] == key]
+            candidates = exact or ([] if self.strict else records)
+            if not candidates:
+                return None
+            # Prompts recorded several times replay in order, then start over
+            count = self._replayed.get(phash, 0)
+            self._replayed[phash] = count + 1
+            if exact:
+                self.hits += 1
+            else:
+                self.loose_hits += 1
+            return candidates[count % len(candidates)]
+
+    def _miss(self, model_name, prompt, system_instruction):
+        with self._lock:
+            self.misses += 1
+            if len(self.missed) < MAX_REPORTED_MISSES:
+                self.missed.append({
+                    'model': model_name,
+                    'prompt_hash': prompt_hash(prompt, system_instruction),
+                    'prompt': ' '.join(prompt.split())[:PREVIEW_CHARS],
+                })
+        return CassetteMiss(f"No recording of this {model_name} call in {self.path}")
+
+    def _write(self, model_name, config, prompt, system_instruction, text, usage, latency, chunks=None):
+        record = {
+            'key': call_key(model_name, config, prompt, system_instruction),
+            'prompt_hash': prompt_hash(prompt, system_instruction),
+            'model': model_name,
+            'config': config,
+            'prompt': prompt,
+            'text': text,
+            'usage': usage,
+            'latency': round(latency, 4),
+        }
+        if chunks is not None:
+            # (seconds from the start of the call, chunk text)
+            record['chunks'] = [[round(offset, 4), chunk] for offset, chunk in chunks]
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            if self._file is None:
+                fresh = self.mode == 'record' or not os.path.exists(self.path)
+                self._file = gzip.open(self.path, 'wt' if fresh else 'at', encoding='utf-8')
+                if fresh:
+                    self._file.write(json.dumps({'cassette': VERSION, 'created': time.time()}) + '\n')
+            self._file.write(line)
+            self._file.flush()
+            self.recorded += 1
+            self._records.setdefault(record['prompt_hash'], []).append(record)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                'path': self.path,
+                'mode': self.mode,
+                'recordings': len(self),
+                'hits': self.hits,
+                'loose_hits': self.loose_hits,
+                'misses': self.misses,
+                'recorded': self.recorded,
+                'missed': list(self.missed),
+            }
+
+
+class CassetteModel:
+    """One model (and system instruction) as the cassette serves it."""
+
+    def __init__(self, cassette: Cassette, model_name: str, system_instruction: str = None):
+        self.cassette = cassette
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+        self._inner = None
+
+    def with_system_instruction(self, system_instruction):
+        return CassetteModel(self.cassette, self.model_name, system_instruction)
+
+    def _real(self):
+        """The model calls are recorded from, built on first use."""
+        if self._inner is None:
+            inner = self.cassette.inner
+            if inner is None:
+                model = registry.gemini(self.model_name, self.system_instruction)
+            else:
+                model = inner(self.model_name)
+                if self.system_instruction and hasattr(model, 'with_system_instruction'):
+                    model = model.with_system_instruction(self.system_instruction)
+            self._inner = model
+        return self._inner
+
+    def _recording(self, prompt, generation_config):
+        """The recording to replay for a call; None means the call should be recorded."""
+        cassette = self.cassette
+        if cassette.mode == 'record':
+            return None
+        record = cassette._lookup(self.model_name, generation_config, prompt, self.system_instruction)
+        if record is None and cassette.mode == 'replay':
+            raise cassette._miss(self.model_name, prompt, self.system_instruction)
+        return record
+
+    def _delay(self, seconds):
+        return seconds if self.cassette.timing == 'original' else 0.0
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        record = self._recording(prompt, generation_config)
+        if record is not None:
+            if stream:
+                return self._replay_stream(record)
+            delay = self._delay(record['latency'])
+            if delay:
+                time.sleep(delay)
+            return RecordedResponse(record['text'], RecordedUsage(record['usage']))
+        if stream:
+            return self._record_stream(prompt, generation_config, kwargs)
+        started = time.perf_counter()
+        response = self._real().generate_content(prompt, generation_config=generation_config, **kwargs)
+        self.cassette._write(self.model_name, generation_config, prompt, self.system_instruction, response.text,
+                             _usage(response), time.perf_counter() - started)
+        return response
+
+    def _replay_stream(self, record):
+        usage = RecordedUsage(record['usage'])
+        chunks = record.get('chunks') or [[record['latency'], record['text']]]
+        started = time.perf_counter()
+        for offset, text in chunks:
+            wait = self._delay(offset) - (time.perf_counter() - started)
+            if wait > 0:
+                time.sleep(wait)
+            yield RecordedResponse(text, usage)
+
+    def _record_stream(self, prompt, generation_config, kwargs):
+        started = time.perf_counter()
+        chunks = []
+        last = None
+        for chunk in self._real().generate_content(prompt, generation_config=generation_config, stream=True,
+                                                   **kwargs):
+            last = chunk
+            text = chunk.text
+            if text:
+                chunks.append((time.perf_counter() - started, text))
+            yield chunk
+        # Only streams read to the end are recorded
+        self.cassette._write(self.model_name, generation_config, prompt, self.system_instruction,
+                             ''.join(text for _, text in chunks), _usage(last), time.perf_counter() - started,
+                             chunks)
+
+    async def generate_content_async(self, prompt, generation_config=None, **kwargs):
+        record = self._recording(prompt, generation_config)
+        if record is not None:
+            delay = self._delay(record['latency'])
+            if delay:
+                await asyncio.sleep(delay)
+            return RecordedResponse(record['text'], RecordedUsage(record['usage']))
+        started = time.perf_counter()
+        response = await self._real().generate_content_async(prompt, generation_config=generation_config, **kwargs)
+        self.cassette._write(self.model_name, generation_config, prompt, self.system_instruction, response.text,
+                             _usage(response), time.perf_counter() - started)
+        return response
+
+
+def cassette_from_env():
+    """The cassette at THINKTANK_CASSETTE (THINKTANK_CASSETTE_MODE, THINKTANK_CASSETTE_TIMING), or None."""
+    path = os.getenv('THINKTANK_CASSETTE')
+    if not path:
+        return None
+    return Cassette(path, mode=os.getenv('THINKTANK_CASSETTE_MODE', 'replay'),
+                    timing=os.getenv('THINKTANK_CASSETTE_TIMING', 'original'))
+
+
+def install_from_env():
+    """Install cassette_from_env() as the model backend, if one is configured; returns it."""
+    cassette = cassette_from_env()
+    if cassette is not None:
+        cassette.install()
+    return cassette
+
+
+def _print_report(report):
+    print(f"Cassette {report['path']} ({report['mode']}): {report['recordings']} recordings, {report['hits']} hits, "
+          f"{report['loose_hits']} prompt-only hits, {report['misses']} misses, {report['recorded']} recorded")
+    for miss in report['missed']:
+        print(f"  missed {miss['model']} {miss['prompt_hash']}: {miss['prompt']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record analyses to a cassette, or replay them from one")
+    parser.add_argument('command', choices=('record', 'replay', 'show'))
+    parser.add_argument('path', help="Cassette file (.jsonl.gz)")
+    parser.add_argument('--idea', action='append', default=[], help="Startup idea to analyze (repeatable)")
+    parser.add_argument('--ideas-file', help="File with one startup idea per line")
+    parser.add_argument('--mode', default='crew', help="Analysis mode (crew or fused)")
+    parser.add_argument('--profile', dest='routing_profile', help="Routing profile (fast, balanced, thorough)")
+    parser.add_argument('--timing', choices=TIMINGS, default='original', help="Replay with recorded or no latency")
+    parser.add_argument('--strict', action='store_true', help="Only replay exact model and config matches")
+    parser.add_argument('--cprofile', action='store_true', help="Profile the replay and print the top functions")
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        cassette = Cassette(args.path, mode='replay')
+        for records in cassette._records.values():
+            for record in records:
+                print(f"{record['prompt_hash']} {record['model']:<24} {record['latency']:7.3f}s "
+                      f"{' '.join(record['prompt'].split())[:PREVIEW_CHARS]}")
+        print(f"{len(cassette)} recordings")
+        return
+
+    import crew_spec
+    import fused
+    from example_task_flow import create_startup_analysis_flow
+
+    ideas = list(args.idea)
+    if args.ideas_file:
+        with open(args.ideas_file, encoding='utf-8') as f:
+            ideas.extend(line.strip() for line in f if line.strip())
+    if not ideas:
+        parser.error("give at least one --idea or an --ideas-file")
+    cassette = Cassette(args.path, mode=args.command, timing=args.timing, strict=args.strict).install()
+    # Every call should reach the cassette rather than the response cache
+    crew_spec.configure_agents(verbose=False, cache=None)
+    fused.cache = None
+
+    def run():
+        for idea in ideas:
+            started = time.perf_counter()
+            create_startup_analysis_flow(idea, verbose=0, mode=args.mode, profile=args.routing_profile)
+            print(f"{time.perf_counter() - started:8.3f}s  {idea[:PREVIEW_CHARS]}")
+
+    try:
+        if args.cprofile:
+            import cProfile
+            import pstats
+            profiler = cProfile.Profile()
+            profiler.runcall(run)
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+        else:
+            run()
+    finally:
+        cassette.close()
+    _print_report(cassette.report())
+
+
+if __name__ == '__main__':
+    main()
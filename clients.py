@@ -0,0 +1,65 @@
+import os
+import threading
+
+
+class ModelRegistry:
+    """Process-wide, lazily created model clients shared by all agents.
+
+    The Gemini SDK is imported and configured on the first request for a model,
+    not at import time, and each (model name, system instruction) pair is built
+    once no matter how many agents or threads use it, so the instruction is
+    sent as a stable, cacheable prefix. Call set_backend() with a factory
+    taking a model name to serve a local stand-in (e.g. fake_model.FakeModel,
+    or a cassette.Cassette replaying recorded calls) instead; stand-ins with a
+    with_system_instruction() method receive it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._models = {}
+        self._factory = None
+        self._configured = False
+
+    def set_backend(self, factory):
+        """Use factory(model_name) to build models; None restores Gemini."""
+        with self._lock:
+            self._factory = factory
+            self._models.clear()
+
+    def reset(self):
+        """Drop every cached model so the next get() builds a fresh one."""
+        with self._lock:
+            self._models.clear()
+
+    def get(self, model_name: str, system_instruction: str = None):
+        key = (model_name, system_instruction)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._lock:
+            # Another thread may have built it while we waited for the lock
+            model = self._models.get(key)
+            if model is None:
+                if self._factory is None:
+                    model = self.gemini(model_name, system_instruction)
+                else:
+                    model = self._factory(model_name)
+                    if system_instruction and hasattr(model, 'with_system_instruction'):
+                        model = model.with_system_instruction(system_instruction)
+                self._models[key] = model
+            return model
+
+    def gemini(self, model_name: str, system_instruction: str = None):
+        """A new Gemini model, whatever the backend (used by get() when there is none)."""
+        import google.generativeai as genai
+
+        if not self._configured:
+            GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+            if not GOOGLE_API_KEY:
+                raise ValueError("GOOGLE_API_KEY environment variable not set")
+            genai.configure(api_key=GOOGLE_API_KEY)
+            self._configured = True
+        return genai.GenerativeModel(model_name, system_instruction=system_instruction)
+
+
+registry = ModelRegistry()
@@ -0,0 +1,86 @@
+import threading
+from typing import Dict, Optional
+
+# Rough conversion used for budgeting; Gemini averages about four characters per token
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the number of tokens a piece of text costs in a prompt."""
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def context_tokens(results: Dict[str, str]) -> int:
+    """Tokens taken by results as rendered in the CONTEXT FROM PREVIOUS ANALYSES block."""
+    return sum(estimate_tokens(f"{label}: {result}\n") for label, result in results.items())
+
+
+def digest(result: str, token_budget: int) -> str:
+    """Compact a bullet-point result to fit within token_budget.
+
+    Every bullet keeps its leading words so each insight is still represented,
+    rather than dropping whole bullets from the end.
+    """
+    if estimate_tokens(result) <= token_budget:
+        return result
+    lines = [line.strip() for line in result.split('\n') if line.strip()]
+    if not lines:
+        return ''
+    chars_per_line = max(16, token_budget * CHARS_PER_TOKEN // len(lines))
+    compacted = []
+    for line in lines:
+        if len(line) > chars_per_line:
+            cut = line[:chars_per_line - 1].rsplit(' ', 1)[0]
+            line = cut + '…'
+        compacted.append(line)
+    return '\n'.join(compacted)
+
+
+class ContextSelector:
+    """Chooses which upstream results a task sees and how much of them.
+
+    Each task receives only the results listed in Task.context (or, by
+    default, its direct dependencies). With digest=True those results are
+    additionally compacted to the task's token budget (Task.context_budget,
+    falling back to token_budget). Per-task token counts are recorded against
+    the baseline of pasting every available upstream result in full.
+    """
+
+    def __init__(self, digest: bool = False, token_budget: int = 300):
+        self.digest = digest
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self._tasks = {}
+
+    def start_run(self):
+        with self._lock:
+            self._tasks = {}
+
+    def select(self, description: str, selected: Dict[str, str], available: Dict[str, str],
+               token_budget: Optional[int] = None) -> Dict[str, str]:
+        context = dict(selected)
+        if self.digest and context:
+            budget = token_budget or self.token_budget
+            per_result = max(1, budget // len(context))
+            context = {label: digest(result, per_result) for label, result in context.items()}
+
+        baseline = context_tokens(available)
+        sent = context_tokens(context)
+        with self._lock:
+            self._tasks[description] = {'baseline_tokens': baseline, 'sent_tokens': sent}
+        return context
+
+    def report(self) -> dict:
+        """Input tokens sent vs. the full-context baseline for the last run."""
+        with self._lock:
+            tasks = {description: dict(counts) for description, counts in self._tasks.items()}
+        baseline = sum(counts['baseline_tokens'] for counts in tasks.values())
+        sent = sum(counts['sent_tokens'] for counts in tasks.values())
+        return {
+            'baseline_tokens': baseline,
+            'sent_tokens': sent,
+            'saved_tokens': baseline - sent,
+            'tasks': tasks,
+        }
@@ -0,0 +1,337 @@
+"""Crews defined in a JSON or YAML file instead of code.
+
+A crew spec declares the agents (role, goal, backstory and, optionally, their
+own prompt template), the tasks they run and how app.py lays out the results:
+
+    {
+      "name": "startup_analysis",
+      "agents": {"market_research": {"role": ..., "goal": ..., "backstory": ...}, ...},
+      "tasks": [
+        {"id": "market", "description": ..., "agent": "market_research"},
+        {"id": "gtm", "description": ..., "agent": "gtm_strategy", "depends_on": ["market", "personas"],
+         "context": ["market"], "optional": true, "context_budget": 600, "topics": "launch channel ..."},
+        ...
+      ],
+      "layout": {"columns": [[{"title": ..., "sections": [{"task": "market", "label": ...}]}], ...],
+                 "full_width": [...]}
+    }
+
+Tasks depend on nothing unless depends_on says so; context, optional and
+context_budget mean what they do on tasks.Task, and topics are extra words
+IncrementalAnalyzer matches edits against. Tasks the layout leaves out are
+shown in a card of their own.
+
+load() validates a spec and compiles it once: the agents with their prompt
+templates and system instructions, and the task graph (order, context
+sources, chain lengths). Every analysis then only builds fresh Task objects
+around the shared agents and graph (CrewSpec.build_crew).
+
+The spec in use is CREW_PATH (THINKTANK_CREW_PATH, by default
+crews/startup_analysis.json). current() reloads it when the file changes, so
+an edited spec applies to the next analysis without a restart; an edit that
+fails validation is reported and the previous spec stays in use. YAML specs
+need PyYAML.
+"""
+import json
+import os
+import threading
+
+from agents import Agent, PromptTemplate, response_cache
+from context import ContextSelector
+from singleflight import flights as shared_flights
+from tasks import Crew, Speculation, Task
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'crews', 'startup_analysis.json')
+CREW_PATH = os.getenv('THINKTANK_CREW_PATH') or DEFAULT_PATH
+
+AGENT_FIELDS = ('role', 'goal', 'backstory', 'prompt')
+TASK_FIELDS = ('id', 'description', 'agent', 'depends_on', 'context', 'optional', 'context_budget', 'topics')
+# Title of the card for tasks the layout does not place
+UNPLACED_TITLE = "📋 More"
+
+# Settings of every agent a spec creates; change them with configure_agents()
+agent_options = {'verbose': True, 'cache': response_cache, 'flights': shared_flights}
+
+
+class SpecError(ValueError):
+    """Raised for a crew spec that cannot be read or is not valid."""
+
+
+class CrewSpec:
+    """A validated, compiled crew spec; build_crew() makes a runnable Crew from it."""
+
+    def __init__(self, name, agents, tasks, layout, max_workers=None, description='', path=None, mtime=None):
+        self.name = name
+        self.description = description
+        # Agent key -> agents.Agent, shared by every crew built from this spec
+        self.agents = agents
+        # One dict per task, with depends_on and context as task indices
+        self.tasks = tasks
+        # {'columns': [[(title, [(task description, label)])]], 'full_width': [...]}
+        self.layout = layout
+        self.path = path
+        self.mtime = mtime
+        self.descriptions = [task['description'] for task in tasks]
+        # Task description -> words for IncrementalAnalyzer
+        self.topics = {task['description']: task['topics'] for task in tasks}
+        try:
+            self.graph = Crew(list(agents.values()), self._tasks()).compile_graph()
+        except ValueError as e:
+            raise SpecError(f"{self._source()}: {e}") from None
+        # Enough workers for the widest stage of the graph unless the spec says otherwise
+        self.max_workers = max_workers or _widest_stage(self.graph)
+
+    def _source(self):
+        return self.path or self.name
+
+    def _tasks(self):
+        tasks = [
+            Task(spec['description'], self.agents[spec['agent']], context_budget=spec['context_budget'],
+                 optional=spec['optional'])
+            for spec in self.tasks
+        ]
+        # Linked once every task exists, since a task may name one declared after it
+        for task, spec in zip(tasks, self.tasks):
+            task.depends_on = [tasks[i] for i in spec['depends_on']]
+            if spec['context'] is not None:
+                task.context = [tasks[i] for i in spec['context']]
+        return tasks
+
+    def build_crew(self, compact_context: bool = False, verbose: int = 2, speculate: bool = False) -> Crew:
+        """A Crew for one run: fresh tasks around this spec's agents and compiled graph.
+
+        Each task only sees the upstream results relevant to its role; with
+        compact_context=True those results are also digested to a token budget.
+        speculate=True lets tasks start on partial upstream output (tasks.Speculation).
+        """
+        return Crew(
+            agents=list(self.agents.values()),
+            tasks=self._tasks(),
+            verbose=verbose,
+            max_workers=self.max_workers,
+            context_selector=ContextSelector(digest=compact_context),
+            speculation=Speculation() if speculate else None,
+            graph=self.graph,
+        )
+
+
+def _widest_stage(graph):
+    depth = {}
+    for i in graph['order']:
+        depth[i] = max((depth[dep] + 1 for dep in graph['dependencies'][i]), default=0)
+    stages = list(depth.values())
+    return max(stages.count(stage) for stage in set(stages))
+
+
+def _text(value, what, required=True):
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or not value.strip():
+        raise SpecError(f"{what} must be a non-empty string")
+    return value
+
+
+def _check_fields(entry, fields, what):
+    if not isinstance(entry, dict):
+        raise SpecError(f"{what} must be an object")
+    unknown = sorted(set(entry) - set(fields))
+    if unknown:
+        raise SpecError(f"{what} has unknown field(s) {', '.join(unknown)}; expected {', '.join(fields)}")
+
+
+def _parse_agents(data):
+    agents = data.get('agents')
+    if not isinstance(agents, dict) or not agents:
+        raise SpecError("'agents' must be an object with at least one agent")
+    parsed = {}
+    for key, entry in agents.items():
+        what = f"Agent '{key}'"
+        _check_fields(entry, AGENT_FIELDS, what)
+        prompt = _text(entry.get('prompt'), f"{what} prompt", required=False)
+        try:
+            template = PromptTemplate(prompt) if prompt is not None else None
+        except ValueError as e:
+            raise SpecError(f"{what}: {e}") from None
+        parsed[key] = Agent(
+            role=_text(entry.get('role'), f"{what} role"),
+            goal=_text(entry.get('goal'), f"{what} goal"),
+            backstory=_text(entry.get('backstory'), f"{what} backstory"),
+            prompt=template,
+            **agent_options
+        )
+    return parsed
+
+
+def _parse_tasks(data, agents):
+    tasks = data.get('tasks')
+    if not isinstance(tasks, list) or not tasks:
+        raise SpecError("'tasks' must be a list with at least one task")
+    index_of = {}
+    parsed = []
+    for n, entry in enumerate(tasks, 1):
+        _check_fields(entry, TASK_FIELDS, f"Task {n}")
+        task_id = _text(entry.get('id'), f"Task {n} id")
+        what = f"Task '{task_id}'"
+        if task_id in index_of:
+            raise SpecError(f"{what} is defined twice")
+        description = _text(entry.get('description'), f"{what} description")
+        if any(task['description'] == description for task in parsed):
+            raise SpecError(f"{what} has the same description as another task")
+        agent = _text(entry.get('agent'), f"{what} agent")
+        if agent not in agents:
+            raise SpecError(f"{what} uses unknown agent '{agent}'")
+        budget = entry.get('context_budget')
+        if budget is not None and (isinstance(budget, bool) or not isinstance(budget, int) or budget <= 0):
+            raise SpecError(f"{what} context_budget must be a positive number of tokens")
+        if not isinstance(entry.get('optional', False), bool):
+            raise SpecError(f"{what} optional must be true or false")
+        if not isinstance(entry.get('topics', ''), str):
+            raise SpecError(f"{what} topics must be a string of words")
+        index_of[task_id] = len(parsed)
+        parsed.append({
+            'id': task_id,
+            'description': description,
+            'agent': agent,
+            'depends_on': entry.get('depends_on', []),
+            'context': entry.get('context'),
+            'optional': entry.get('optional', False),
+            'context_budget': budget,
+            'topics': entry.get('topics') or '',
+        })
+    # References can point at later tasks, so they are resolved once every id is known
+    for task in parsed:
+        for field in ('depends_on', 'context'):
+            ids = task[field]
+            if ids is None:
+                continue
+            if not isinstance(ids, list) or not all(isinstance(task_id, str) for task_id in ids):
+                raise SpecError(f"Task '{task['id']}' {field} must be a list of task ids")
+            unknown = [task_id for task_id in ids if task_id not in index_of]
+            if unknown:
+                raise SpecError(f"Task '{task['id']}' {field} names unknown task(s) {', '.join(unknown)}")
+            task[field] = [index_of[task_id] for task_id in ids]
+    return parsed, index_of
+
+
+def _parse_cards(cards, index_of, tasks, placed, what):
+    if not isinstance(cards, list):
+        raise SpecError(f"{what} must be a list of cards")
+    parsed = []
+    for card in cards:
+        _check_fields(card, ('title', 'sections'), f"Card in {what}")
+        title = _text(card.get('title'), f"Card title in {what}")
+        sections = []
+        for section in card.get('sections') or []:
+            _check_fields(section, ('task', 'label'), f"Section of card '{title}'")
+            task_id = _text(section.get('task'), f"Section task in card '{title}'")
+            if task_id not in index_of:
+                raise SpecError(f"Card '{title}' shows unknown task '{task_id}'")
+            if task_id in placed:
+                raise SpecError(f"Task '{task_id}' appears in the layout more than once")
+            placed.add(task_id)
+            description = tasks[index_of[task_id]]['description']
+            sections.append((description, _text(section.get('label', description), f"Label of '{task_id}'")))
+        parsed.append((title, sections))
+    return parsed
+
+
+def _parse_layout(data, tasks, index_of):
+    layout = data.get('layout') or {}
+    _check_fields(layout, ('columns', 'full_width'), "'layout'")
+    placed = set()
+    columns = [_parse_cards(cards, index_of, tasks, placed, "a layout column")
+               for cards in layout.get('columns') or []]
+    full_width = _parse_cards(layout.get('full_width') or [], index_of, tasks, placed, "'full_width'")
+    unplaced = [(task['description'], task['description']) for task in tasks if task['id'] not in placed]
+    if unplaced:
+        full_width.append((UNPLACED_TITLE, unplaced))
+    return {'columns': columns, 'full_width': full_width}
+
+
+def parse(data, path=None, mtime=None) -> CrewSpec:
+    """Validate and compile a crew spec already read into dicts and lists."""
+    source = path or '<crew spec>'
+    try:
+        _check_fields(data, ('name', 'description', 'max_workers', 'agents', 'tasks', 'layout'), "A crew spec")
+        max_workers = data.get('max_workers')
+        if max_workers is not None and (isinstance(max_workers, bool) or not isinstance(max_workers, int)
+                                        or max_workers < 1):
+            raise SpecError("'max_workers' must be a positive integer")
+        agents = _parse_agents(data)
+        tasks, index_of = _parse_tasks(data, agents)
+        layout = _parse_layout(data, tasks, index_of)
+        name = _text(data.get('name', os.path.splitext(os.path.basename(source))[0]), "'name'")
+    except SpecError as e:
+        raise SpecError(f"{source}: {e}") from None
+    return CrewSpec(name, agents, tasks, layout, max_workers, data.get('description') or '', path, mtime)
+
+
+def load(path: str) -> CrewSpec:
+    """Read, validate and compile the crew spec at path (.json, or .yaml/.yml with PyYAML)."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+    except OSError as e:
+        raise SpecError(f"{path}: cannot read crew spec ({e.strerror or e})") from None
+    if path.endswith(('.yaml', '.yml')):
+        try:
+            import yaml
+        except ImportError:
+            raise SpecError(f"{path}: YAML crew specs need PyYAML (pip install pyyaml)") from None
+        try:
+            data = yaml.safe_load(text)
+        except yaml.YAMLError as e:
+            raise SpecError(f"{path}: not valid YAML ({e})") from None
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise SpecError(f"{path}: not valid JSON ({e})") from None
+    return parse(data, path, mtime)
+
+
+_lock = threading.Lock()
+_current = None
+# (path, mtime) of the last version of the file that failed to load
+_failed = None
+
+
+def current() -> CrewSpec:
+    """The spec at CREW_PATH, loaded again whenever the file has changed.
+
+    Once a spec is loaded, a changed file that fails to load is reported
+    once and the spec already loaded stays in use.
+    """
+    global _current, _failed
+    path = CREW_PATH
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        mtime = None
+    with _lock:
+        spec = _current
+        if spec is not None and spec.path == path and (spec.mtime == mtime or _failed == (path, mtime)):
+            return spec
+        try:
+            _current = load(path)
+        except SpecError as e:
+            if spec is None or spec.path != path:
+                raise
+            _failed = (path, mtime)
+            print(f"Keeping crew spec '{spec.name}': {e}")
+            return spec
+        if spec is not None:
+            print(f"Reloaded crew spec '{_current.name}' from {path}")
+        return _current
+
+
+def configure_agents(**options):
+    """Change settings (verbose, cache, flights) of the current spec's agents and of every spec loaded later."""
+    agent_options.update(options)
+    with _lock:
+        spec = _current
+    if spec is not None:
+        for agent in spec.agents.values():
+            for name, value in options.items():
+                setattr(agent, name, value)
@@ -0,0 +1,166 @@
+"""Time budgets for analyses, and the per-call deadlines derived from them.
+
+A Deadline is the budget for one run. Crew.kickoff (and akickoff) take one
+directly, or pick up the one installed with use(); flows and jobs take a
+number of seconds. Before each task starts the crew compares the time left
+with what that task and the longest chain of tasks after it still need, and
+degrades in stages:
+
+    normal   enough time for every remaining stage
+    brief    not enough: the task asks for three bullets with a small output
+             budget (BRIEF_OUTPUT_TOKENS), which takes about brief_ratio of
+             the time
+    skipped  not even that: optional tasks (Task(optional=True)) are skipped;
+             required tasks still run brief
+
+Every task's agent runs under a sub-deadline (scope()) that leaves time for
+the tasks after it. Below the agent, the rate limiter stops waiting and
+retrying once it passes, and model requests carry a matching timeout. When
+the run's deadline passes the crew returns at once and tasks that have not
+finished are reported as pending; JobQueue can finish them in the background.
+
+Example:
+    with deadlines.use(Deadline(20)):
+        results = crew.kickoff(idea)
+    results.summary['task_status']  # description -> done | brief | skipped | pending | ...
+"""
+import contextlib
+import contextvars
+import time
+
+# Output budget of a brief (deadline-pressed) agent call
+BRIEF_OUTPUT_TOKENS = 128
+# Requests never get a timeout shorter than this, so they can still succeed
+MIN_REQUEST_TIMEOUT = 1.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised instead of waiting or retrying past the current deadline."""
+
+
+class Deadline:
+    """Budget of `seconds` for one run; the clock starts at its first use (begin()).
+
+    task_seconds is the expected duration of a task until tasks of this run
+    have finished and their average can be used instead. Each task gets at
+    least min_task_seconds before its sub-deadline. Use one Deadline per run.
+    """
+
+    def __init__(self, seconds: float, task_seconds: float = 8.0, brief_ratio: float = 0.6,
+                 min_task_seconds: float = 1.0):
+        self.seconds = seconds
+        self.task_seconds = task_seconds
+        self.brief_ratio = brief_ratio
+        self.min_task_seconds = min_task_seconds
+        self.end = None
+
+    def begin(self) -> float:
+        """Start the clock if it has not started; returns the run's end (time.monotonic())."""
+        if self.end is None:
+            self.end = time.monotonic() + self.seconds
+        return self.end
+
+    def remaining(self) -> float:
+        return max(0.0, self.begin() - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def stage(self, chain: int, estimate: float = None, optional: bool = False):
+        """How to run a task followed by `chain` more stages: (stage, sub-deadline).
+
+        stage is 'normal', 'brief', 'skipped' or, once the budget is spent,
+        'pending'; the sub-deadline is a time.monotonic() value, or None for
+        tasks that do not run.
+        """
+        estimate = estimate or self.task_seconds
+        now = time.monotonic()
+        left = self.begin() - now
+        if left <= 0:
+            return 'pending', None
+        if left >= (1 + chain) * estimate:
+            stage = 'normal'
+        elif left >= (1 + chain) * estimate * self.brief_ratio or not optional:
+            stage = 'brief'
+        else:
+            return 'skipped', None
+        # Leave the tasks after this one enough time to run brief
+        sub_deadline = self.end - chain * estimate * self.brief_ratio
+        return stage, min(self.end, max(sub_deadline, now + self.min_task_seconds))
+
+
+def budget(deadline):
+    """A Deadline from seconds (or an existing Deadline, or None)."""
+    if deadline is None or isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(float(deadline))
+
+
+_budget = contextvars.ContextVar('thinktank_budget', default=None)
+_call_deadline = contextvars.ContextVar('thinktank_call_deadline', default=None)
+
+
+@contextlib.contextmanager
+def use(deadline=None):
+    """Run crews started in this context (and tasks started from it) under deadline.
+
+    deadline is a Deadline or a number of seconds; None keeps the current one.
+    """
+    deadline = budget(deadline)
+    if deadline is None:
+        yield
+        return
+    token = _budget.set(deadline)
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+
+
+def within(stream, deadline=None):
+    """Wrap a TaskEvent generator so it runs under deadline; returns the same value."""
+    with use(deadline):
+        return (yield from stream)
+
+
+def current():
+    """The Deadline of the run in this context, or None."""
+    return _budget.get()
+
+
+@contextlib.contextmanager
+def scope(at: float = None):
+    """Make at (a time.monotonic() value) the deadline of calls in this context.
+
+    Nested scopes can only tighten the deadline; None keeps the current one.
+    """
+    if at is None:
+        yield
+        return
+    current_at = _call_deadline.get()
+    token = _call_deadline.set(at if current_at is None else min(at, current_at))
+    try:
+        yield
+    finally:
+        _call_deadline.reset(token)
+
+
+def remaining():
+    """Seconds until the current call deadline (negative once passed), or None without one."""
+    at = _call_deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def check():
+    """Raise DeadlineExceeded if the current call deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Deadline passed before the model call")
+
+
+def request_options() -> dict:
+    """Keyword arguments giving a model request the current deadline as its timeout."""
+    left = remaining()
+    if left is None:
+        return {}
+    return {'request_options': {'timeout': max(MIN_REQUEST_TIMEOUT, left)}}
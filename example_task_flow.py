@@ -1,70 +1,93 @@
-from agents import (
-    market_research_agent, feasibility_analysis_agent, customer_persona_agent,
-    business_model_agent, competitive_advantage_agent, gtm_strategy_agent,
-    monetization_optimization_agent, tech_stack_recommender, investor_pitch_agent
-)
-from tasks import Crew, Task
+import crew_spec
+from crew_spec import CrewSpec
+import deadlines
+from fused import run_fused, stream_fused
+import routing
+from tasks import Crew
 
-def create_startup_analysis_flow(startup_idea: str):
-    # Define tasks with their respective agents
-    tasks = [
-        Task(
-            description="Analyze market size, trends, and competitor landscape",
-            agent=market_research_agent
-        ),
-        Task(
-            description="Evaluate technical and financial feasibility",
-            agent=feasibility_analysis_agent
-        ),
-        Task(
-            description="Define target customers and their needs",
-            agent=customer_persona_agent
-        ),
-        Task(
-            description="Design comprehensive business model",
-            agent=business_model_agent
-        ),
-        Task(
-            description="Identify key differentiators and advantages",
-            agent=competitive_advantage_agent
-        ),
-        Task(
-            description="Recommend optimal technology stack",
-            agent=tech_stack_recommender
-        ),
-        Task(
-            description="Develop revenue generation strategies",
-            agent=monetization_optimization_agent
-        ),
-        Task(
-            description="Create launch and market entry strategy",
-            agent=gtm_strategy_agent
-        ),
-        Task(
-            description="Create compelling pitch materials",
-            agent=investor_pitch_agent
-        )
-    ]
+# 'crew' runs one agent call per task; 'fused' asks for every section in one
+# structured call and falls back to the agents for sections that fail validation
+MODES = ('crew', 'fused')
 
-    # Create crew with all agents and tasks
-    crew = Crew(
-        agents=[
-            market_research_agent,
-            feasibility_analysis_agent,
-            customer_persona_agent,
-            business_model_agent,
-            competitive_advantage_agent,
-            tech_stack_recommender,
-            monetization_optimization_agent,
-            gtm_strategy_agent,
-            investor_pitch_agent
-        ],
-        tasks=tasks,
-        verbose=2  # Set to 2 for detailed output
-    )
+def build_startup_analysis_crew(compact_context: bool = False, verbose: int = 2, speculate: bool = False,
+                                spec: CrewSpec = None) -> Crew:
+    """Build the crew of spec, by default the current one (crews/startup_analysis.json, see crew_spec).
 
+    Each task only sees the upstream results relevant to its role; with
+    compact_context=True those results are also digested to a token budget.
+    speculate=True lets tasks start on partial upstream output (tasks.Speculation).
+    """
+    return (spec or crew_spec.current()).build_crew(compact_context, verbose, speculate)
+
+def _check_mode(mode):
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}; expected one of {', '.join(MODES)}")
+
+def create_startup_analysis_flow(startup_idea: str, compact_context: bool = False, verbose: int = 2,
+                                 callback=None, completed=None, speculate: bool = False, mode: str = 'crew',
+                                 profile: str = None, deadline: float = None):
+    """Run the full analysis and return one formatted result string per task.
+
+    callback and completed are passed through to Crew.kickoff, to observe
+    task completion and to skip tasks whose results are already known;
+    speculate starts downstream tasks on partial upstream output. mode is
+    one of MODES; in 'fused' mode callback and completed are ignored.
+    profile is a routing profile ('fast', 'balanced' or 'thorough'; default
+    THINKTANK_PROFILE). deadline is a time budget in seconds: tasks degrade
+    as it runs out and the results come back when it passes, with a status
+    for each task in results.summary['task_status'] (see deadlines).
+    """
+    _check_mode(mode)
     # Execute all tasks
-    results = crew.kickoff(startup_idea)
+    crew = build_startup_analysis_crew(compact_context, verbose, speculate)
+    with routing.use_profile(profile), deadlines.use(deadline):
+        if mode == 'fused':
+            results = run_fused(startup_idea, crew)
+        else:
+            results = crew.kickoff(startup_idea, callback=callback, completed=completed)
+    if crew.verbose >= 1:
+        summary = results.summary
+        models = ', '.join(f"{model} x{usage['calls']}" for model, usage in summary.get('models', {}).items())
+        print(f"\nModels: {models or 'none'}; estimated cost ${summary.get('cost_usd', 0.0):.4f}")
+        if 'deadline' in summary:
+            report = summary['deadline']
+            print(f"Deadline {report['seconds']:g}s {'met' if report['met'] else 'missed'}: {report['brief']} brief, "
+                  f"{report['skipped']} skipped, {report['pending']} pending")
+        report = crew.context_report
+        print(f"\nContext tokens sent: {report['sent_tokens']} (saved {report['saved_tokens']} of {report['baseline_tokens']})")
+        speculation = results.summary.get('speculation')
+        if speculation:
+            print(f"Speculative starts: {speculation['accepted']} kept, {speculation['redone']} redone, "
+                  f"{speculation['saved_seconds']:.2f}s saved")
+    return results
+
+def stream_startup_analysis_flow(startup_idea: str, compact_context: bool = False, completed=None,
+                                 verbose: int = 2, mode: str = 'crew', profile: str = None, deadline: float = None):
+    """Run the analysis, yielding tasks.TaskEvent objects as results stream in.
+
+    The generator's return value is the same list create_startup_analysis_flow returns.
+    """
+    _check_mode(mode)
+    crew = build_startup_analysis_crew(compact_context, verbose=verbose)
+    if mode == 'fused':
+        stream = stream_fused(startup_idea, crew)
+    else:
+        stream = crew.kickoff_stream(startup_idea, completed=completed)
+    results = yield from routing.profiled(deadlines.within(stream, deadline), profile)
+    return results
+
+async def create_startup_analysis_flow_async(startup_idea: str, semaphore=None, compact_context: bool = False,
+                                             verbose: int = 2, profile: str = None, deadline: float = None):
+    """Async version of create_startup_analysis_flow.
+
+    Share one asyncio.Semaphore between calls to cap the number of model
+    requests in flight across all analyses running in the event loop.
+    profile and deadline work as in create_startup_analysis_flow; at the
+    deadline, tasks still running are cancelled and reported pending.
+    """
+    crew = build_startup_analysis_crew(compact_context, verbose)
+    with routing.use_profile(profile), deadlines.use(deadline):
+        results = await crew.akickoff(startup_idea, semaphore=semaphore)
     return results
 
 if __name__ == "__main__":
@@ -0,0 +1,221 @@
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+
+# The agent a prompt is for: "You are the X." in system instructions, "As X ..." in prompts
+SUBJECT = re.compile(r"^(?:You are the (.+?)\. Your goal|As (.+?)(?: with the goal|,))", re.MULTILINE)
+
+
+class FakeUsage:
+    def __init__(self, prompt, text, cached_prefix=''):
+        # Same four-characters-per-token rule of thumb as context.estimate_tokens
+        self.prompt_token_count = max(1, len(prompt) // 4)
+        self.candidates_token_count = max(1, len(text) // 4)
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+        # Like Gemini's implicit caching, a repeated system instruction is reported as cached
+        self.cached_content_token_count = len(cached_prefix) // 4
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the provider's HTTP 429 / ResourceExhausted error."""
+    code = 429
+
+
+class FakeServerError(Exception):
+    """Mimics a transient HTTP 503 / ServiceUnavailable error."""
+    code = 503
+
+
+# Latency distributions: each returns a sampler taking a random.Random
+
+def constant(seconds):
+    return lambda rng: seconds
+
+
+def uniform(low, high):
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median, sigma=0.5):
+    """Right-skewed latency typical of model APIs; median in seconds."""
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+def pareto(scale, alpha=1.5, cap=None):
+    """Heavy-tailed latency: most calls take about `scale`, a few take far longer."""
+    def sample(rng):
+        seconds = scale * rng.paretovariate(alpha)
+        return min(seconds, cap) if cap is not None else seconds
+    return sample
+
+
+class FakeModel:
+    """Offline stand-in for genai.GenerativeModel.
+
+    Returns canned bullet-point responses after a fixed delay and keeps track of
+    how many calls were in flight at once, so concurrency limits can be checked
+    without an API key. latency is either a number of seconds or a sampler
+    such as lognormal(0.8) or pareto(0.5); bullets and bullet_words control the
+    response size. Throttling can be injected either as a per-minute quota
+    (quota_rpm) or as a random fraction of calls (throttle_rate), and
+    failure_rate makes a fraction of calls fail with a transient 503.
+    seconds_per_token adds generation time for every response token, and
+    responses are cut to the generation_config's max_output_tokens.
+    """
+
+    def __init__(self, model_name='fake-model', latency=0.0, text=None, quota_rpm=None,
+                 throttle_rate=0.0, seed=None, failure_rate=0.0, bullets=4, bullet_words=8,
+                 seconds_per_token=0.0):
+        self.model_name = model_name
+        self.latency = latency
+        self.seconds_per_token = seconds_per_token
+        self.text = text
+        self.quota_rpm = quota_rpm
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.bullets = bullets
+        self.bullet_words = bullet_words
+        self.calls = 0
+        self.throttled = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._accepted = deque()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._instructions = set()
+
+    def with_system_instruction(self, system_instruction):
+        """This model with a system instruction attached (shares calls and quotas)."""
+        return InstructedModel(self, system_instruction)
+
+    def _usage(self, prompt, text, system_instruction):
+        if not system_instruction:
+            return FakeUsage(prompt, text)
+        with self._lock:
+            seen = system_instruction in self._instructions
+            self._instructions.add(system_instruction)
+        return FakeUsage(system_instruction + prompt, text, system_instruction if seen else '')
+
+    def _response_text(self, prompt, system_instruction=None, generation_config=None):
+        text = self._full_text(prompt, system_instruction, generation_config)
+        limit = (generation_config or {}).get('max_output_tokens')
+        # Four characters per token, as in FakeUsage
+        return text[:limit * 4] if limit else text
+
+    def _full_text(self, prompt, system_instruction=None, generation_config=None):
+        if self.text is not None:
+            return self.text
+        filler = ' '.join(['analysis'] * max(0, self.bullet_words - 2))
+        schema = (generation_config or {}).get('response_schema')
+        if schema:
+            # Structured output: an array of insights for every property of the schema
+            return json.dumps({
+                key: [f"{key} insight {i}: placeholder {filler}".rstrip() for i in range(1, self.bullets + 1)]
+                for key in schema.get('properties', {})
+            })
+        match = SUBJECT.search(system_instruction or '') or SUBJECT.search(prompt)
+        subject = (match.group(1) or match.group(2)) if match else 'Agent'
+        return "\n".join(
+            f"• {subject} insight {i}: placeholder {filler}".rstrip()
+            for i in range(1, self.bullets + 1)
+        )
+
+    def _delay(self, text=''):
+        generation = self.seconds_per_token * len(text) / 4
+        if callable(self.latency):
+            with self._lock:
+                return self.latency(self._random) + generation
+        return self.latency + generation
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            now = time.monotonic()
+            while self._accepted and self._accepted[0] <= now - 60:
+                self._accepted.popleft()
+            if (self.quota_rpm is not None and len(self._accepted) >= self.quota_rpm) or \
+                    self._random.random() < self.throttle_rate:
+                self.throttled += 1
+                raise FakeRateLimitError("429 Resource has been exhausted (e.g. check quota).")
+            if self.failure_rate and self._random.random() < self.failure_rate:
+                self.failed += 1
+                raise FakeServerError("503 The service is currently unavailable.")
+            self._accepted.append(now)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def generate_content(self, prompt, generation_config=None, stream=False, system_instruction=None, **kwargs):
+        if stream:
+            return self._stream(prompt, system_instruction, generation_config)
+        self._enter()
+        try:
+            text = self._response_text(prompt, system_instruction, generation_config)
+            delay = self._delay(text)
+            if delay:
+                time.sleep(delay)
+            return FakeResponse(text, self._usage(prompt, text, system_instruction))
+        finally:
+            self._exit()
+
+    def _stream(self, prompt, system_instruction=None, generation_config=None):
+        """Yield the response one line at a time, spreading the latency over the chunks."""
+        self._enter()
+        try:
+            text = self._response_text(prompt, system_instruction, generation_config)
+            usage = self._usage(prompt, text, system_instruction)
+            lines = text.splitlines(keepends=True)
+            delay = self._delay(text)
+            for line in lines:
+                if delay:
+                    time.sleep(delay / len(lines))
+                yield FakeResponse(line, usage)
+        finally:
+            self._exit()
+
+    async def generate_content_async(self, prompt, generation_config=None, system_instruction=None, **kwargs):
+        self._enter()
+        try:
+            text = self._response_text(prompt, system_instruction, generation_config)
+            delay = self._delay(text)
+            if delay:
+                await asyncio.sleep(delay)
+            return FakeResponse(text, self._usage(prompt, text, system_instruction))
+        finally:
+            self._exit()
+
+
+class InstructedModel:
+    """A FakeModel bound to a system instruction, like GenerativeModel(system_instruction=...)."""
+
+    def __init__(self, model, system_instruction):
+        self.model = model
+        self.system_instruction = system_instruction
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        return self.model.generate_content(prompt, generation_config, stream=stream,
+                                           system_instruction=self.system_instruction)
+
+    async def generate_content_async(self, prompt, generation_config=None, **kwargs):
+        return await self.model.generate_content_async(prompt, generation_config,
+                                                       system_instruction=self.system_instruction)
+
+    def __getattr__(self, name):
+        # Counters and settings live on the underlying model
+        return getattr(self.model, name)
@@ -0,0 +1,221 @@
+"""Fused mode: every section of the analysis from a single model call.
+
+The fused agent asks for all of a crew's sections at once as a JSON object
+(one array of insights per section, enforced with a response schema).
+Sections that come back valid are used as-is; any section that is missing or
+fails validation falls back to its own agent through
+Crew.kickoff(completed=...), with the valid sections as upstream context.
+Results have the same shape as the Crew path, so callers and app.py do not
+need to know which mode produced them.
+"""
+import contextvars
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+import deadlines
+import instrumentation
+import routing
+from agents import Agent, GENERATION_CONFIG, response_cache
+from bullets import MAX_BULLETS, MIN_BULLETS, parse_bullets
+from cache import make_key
+from singleflight import flights as shared_flights
+from tasks import CrewResults, TaskEvent
+
+# Nine sections of 3-4 short insights, plus JSON punctuation
+FUSED_MAX_OUTPUT_TOKENS = 2048
+# Shared with the per-agent path by default; set to None to disable
+cache = response_cache
+flights = shared_flights
+# Summary counters that add up across the fused call and the fallback run
+ADDITIVE_METRICS = (
+    'llm_calls', 'model_time', 'queue_wait', 'prompt_tokens', 'response_tokens',
+    'cached_prompt_tokens', 'fresh_prompt_tokens', 'retries', 'cache_hits', 'cache_misses', 'shared_calls',
+    'hedges', 'hedge_wins', 'fallbacks',
+)
+
+
+def section_key(task) -> str:
+    """JSON key for a task's section, e.g. 'market_research' for the Market Research Agent."""
+    name = re.sub(r'[^a-z0-9]+', '_', task.agent.role.lower()).strip('_')
+    return name[:-len('_agent')] if name.endswith('_agent') else name
+
+
+class FusedAgent(Agent):
+    """Produces every section of a crew's analysis in one structured response."""
+
+    def __init__(self, tasks, **kwargs):
+        super().__init__(
+            role="Startup Analysis Panel",
+            goal="produce a complete first-pass analysis of a startup idea in one response",
+            backstory=(
+                "You are a panel of specialist startup analysts. Each section of your answer is written "
+                "from the point of view of the specialist it names."
+            ),
+            **kwargs
+        )
+        self.sections = [(section_key(task), task) for task in tasks]
+        schema = {
+            'type': 'object',
+            'properties': {
+                key: {'type': 'array', 'items': {'type': 'string'}} for key, _ in self.sections
+            },
+            'required': [key for key, _ in self.sections],
+        }
+        self.generation_config = dict(
+            GENERATION_CONFIG,
+            max_output_tokens=FUSED_MAX_OUTPUT_TOKENS,
+            response_mime_type='application/json',
+            response_schema=schema,
+        )
+        self._system_instruction = self._panel_instruction()
+
+    def _panel_instruction(self):
+        lines = [
+            f"You are the {self.role}. Your goal is to {self.goal}.",
+            self.backstory,
+            "",
+            "Reply with a JSON object with exactly these keys. Each value is an array of 3-4 specific, "
+            "quantitative, actionable insights, each at most 2 lines (about 100 characters), "
+            "with no introductions, conclusions, or bullet symbols:",
+        ]
+        for key, task in self.sections:
+            lines.append(f"- {key}: as the {task.agent.role}, {task.agent.goal} ({task.description})")
+        lines.append("")
+        lines.append("Provide specific, detailed analysis focused on the startup idea you are given. "
+                     "Avoid generic responses.")
+        return '\n'.join(lines)
+
+    def _key(self, prompt, generation_config=None, model=None):
+        return make_key(model or routing.router.pick(self._route()), generation_config or self.generation_config,
+                        prompt, self.system_instruction)
+
+    def analyze(self, startup_idea: str) -> dict:
+        """Return {task description: result} for every section that came back valid."""
+        prompt = f"Analyze this startup idea:\n{startup_idea}\n"
+        key = self._key(prompt)
+        answered = {}
+        shared = False
+        try:
+            text = self._cached(key)
+            if text is None:
+                if self.verbose:
+                    print(f"Agent {self.role} processing all {len(self.sections)} sections...")
+                text, shared = self._coalesce(key, lambda: self._generate(prompt, self.generation_config, answered))
+            sections = self._parse(text)
+        except Exception as e:
+            self._error(e)
+            return {}
+        valid = {}
+        for key_name, task in self.sections:
+            result = self._section(sections.get(key_name))
+            if result is not None:
+                valid[task.description] = result
+        instrumentation.emit('fused', agent=self.role, sections=len(self.sections), valid=len(valid))
+        if len(valid) == len(self.sections) and not shared:
+            # Only fully valid responses are worth replaying from the cache (the caller
+            # whose request was shared caches it itself)
+            self._store(key, text, answered, prompt, self.generation_config)
+        return valid
+
+    def _parse(self, text):
+        text = (text or '').strip()
+        # Tolerate a ```json fence around the object
+        if text.startswith('```'):
+            text = text.strip('`').split('\n', 1)[-1]
+        sections = json.loads(text)
+        if not isinstance(sections, dict):
+            raise ValueError("Fused response is not a JSON object")
+        return sections
+
+    def _section(self, insights):
+        """Bullet text for a section's insights, or None if it fails validation."""
+        if not isinstance(insights, list):
+            return None
+        lines = [' '.join(str(item).split()) for item in insights if isinstance(item, str) and item.strip()]
+        bullets, _ = parse_bullets('\n'.join(f"• {line.lstrip('•*- ')}" for line in lines))
+        if len(bullets) < MIN_BULLETS:
+            return None
+        return '\n'.join(bullets[:MAX_BULLETS])
+
+
+def _fused_agent(crew):
+    return FusedAgent(crew.tasks, verbose=crew.verbose >= 1, cache=cache, flights=flights)
+
+
+def _fused_call(startup_idea, crew):
+    """Run the fused call under its own recorder; returns (valid sections, its summary).
+
+    Under a run deadline (deadlines.use) the call may use all of it; if it
+    is still running when the deadline passes it is abandoned, and the crew
+    reports every section as pending.
+    """
+    recorder = instrumentation.start_run()
+    deadline = deadlines.current()
+    try:
+        started = time.perf_counter()
+        agent = _fused_agent(crew)
+        if deadline is None:
+            valid = agent.analyze(startup_idea)
+        else:
+            valid = _analyze_by(agent, startup_idea, deadline)
+        summary = recorder.summary()
+        summary['fused_seconds'] = round(time.perf_counter() - started, 3)
+    finally:
+        instrumentation.finish_run(recorder)
+    return valid, summary
+
+
+def _analyze_by(agent, startup_idea, deadline):
+    """agent.analyze(startup_idea), or {} if it has not returned by the deadline."""
+    executor = ThreadPoolExecutor(max_workers=1)
+    context = contextvars.copy_context()
+    try:
+        with deadlines.scope(deadline.begin()):
+            future = executor.submit(context.run, agent.analyze, startup_idea)
+        return future.result(timeout=deadline.remaining())
+    except FuturesTimeout:
+        return {}
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _merge(results, fused_summary, valid, crew) -> CrewResults:
+    summary = dict(results.summary)
+    for metric in ADDITIVE_METRICS:
+        summary[metric] = round(summary.get(metric, 0) + fused_summary.get(metric, 0), 3)
+    summary['wall_time'] = round(summary['wall_time'] + fused_summary['fused_seconds'], 3)
+    models = {model: dict(usage) for model, usage in summary.get('models', {}).items()}
+    for model, usage in fused_summary.get('models', {}).items():
+        merged = models.setdefault(model, dict.fromkeys(usage, 0))
+        for metric, value in usage.items():
+            merged[metric] = round(merged[metric] + value, 3)
+    summary['models'] = models
+    summary['cost_usd'] = routing.cost(models)
+    summary['task_status'] = {**summary.get('task_status', {}), **dict.fromkeys(valid, 'done')}
+    summary['fused'] = {
+        'sections': len(crew.tasks),
+        'valid': len(valid),
+        'fallback': [task.description for task in crew.tasks if task.description not in valid],
+        'seconds': fused_summary['fused_seconds'],
+    }
+    crew.last_summary = summary
+    return CrewResults(list(results), summary)
+
+
+def run_fused(startup_idea: str, crew) -> CrewResults:
+    """Analyze with one fused call, falling back to crew agents for invalid sections."""
+    valid, fused_summary = _fused_call(startup_idea, crew)
+    results = crew.kickoff(startup_idea, completed=valid)
+    return _merge(results, fused_summary, valid, crew)
+
+
+def stream_fused(startup_idea: str, crew):
+    """Generator form of run_fused(), yielding tasks.TaskEvent objects like Crew.kickoff_stream."""
+    valid, fused_summary = _fused_call(startup_idea, crew)
+    for i, task in enumerate(crew.tasks):
+        if task.description in valid:
+            yield TaskEvent('completed', i, task.description, valid[task.description])
+    results = yield from crew.kickoff_stream(startup_idea, completed=valid)
+    return _merge(results, fused_summary, valid, crew)
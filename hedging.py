@@ -0,0 +1,238 @@
+"""Hedged model requests to cut tail latency.
+
+An analysis waits for its slowest model call, so one request stuck far past
+the usual latency holds up the whole result. With hedging configured, a call
+that has not returned once it passes the running p95 of recent call
+latencies gets a duplicate request; whichever finishes first is used and the
+other is abandoned (async calls are cancelled; a sync request already on the
+wire cannot be interrupted, so its response is simply dropped).
+
+Duplicates cost quota, so they are capped at a fraction of all calls
+(budget) and go through the shared rate limiter like any other request.
+Sync calls run on a shared pool of max_workers threads so their caller can
+stop waiting, and only a duplicate gets a thread of its own; calls made
+while every pool thread is busy run in the caller's thread, unhedged.
+Until min_samples calls have completed there is no threshold and nothing is
+hedged. Streaming calls are never hedged, since both copies would emit chunks.
+
+Example:
+    hedging.configure(quantile=0.95, budget=0.05)
+    ...
+    print(hedging.hedger.stats())  # hedge_rate, p99 seen by callers vs. per request
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import instrumentation
+import ratelimit
+
+
+def _percentile(values, q):
+    """Nearest-rank percentile (q in 0-1) of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Hedger:
+    """Sends a duplicate of calls slower than the observed `quantile` latency.
+
+    At most `budget` extra requests per call are sent overall; thresholds
+    come from the last `window` completed requests and never go below
+    min_delay seconds. Up to max_workers sync calls at a time can be hedged.
+    """
+
+    def __init__(self, quantile: float = 0.95, budget: float = 0.05, min_samples: int = 20,
+                 min_delay: float = 0.05, window: int = 500, max_workers: int = 32):
+        self.quantile = quantile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        # Pool for sync calls that may be hedged, created on the first one
+        self._executor = None
+        self._workers = threading.BoundedSemaphore(max_workers)
+        # Latency of each request that completed, and of each call as its caller saw it
+        self._requests = deque(maxlen=window)
+        self._calls = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def threshold(self):
+        """Seconds to wait before hedging, or None while there are too few samples."""
+        with self._lock:
+            if len(self._requests) < self.min_samples:
+                return None
+            samples = list(self._requests)
+        return max(self.min_delay, _percentile(samples, self.quantile))
+
+    def _begin(self):
+        with self._lock:
+            self.calls += 1
+
+    def _allow(self) -> bool:
+        """Reserve one hedge if the budget has room for it."""
+        with self._lock:
+            if self.hedges + 1 > self.budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def _observe(self, seconds, call=False):
+        with self._lock:
+            (self._calls if call else self._requests).append(seconds)
+
+    def _finish(self, agent, delay, started, hedge, winner):
+        won = winner is hedge
+        if won:
+            with self._lock:
+                self.hedge_wins += 1
+        instrumentation.emit('hedge', agent=agent, won=won, delay=round(delay, 4),
+                             seconds=round(time.perf_counter() - started, 4))
+
+    def _run(self, fn):
+        """fn(), recording its latency if it succeeds."""
+        started = time.perf_counter()
+        result = fn()
+        self._observe(time.perf_counter() - started)
+        return result
+
+    def _submit(self, fn):
+        """Run fn() on the shared pool; None if every pool thread is busy."""
+        if not self._workers.acquire(blocking=False):
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='hedged-call')
+        future = self._executor.submit(contextvars.copy_context().run, self._run, fn)
+        future.add_done_callback(lambda f: self._workers.release())
+        return future
+
+    def _launch(self, fn) -> Future:
+        """Run a duplicate fn() on a thread of its own."""
+        future = Future()
+        future.set_running_or_notify_cancel()
+        context = contextvars.copy_context()
+
+        def run():
+            try:
+                result = context.run(self._run, fn)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        threading.Thread(target=run, daemon=True, name='hedge').start()
+        return future
+
+    def call(self, fn, tokens: int = 0, agent: str = None):
+        """Return fn(), or a duplicate's result if fn() is slow and the budget allows one."""
+        self._begin()
+        started = time.perf_counter()
+        delay = self.threshold()
+        try:
+            primary = self._submit(fn) if delay is not None else None
+            if primary is None:
+                return self._run(fn)
+            if wait([primary], timeout=delay).done or not self._allow():
+                return primary.result()
+
+            def duplicate():
+                ratelimit.acquire(tokens)
+                return fn()
+            hedge = self._launch(duplicate)
+            pending = {primary, hedge}
+            while True:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                winner = next(iter([f for f in done if f.exception() is None]), None)
+                if winner is not None or not pending:
+                    break
+            self._finish(agent, delay, started, hedge, winner)
+            # Both failed: report the original request's error
+            return (winner or primary).result()
+        finally:
+            self._observe(time.perf_counter() - started, call=True)
+
+    async def _timed(self, fn):
+        started = time.perf_counter()
+        result = await fn()
+        self._observe(time.perf_counter() - started)
+        return result
+
+    async def call_async(self, fn, tokens: int = 0, agent: str = None):
+        """Async counterpart of call(); fn returns an awaitable. The losing request is cancelled."""
+        self._begin()
+        started = time.perf_counter()
+        delay = self.threshold()
+        tasks = set()
+        try:
+            if delay is None:
+                return await self._timed(fn)
+            primary = asyncio.ensure_future(self._timed(fn))
+            tasks.add(primary)
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._allow():
+                return await primary
+
+            async def duplicate():
+                await ratelimit.acquire_async(tokens)
+                return await fn()
+            hedge = asyncio.ensure_future(self._timed(duplicate))
+            tasks.add(hedge)
+            pending = {primary, hedge}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next(iter([t for t in done if t.exception() is None]), None)
+                if winner is not None or not pending:
+                    break
+            self._finish(agent, delay, started, hedge, winner)
+            return (winner or primary).result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._observe(time.perf_counter() - started, call=True)
+
+    def stats(self) -> dict:
+        """Hedge rate and latency percentiles as callers saw them vs. per request."""
+        threshold = self.threshold()
+        with self._lock:
+            calls, requests = list(self._calls), list(self._requests)
+            stats = {
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'hedge_rate': round(self.hedges / self.calls, 4) if self.calls else 0.0,
+                'hedge_wins': self.hedge_wins,
+                'threshold': round(threshold, 4) if threshold is not None else None,
+            }
+        for name, samples in (('call', calls), ('request', requests)):
+            for q in (0.5, 0.95, 0.99):
+                stats[f'{name}_p{int(q * 100)}'] = round(_percentile(samples, q), 4) if samples else 0.0
+        return stats
+
+
+# Shared by every agent; None disables hedging
+hedger = None
+
+
+def configure(quantile: float = 0.95, budget: float = 0.05, min_samples: int = 20, min_delay: float = 0.05,
+              enabled: bool = True):
+    """Install (or with enabled=False, remove) the shared hedger used by all agents."""
+    global hedger
+    hedger = Hedger(quantile, budget, min_samples, min_delay) if enabled else None
+    return hedger
+
+
+def call(fn, tokens: int = 0, agent: str = None):
+    if hedger is None:
+        return fn()
+    return hedger.call(fn, tokens, agent)
+
+
+async def call_async(fn, tokens: int = 0, agent: str = None):
+    if hedger is None:
+        return await fn()
+    return await hedger.call_async(fn, tokens, agent)
@@ -0,0 +1,147 @@
+"""Incremental re-analysis of an edited startup idea.
+
+IncrementalAnalyzer remembers the last idea it analyzed and the result of
+every task. When the idea is edited it diffs the two versions sentence by
+sentence, matches the words of the changed sentences against what each task
+is about (its agent's role, goal and backstory plus the topic words the crew
+spec gives it), and re-runs only the matching tasks and their downstream
+dependents. Every other task reuses its stored result through
+Crew.kickoff(completed=...).
+"""
+import difflib
+import re
+
+import crew_spec
+from agents import is_error_result
+from example_task_flow import build_startup_analysis_crew
+
+# Edits changing more than this share of the words re-run every task
+MAX_CHANGED_FRACTION = 0.5
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be been being but by can could do does for from
+has have how i if in into is it its it's more most my no not of on or our out over so such than
+that the their them then there these they this those through to too up us very was we were what
+when which who will with within without would you your you're via using
+""".split())
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+WORD = re.compile(r"[a-z][a-z0-9']+")
+
+
+def split_sentences(text: str):
+    return [' '.join(s.split()) for s in SENTENCE_BOUNDARY.split(text or '') if s.strip()]
+
+
+def stem(word: str) -> str:
+    """Crude stemming so "pricing", "price" and "prices" compare equal."""
+    for suffix in ('ations', 'ation', 'ings', 'ing', 'ers', 'er', 'ies', 'es', 'ed', 'ly', 's', 'e'):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    return word[:6]
+
+
+def terms(text: str) -> set:
+    return {stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS}
+
+
+def changed_sentences(old: str, new: str):
+    """Sentences added, removed or rewritten between two versions, and the changed share."""
+    before, after = split_sentences(old), split_sentences(new)
+    matcher = difflib.SequenceMatcher(a=before, b=after, autojunk=False)
+    changed = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            changed.extend(before[i1:i2] + after[j1:j2])
+    # Measure the share on words so a tweak to a one-sentence idea is not a full rewrite
+    old_words, new_words = old.split(), new.split()
+    words = difflib.SequenceMatcher(a=old_words, b=new_words, autojunk=False)
+    unchanged = sum(block.size for block in words.get_matching_blocks())
+    return changed, 1 - unchanged / max(len(old_words), len(new_words), 1)
+
+
+class IncrementalAnalyzer:
+    """Re-analyzes an edited idea, re-running only the tasks the edit affects."""
+
+    def __init__(self, compact_context=False, max_changed_fraction=MAX_CHANGED_FRACTION, verbose=0):
+        self.compact_context = compact_context
+        self.max_changed_fraction = max_changed_fraction
+        self.verbose = verbose
+        self.idea = None
+        self.results = {}
+        self.last_plan = None
+        self._crew = None
+
+    def _build_crew(self):
+        return build_startup_analysis_crew(self.compact_context, verbose=self.verbose)
+
+    def _task_terms(self, crew):
+        # Words an idea is likely to use for what a task covers, beyond its agent's own wording
+        topics = crew_spec.current().topics
+        vocabulary = {
+            task.description: terms(' '.join((
+                task.description, task.agent.role, task.agent.goal, task.agent.backstory,
+                topics.get(task.description, '')
+            )))
+            for task in crew.tasks
+        }
+        # Words shared by most tasks ("startup", "strategy", ...) say nothing about which one an edit touches
+        counts = {}
+        for words in vocabulary.values():
+            for word in words:
+                counts[word] = counts.get(word, 0) + 1
+        common = {word for word, count in counts.items() if count > len(vocabulary) / 2}
+        return {description: words - common for description, words in vocabulary.items()}
+
+    def plan(self, idea: str) -> dict:
+        """Decide which tasks to re-run for idea; returns rerun, reused and the reason."""
+        crew = self._build_crew()
+        everything = {task.description for task in crew.tasks}
+        plan = {'rerun': everything, 'reused': set(), 'matched': set(), 'reason': 'first analysis'}
+        if self.idea is not None and self.results:
+            changed, fraction = changed_sentences(self.idea, idea)
+            failed = {d for d in everything if is_error_result(self.results.get(d))}
+            if fraction > self.max_changed_fraction:
+                plan['reason'] = f"{fraction:.0%} of the idea changed"
+            else:
+                edited = terms(' '.join(changed))
+                matched = {d for d, words in self._task_terms(crew).items() if words & edited}
+                if changed and not matched:
+                    plan['reason'] = "edit not tied to any section"
+                else:
+                    plan['matched'] = matched
+                    plan['rerun'] = crew.downstream(matched | failed)
+                    plan['reused'] = everything - plan['rerun']
+                    plan['reason'] = "edited" if changed else "unchanged"
+        self._crew = crew
+        self.last_plan = plan
+        return plan
+
+    def restore(self, idea: str, results: dict):
+        """Make a previously stored analysis the baseline for the next edit."""
+        self.idea = idea
+        self.results = dict(results)
+
+    def _prepare(self, idea):
+        plan = self.plan(idea)
+        completed = {d: self.results[d] for d in plan['reused']}
+        return self._crew, completed
+
+    def _remember(self, idea, crew):
+        self.idea = idea
+        self.results = {task.description: task.result for task in crew.tasks}
+
+    def analyze(self, idea: str):
+        """Blocking re-analysis; returns the same list Crew.kickoff does."""
+        crew, completed = self._prepare(idea)
+        results = crew.kickoff(idea, completed=completed)
+        self._remember(idea, crew)
+        return results
+
+    def stream(self, idea: str):
+        """Generator form of analyze(), yielding tasks.TaskEvent objects for re-run tasks."""
+        crew, completed = self._prepare(idea)
+        results = yield from crew.kickoff_stream(idea, completed=completed)
+        self._remember(idea, crew)
+        return results
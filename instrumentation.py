@@ -0,0 +1,326 @@
+"""Structured timing, token and cache events for agents and crews.
+
+Components call emit(type, **fields); each event is a plain dict with a
+'type', a wall-clock 'ts' and the id of the crew run it belongs to. Events go
+to every registered sink (MemorySink, JsonlSink, PrometheusSink or any object
+with a handle(event) method) and to the RunRecorder of the current run, which
+Crew.kickoff turns into a per-run summary.
+"""
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+_current_run = contextvars.ContextVar('thinktank_run', default=None)
+_current_task = contextvars.ContextVar('thinktank_task', default=None)
+
+
+class MemorySink:
+    """Keeps every event in a list, mostly for tests and notebooks."""
+
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+
+    def handle(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def of_type(self, event_type):
+        with self._lock:
+            return [event for event in self.events if event['type'] == event_type]
+
+
+class JsonlSink:
+    """Appends each event as one JSON line."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def handle(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusSink:
+    """Aggregates events into counters and summaries in Prometheus text format."""
+
+    def __init__(self, prefix='thinktank'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._help = {}
+
+    def _inc(self, name, labels, value=1.0, help_text=''):
+        key = (f"{self.prefix}_{name}", tuple(sorted(labels.items())))
+        self._counters[key] += value
+        if help_text:
+            self._help.setdefault(_family(key[0])[0], help_text)
+
+    def handle(self, event):
+        kind = event['type']
+        with self._lock:
+            if kind == 'llm_call':
+                labels = {'agent': event.get('agent', ''), 'status': event.get('status', '')}
+                self._inc('llm_calls_total', labels, help_text='Model calls')
+                agent = {'agent': event.get('agent', '')}
+                self._inc('llm_model_seconds_sum', agent, event.get('model_time', 0.0), 'Time spent in the model')
+                self._inc('llm_model_seconds_count', agent)
+                self._inc('llm_queue_wait_seconds_sum', agent, event.get('queue_wait', 0.0), 'Time waiting on the rate limiter')
+                self._inc('llm_queue_wait_seconds_count', agent)
+                self._inc('prompt_tokens_total', agent, event.get('prompt_tokens') or 0, 'Prompt tokens sent')
+                self._inc('cached_prompt_tokens_total', agent, event.get('cached_tokens') or 0,
+                          'Prompt tokens served from the provider prefix cache')
+                self._inc('response_tokens_total', agent, event.get('response_tokens') or 0, 'Response tokens received')
+                self._inc('model_calls_total', {'model': event.get('model', '')}, help_text='Model calls by routed model')
+            elif kind == 'retry':
+                self._inc('retries_total', {'agent': event.get('agent', ''), 'error': event.get('error', '')},
+                          help_text='Retried model calls')
+            elif kind == 'cache':
+                self._inc('cache_lookups_total', {'result': 'hit' if event.get('hit') else 'miss'},
+                          help_text='Response cache lookups')
+            elif kind == 'singleflight':
+                self._inc('singleflight_calls_total', {'result': 'shared' if event.get('shared') else 'leader'},
+                          help_text='Model calls made (leader) or shared with an identical call in flight')
+            elif kind == 'speculation':
+                outcome = {'outcome': event.get('outcome', '')}
+                self._inc('speculation_total', outcome, help_text='Speculative task starts, kept or redone')
+                self._inc('speculation_saved_seconds_total', {}, event.get('saved_seconds') or 0.0,
+                          'Task latency saved by kept speculative starts')
+            elif kind == 'hedge':
+                result = {'agent': event.get('agent', ''), 'result': 'won' if event.get('won') else 'lost'}
+                self._inc('hedges_total', result,
+                          help_text='Duplicate requests sent for slow model calls, and whether they finished first')
+            elif kind == 'fallback':
+                self._inc('fallbacks_total', {'model': event.get('model', ''), 'reason': event.get('reason', '')},
+                          help_text='Models put in cooldown because they were throttled or slow')
+            elif kind == 'deadline':
+                self._inc('deadline_actions_total', {'action': event.get('action', '')},
+                          help_text='Tasks run brief, skipped or left pending to meet a run deadline')
+            elif kind == 'fused':
+                valid = event.get('valid', 0)
+                self._inc('fused_sections_total', {'result': 'valid'}, valid,
+                          'Sections from fused calls, valid or sent to per-agent fallback')
+                self._inc('fused_sections_total', {'result': 'fallback'}, event.get('sections', 0) - valid)
+            elif kind == 'rejection':
+                self._inc('rejections_total', {'agent': event.get('agent', '')},
+                          help_text='Responses rejected by _process_response')
+            elif kind == 'parse':
+                self._inc('response_parse_total', {'agent': event.get('agent', ''), 'path': event.get('path', '')},
+                          help_text='Response processing paths (direct, normalized, follow_up, ...)')
+            elif kind == 'task':
+                task = {'task': event.get('task', '')}
+                self._inc('task_seconds_sum', task, event.get('duration', 0.0), 'Task wall time')
+                self._inc('task_seconds_count', task)
+
+    def render(self) -> str:
+        with self._lock:
+            lines = []
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                family, kind = _family(name)
+                if family not in seen:
+                    seen.add(family)
+                    if family in self._help:
+                        lines.append(f"# HELP {family} {self._help[family]}")
+                    lines.append(f"# TYPE {family} {kind}")
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{{{label_text}}} {value:g}" if label_text else f"{name} {value:g}")
+            return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    """A label value as the text format needs it: backslash, double quote and newline escaped."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _family(name):
+    """Metric family and type for a sample name (_sum/_count belong to a summary)."""
+    for suffix in ('_sum', '_count'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)], 'summary'
+    return name, 'counter'
+
+
+class RunRecorder:
+    """Collects the events of one crew run and summarizes them."""
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = time.perf_counter()
+        self.events = []
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        with self._lock:
+            self.events.append(event)
+
+    def summary(self, dependencies=None) -> dict:
+        """Aggregate the run. dependencies maps task description -> upstream descriptions."""
+        with self._lock:
+            events = list(self.events)
+        calls = [e for e in events if e['type'] == 'llm_call']
+        tasks = {}
+        for event in events:
+            if event['type'] == 'task':
+                tasks[event['task']] = {
+                    'agent': event.get('agent'),
+                    'status': event.get('status'),
+                    'start': round(event['start'], 3),
+                    'duration': round(event['duration'], 3),
+                }
+        for call in calls:
+            task = tasks.get(call.get('task'))
+            if task is not None:
+                task['model_time'] = round(task.get('model_time', 0.0) + call.get('model_time', 0.0), 3)
+                task['queue_wait'] = round(task.get('queue_wait', 0.0) + call.get('queue_wait', 0.0), 3)
+
+        summary = {
+            'run_id': self.run_id,
+            'wall_time': round(time.perf_counter() - self.started, 3),
+            'llm_calls': len(calls),
+            'model_time': round(sum(c.get('model_time', 0.0) for c in calls), 3),
+            'queue_wait': round(sum(c.get('queue_wait', 0.0) for c in calls), 3),
+            'prompt_tokens': sum(c.get('prompt_tokens') or 0 for c in calls),
+            'response_tokens': sum(c.get('response_tokens') or 0 for c in calls),
+            # Prompt tokens served from the prefix cache vs. processed fresh
+            'cached_prompt_tokens': sum(c.get('cached_tokens') or 0 for c in calls),
+            'retries': sum(1 for e in events if e['type'] == 'retry'),
+            'cache_hits': sum(1 for e in events if e['type'] == 'cache' and e.get('hit')),
+            'cache_misses': sum(1 for e in events if e['type'] == 'cache' and not e.get('hit')),
+            'shared_calls': sum(1 for e in events if e['type'] == 'singleflight' and e.get('shared')),
+            # Duplicate requests sent for slow calls, and how many of them finished first
+            'hedges': sum(1 for e in events if e['type'] == 'hedge'),
+            'hedge_wins': sum(1 for e in events if e['type'] == 'hedge' and e.get('won')),
+            # Models routed around because they were throttled or slow
+            'fallbacks': sum(1 for e in events if e['type'] == 'fallback'),
+            'rejections': sum(1 for e in events if e['type'] == 'rejection'),
+            'parse_paths': _count(e.get('path') for e in events if e['type'] == 'parse'),
+            'models': _by_model(calls),
+            'tasks': tasks,
+        }
+        speculation = [e for e in events if e['type'] == 'speculation']
+        if speculation:
+            redone = sum(1 for e in speculation if e.get('outcome') == 'redone')
+            summary['speculation'] = {
+                'accepted': len(speculation) - redone,
+                'redone': redone,
+                'redo_rate': round(redone / len(speculation), 3),
+                'saved_seconds': round(sum(e.get('saved_seconds') or 0.0 for e in speculation), 3),
+            }
+        summary['fresh_prompt_tokens'] = summary['prompt_tokens'] - summary['cached_prompt_tokens']
+        if tasks:
+            summary['slowest_task'] = max(tasks, key=lambda name: tasks[name]['duration'])
+        if dependencies and tasks:
+            summary['critical_path'], summary['critical_path_seconds'] = _critical_path(tasks, dependencies)
+        return summary
+
+
+def _by_model(calls):
+    """Calls, tokens and model time per model that answered."""
+    models = {}
+    for call in calls:
+        usage = models.setdefault(call.get('model'), {
+            'calls': 0, 'prompt_tokens': 0, 'response_tokens': 0, 'model_time': 0.0})
+        usage['calls'] += 1
+        usage['prompt_tokens'] += call.get('prompt_tokens') or 0
+        usage['response_tokens'] += call.get('response_tokens') or 0
+        usage['model_time'] = round(usage['model_time'] + call.get('model_time', 0.0), 3)
+    return models
+
+
+def _count(values):
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+def _critical_path(tasks, dependencies):
+    """Longest chain of task durations through the dependency graph."""
+    best = {}
+
+    def longest(name):
+        if name not in best:
+            upstream = [longest(dep) for dep in dependencies.get(name, []) if dep in tasks]
+            seconds, path = max(upstream, default=(0.0, []))
+            best[name] = (seconds + tasks[name]['duration'], path + [name])
+        return best[name]
+
+    seconds, path = max(longest(name) for name in tasks)
+    return path, round(seconds, 3)
+
+
+class Instrumentation:
+    def __init__(self):
+        self.sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        with self._lock:
+            self.sinks = self.sinks + [sink]
+        return sink
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self.sinks = [s for s in self.sinks if s is not sink]
+
+    def emit(self, event_type, **fields):
+        recorder = _current_run.get()
+        if recorder is None and not self.sinks:
+            return
+        event = {'type': event_type, 'ts': time.time(), **fields}
+        task = _current_task.get()
+        if task is not None:
+            event.setdefault('task', task)
+        if recorder is not None:
+            event['run_id'] = recorder.run_id
+            recorder.record(event)
+        for sink in self.sinks:
+            sink.handle(event)
+
+
+hub = Instrumentation()
+
+
+def emit(event_type, **fields):
+    hub.emit(event_type, **fields)
+
+
+def add_sink(sink):
+    return hub.add_sink(sink)
+
+
+def remove_sink(sink):
+    hub.remove_sink(sink)
+
+
+def start_run() -> RunRecorder:
+    """Make a new RunRecorder current for this context (and copies of it)."""
+    recorder = RunRecorder()
+    recorder._token = _current_run.set(recorder)
+    return recorder
+
+
+def finish_run(recorder: RunRecorder):
+    """Restore whichever run was current before start_run()."""
+    _current_run.reset(recorder._token)
+
+
+def current_run():
+    return _current_run.get()
+
+
+def set_task(description):
+    """Label events emitted from this context with the task being run."""
+    _current_task.set(description)
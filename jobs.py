@@ -0,0 +1,277 @@
+"""Background analysis jobs.
+
+An AnalysisJob drains an analysis generator (anything yielding
+tasks.TaskEvent objects and returning the results, such as
+IncrementalAnalyzer.stream or stream_startup_analysis_flow) on a worker
+thread and keeps a thread-safe record of its progress, so a UI or server can
+poll it without ever blocking on model calls.
+
+JobQueue runs many such jobs on a bounded worker pool, rejecting new work
+with Backpressure once the queue or a client's share of it is full. Given an
+AnalysisStore it serves or warm-starts jobs from past analyses and saves
+every finished one. A job with a deadline finishes with whatever is done by
+then; the sections it left pending or skipped are completed by a follow-up
+job (AnalysisJob.followup) in the background.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import deadlines
+import routing
+from agents import is_error_result
+from example_task_flow import stream_startup_analysis_flow
+from store import stream_with_store
+
+
+class AnalysisJob:
+    """One analysis running in the background; poll snapshot() for progress."""
+
+    def __init__(self, idea: str, start, client: str = None, deadline: float = None, on_done=None,
+                 profile: str = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.idea = idea
+        self.client = client
+        self.status = 'queued'
+        self.partial = {}
+        self.finished = {}
+        self.events = []
+        self.results = None
+        self.error = None
+        self.created = time.time()
+        self.ended = None
+        # Seconds from creation the job has to finish, and the job completing what it left pending
+        self.deadline = deadline
+        self.followup = None
+        # Routing profile the job runs with (routing.PROFILES)
+        self.profile = profile
+        # on_done(job, results) runs once the job succeeds, before anyone waiting on it wakes up
+        self._on_done = on_done
+        self._start = start
+        self._changed = threading.Condition()
+        self._done = threading.Event()
+
+    def time_left(self):
+        """Seconds left until the job's deadline (counting time spent queued), or None."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.created + self.deadline - time.time())
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout=None) -> bool:
+        return self._done.wait(timeout)
+
+    def run(self):
+        """Drain the generator returned by start(); meant to run on a worker thread.
+
+        The job's routing profile and what is left of its deadline are set
+        here, around the whole drain, rather than inside the generator.
+        """
+        self._begin()
+        try:
+            with routing.use_profile(self.profile), deadlines.use(self.time_left()):
+                stream = self._start()
+                while True:
+                    try:
+                        event = next(stream)
+                    except StopIteration as finished:
+                        results = finished.value
+                        break
+                    self._record(event)
+        except Exception as e:
+            self._end(error=f"{type(e).__name__}: {e}")
+        else:
+            self._end(results)
+
+    def _begin(self):
+        with self._changed:
+            self.status = 'running'
+            self._changed.notify_all()
+
+    def _requeue(self):
+        """Back to queued, e.g. when the worker process running it died."""
+        with self._changed:
+            self.status = 'queued'
+            self._changed.notify_all()
+
+    def _end(self, results=None, error=None):
+        """Mark the job done with results, or failed with an error message."""
+        if error is None and self._on_done is not None:
+            self._on_done(self, results)
+        with self._changed:
+            self.status = 'failed' if error is not None else 'done'
+            self.results = results
+            self.error = error
+            self.ended = time.time()
+            self._done.set()
+            self._changed.notify_all()
+
+    def _record(self, event):
+        with self._changed:
+            if event.kind == 'chunk':
+                self.partial[event.description] = self.partial.get(event.description, '') + event.text
+            elif event.kind == 'completed':
+                self.finished[event.description] = event.text
+                self.partial.pop(event.description, None)
+            self.events.append({'kind': event.kind, 'task': event.description, 'text': event.text})
+            self._changed.notify_all()
+
+    def events_since(self, index: int, timeout: float = None):
+        """Events after the first index ones, waiting up to timeout for new ones.
+
+        Returns (events, done); done is True once the job has finished and
+        every event has been returned.
+        """
+        with self._changed:
+            if index >= len(self.events) and not self.done:
+                self._changed.wait(timeout)
+            events = self.events[index:]
+            return events, self.done and index + len(events) == len(self.events)
+
+    def snapshot(self) -> dict:
+        """Copy of the job's progress that is safe to read from another thread."""
+        with self._changed:
+            return {
+                'id': self.id,
+                'status': self.status,
+                'partial': dict(self.partial),
+                'finished': dict(self.finished),
+                'error': self.error,
+            }
+
+
+def analysis_stream(idea, mode='crew', compact_context=False, completed=None, store=None):
+    """The TaskEvent generator for one queued analysis.
+
+    It runs under the routing profile and deadline of the context draining
+    it (see AnalysisJob.run). Jobs with known results skip the store, which
+    could otherwise serve or warm-start them from a different baseline.
+    """
+    if store is not None and not completed:
+        return stream_with_store(idea, store, compact_context=compact_context, mode=mode)
+    return stream_startup_analysis_flow(idea, compact_context=compact_context, completed=completed, verbose=0,
+                                        mode=mode)
+
+
+def submit(executor, job: AnalysisJob) -> AnalysisJob:
+    """Start job on executor (any concurrent.futures executor) and return it."""
+    executor.submit(job.run)
+    return job
+
+
+class Backpressure(RuntimeError):
+    """Raised by JobQueue.submit when a job cannot be accepted right now."""
+
+    def __init__(self, message, retry_after=5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobQueue:
+    """Bounded in-process queue of analysis jobs.
+
+    At most `workers` analyses run at once and at most `max_queued` more wait
+    for a worker; each client may have `per_client` jobs queued or running.
+    Finished jobs are kept for lookup until `keep_finished` newer ones finish.
+    With a store (store.AnalysisStore), ideas close to a past analysis are
+    served or warm-started from it. With complete_pending, sections a job
+    left pending or skipped at its deadline are completed by a follow-up job.
+    """
+
+    def __init__(self, workers=4, max_queued=16, per_client=2, keep_finished=1000, compact_context=False,
+                 store=None, complete_pending=True):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.per_client = per_client
+        self.keep_finished = keep_finished
+        self.compact_context = compact_context
+        self.store = store
+        self.complete_pending = complete_pending
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._active = {}
+        self._finished = OrderedDict()
+        self._start()
+
+    def _start(self):
+        self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='analysis')
+
+    def submit(self, idea: str, client: str = 'anonymous', mode: str = 'crew', completed: dict = None,
+               profile: str = None, deadline: float = None) -> AnalysisJob:
+        """Queue an analysis; completed maps task descriptions to results that are already known.
+
+        profile is the routing profile to run it with (routing.PROFILES).
+        deadline is the number of seconds, from now, the job has to finish.
+        """
+        return self._enqueue(idea, client, mode, completed, profile, deadline, self.per_client)
+
+    def _enqueue(self, idea, client, mode, completed, profile, deadline, per_client):
+        with self._lock:
+            if sum(self._active.values()) >= self.workers + self.max_queued:
+                raise Backpressure("Job queue is full")
+            if per_client is not None and self._active.get(client, 0) >= per_client:
+                raise Backpressure(f"Client already has {per_client} jobs in progress")
+            job = AnalysisJob(idea, lambda: analysis_stream(idea, mode, self.compact_context, completed, self.store),
+                              client=client, deadline=deadline, profile=profile,
+                              on_done=self._complete_pending if self.complete_pending else None)
+            job.mode = mode
+            self._jobs[job.id] = job
+            self._active[client] = self._active.get(client, 0) + 1
+        self._dispatch(job, completed)
+        return job
+
+    def _dispatch(self, job, completed):
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        try:
+            job.run()
+        finally:
+            self._release(job)
+
+    def _release(self, job):
+        """Bookkeeping once a job has finished, however it ended."""
+        with self._lock:
+            self._active[job.client] -= 1
+            if not self._active[job.client]:
+                del self._active[job.client]
+            self._finished[job.id] = job
+            while len(self._finished) > self.keep_finished:
+                old_id, _ = self._finished.popitem(last=False)
+                self._jobs.pop(old_id, None)
+
+    def _complete_pending(self, job, results):
+        """Queue a follow-up job for the sections job left pending or skipped at its deadline."""
+        status = (getattr(results, 'summary', None) or {}).get('task_status', {})
+        if not any(value in ('pending', 'skipped') for value in status.values()):
+            return
+        completed = {task: result for task, result in job.finished.items() if not is_error_result(result)}
+        try:
+            # A continuation of job, which still counts against its client, so only the queue size applies
+            job.followup = self._enqueue(job.idea, job.client, job.mode, completed, job.profile, None, None)
+        except Backpressure:
+            # The client can still run the analysis again once there is room
+            pass
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'active': sum(self._active.values()),
+                'running': sum(1 for job in self._jobs.values() if job.status == 'running'),
+                'capacity': self.workers + self.max_queued,
+                'clients': len(self._active),
+                'finished': len(self._finished),
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,279 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+
+import deadlines
+
+# HTTP statuses worth retrying: throttling and transient server failures
+THROTTLE_STATUSES = {429}
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# google.api_core exception names, matched by name so the SDK stays optional here
+THROTTLE_ERRORS = {'ResourceExhausted', 'TooManyRequests'}
+RETRYABLE_ERRORS = THROTTLE_ERRORS | {
+    'ServiceUnavailable', 'InternalServerError', 'DeadlineExceeded', 'GatewayTimeout', 'BadGateway'
+}
+
+
+def _status(error):
+    code = getattr(error, 'code', None)
+    try:
+        return int(code)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttle(error) -> bool:
+    return type(error).__name__ in THROTTLE_ERRORS or _status(error) in THROTTLE_STATUSES
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in RETRYABLE_ERRORS or _status(error) in RETRYABLE_STATUSES
+
+
+class TokenBucket:
+    """Bucket refilled at `rate` units per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._level = float(capacity)
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount units, returning how long to wait until they are covered."""
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+        # Never ask for more than the bucket can ever hold, or we would wait forever
+        self._level -= min(amount, self.capacity)
+        if self._level >= 0:
+            return 0.0
+        return -self._level / self.rate
+
+
+class RateLimiter:
+    """Shared limiter for requests/min and (optionally) tokens/min.
+
+    With adaptive=True the request rate backs off multiplicatively whenever
+    the provider throttles us and creeps back up additively on success
+    (AIMD), settling just under the real quota instead of repeatedly hitting it.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float = None, burst: int = None,
+                 adaptive: bool = True, min_fraction: float = 0.1, decrease: float = 0.5,
+                 increase_per_success: float = 0.02):
+        if requests_per_minute <= 0:
+            raise ValueError("requests_per_minute must be positive")
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.adaptive = adaptive
+        self.min_rpm = requests_per_minute * min_fraction
+        self.decrease = decrease
+        self.increase = requests_per_minute * increase_per_success
+        self.throttled = 0
+        self._lock = threading.Lock()
+        capacity = burst or max(1, int(requests_per_minute // 60))
+        self._requests = TokenBucket(requests_per_minute / 60.0, capacity)
+        self._tokens = None
+        if tokens_per_minute:
+            self._tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute / 60.0 * max(1, capacity))
+
+    @property
+    def current_rpm(self) -> float:
+        return self._requests.rate * 60.0
+
+    def _reserve(self, tokens: int = 0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._requests.reserve(1, now)
+            if self._tokens is not None and tokens:
+                delay = max(delay, self._tokens.reserve(tokens, now))
+            return delay
+
+    def acquire(self, tokens: int = 0):
+        delay = self._reserve(tokens)
+        if delay:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int = 0):
+        delay = self._reserve(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def on_throttle(self):
+        with self._lock:
+            self.throttled += 1
+            if self.adaptive:
+                rpm = max(self.min_rpm, self.current_rpm * self.decrease)
+                self._requests.rate = rpm / 60.0
+
+    def on_success(self):
+        if not self.adaptive:
+            return
+        with self._lock:
+            rpm = min(self.requests_per_minute, self.current_rpm + self.increase)
+            self._requests.rate = rpm / 60.0
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for retryable model errors."""
+
+    def __init__(self, max_retries: int = 4, base_delay: float = 1.0, max_delay: float = 30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+# Process-wide limiter in front of every agent; None means unlimited
+limiter = None
+# Process-wide cap on model calls in flight through call(); None means no cap.
+# Async runs bound theirs with the semaphore of Crew.akickoff instead
+slots = None
+retry_policy = RetryPolicy()
+
+
+def configure(requests_per_minute: float = None, tokens_per_minute: float = None, burst: int = None,
+              adaptive: bool = True, max_in_flight: int = None):
+    """Install (or with no rate, remove) the shared limiter used by all agents.
+
+    max_in_flight, if given, also caps the model calls made at once.
+    """
+    global limiter, slots
+    if requests_per_minute:
+        limiter = RateLimiter(requests_per_minute, tokens_per_minute, burst=burst, adaptive=adaptive)
+    else:
+        limiter = None
+    slots = threading.BoundedSemaphore(max_in_flight) if max_in_flight else None
+    return limiter
+
+
+@contextlib.contextmanager
+def configured(requests_per_minute: float = None, tokens_per_minute: float = None, burst: int = None,
+               adaptive: bool = True, max_in_flight: int = None):
+    """configure() for the duration of a with block, then put the previous settings back.
+
+    Without requests_per_minute the current limiter stays in place.
+    """
+    global limiter, slots
+    previous = limiter, slots
+    try:
+        configure(requests_per_minute, tokens_per_minute, burst, adaptive, max_in_flight)
+        if not requests_per_minute:
+            limiter = previous[0]
+        yield limiter
+    finally:
+        limiter, slots = previous
+
+
+def acquire(tokens: int = 0):
+    if limiter is not None:
+        limiter.acquire(tokens)
+
+
+async def acquire_async(tokens: int = 0):
+    if limiter is not None:
+        await limiter.acquire_async(tokens)
+
+
+def record(error):
+    """Let the limiter back off when a failed attempt was throttled."""
+    if limiter is not None and is_throttle(error):
+        limiter.on_throttle()
+
+
+def _stats(stats):
+    if stats is not None:
+        stats.setdefault('queue_wait', 0.0)
+        stats.setdefault('model_time', 0.0)
+        stats.setdefault('attempts', 0)
+        stats.setdefault('retried_errors', [])
+    return stats
+
+
+def _account(stats, waited, started):
+    if stats is not None:
+        stats['queue_wait'] += started - waited
+        stats['model_time'] += time.perf_counter() - started
+        stats['attempts'] += 1
+
+
+def _too_late(delay):
+    """True if a retry after delay seconds would start past the current deadline."""
+    left = deadlines.remaining()
+    return left is not None and delay >= left
+
+
+def call(fn, tokens: int = 0, retryable=is_retryable, stats: dict = None):
+    """Call fn() behind the shared limiter, retrying transient errors with backoff.
+
+    If stats is given it accumulates queue_wait and model_time (seconds),
+    attempts, and the names of errors that were retried. Under a deadline
+    (deadlines.scope) no attempt starts, and no retry waits, past it.
+    """
+    stats = _stats(stats)
+    attempt = 0
+    while True:
+        waited = time.perf_counter()
+        deadlines.check()
+        acquire(tokens)
+        try:
+            with slots or contextlib.nullcontext():
+                started = time.perf_counter()
+                result = fn()
+        except Exception as e:
+            _account(stats, waited, started)
+            record(e)
+            delay = retry_policy.delay(attempt)
+            if not retryable(e) or attempt >= retry_policy.max_retries or _too_late(delay):
+                raise
+            retry_policy.record_retry()
+            if stats is not None:
+                stats['retried_errors'].append(type(e).__name__)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        _account(stats, waited, started)
+        if limiter is not None:
+            limiter.on_success()
+        return result
+
+
+async def call_async(fn, tokens: int = 0, retryable=is_retryable, stats: dict = None):
+    """Async counterpart of call(); fn returns an awaitable."""
+    stats = _stats(stats)
+    attempt = 0
+    while True:
+        waited = time.perf_counter()
+        deadlines.check()
+        await acquire_async(tokens)
+        started = time.perf_counter()
+        try:
+            result = await fn()
+        except Exception as e:
+            _account(stats, waited, started)
+            record(e)
+            delay = retry_policy.delay(attempt)
+            if not retryable(e) or attempt >= retry_policy.max_retries or _too_late(delay):
+                raise
+            retry_policy.record_retry()
+            if stats is not None:
+                stats['retried_errors'].append(type(e).__name__)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        _account(stats, waited, started)
+        if limiter is not None:
+            limiter.on_success()
+        return result
@@ -0,0 +1,213 @@
+"""Per-agent model routing with profiles and fallback.
+
+A profile maps each agent (by role) to a Route: the model to call, its
+output budget, and a faster fallback model. Profiles trade latency against
+cost and depth:
+
+    fast      flash-lite for every agent, tight output budgets
+    balanced  flash, with budgets sized to the 3-4 short bullets agents keep
+              (the default)
+    thorough  pro for the synthesis-heavy agents, flash elsewhere
+
+A run picks its profile with use_profile() (or the profile argument of the
+flows in example_task_flow); agents read it from a context variable, so
+concurrent analyses can use different profiles.
+
+When the routed model is throttled the call goes straight to the fallback
+instead of backing off (the shared rate limiter still slows down, and the
+fallback request waits for its own turn), and a model that is throttled or
+slower than its route's slow_after is avoided for COOLDOWN seconds.
+
+Run summaries break calls and tokens down by model; cost() prices them with
+PRICES.
+"""
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+import instrumentation
+import ratelimit
+
+# Seconds a throttled or slow model is skipped in favour of its fallback
+COOLDOWN = 30.0
+# List prices in USD per million (prompt, response) tokens
+PRICES = {
+    'gemini-2.0-flash-lite': (0.075, 0.30),
+    'gemini-2.0-flash': (0.10, 0.40),
+    'gemini-1.5-pro': (1.25, 5.00),
+}
+DEFAULT_PROFILE = os.getenv('THINKTANK_PROFILE', 'balanced')
+
+
+class Route:
+    """Where one agent's calls go: model, output budget and fallback."""
+
+    def __init__(self, model: str, max_output_tokens: int = 1024, fallback: str = None, slow_after: float = None):
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.fallback = fallback
+        # Calls slower than this put the model in cooldown
+        self.slow_after = slow_after
+
+    def generation_config(self, base: dict) -> dict:
+        return dict(base, max_output_tokens=self.max_output_tokens)
+
+    def __repr__(self):
+        return f"Route({self.model!r}, {self.max_output_tokens}, fallback={self.fallback!r})"
+
+
+# Agents whose answers synthesize several upstream results get a larger budget
+SYNTHESIS_ROLES = ('Investor Pitch Agent', 'Monetization Optimization Agent', 'Business Model Agent')
+
+PROFILES = {
+    'fast': {
+        'default': Route('gemini-2.0-flash-lite', 256),
+        **{role: Route('gemini-2.0-flash-lite', 320) for role in SYNTHESIS_ROLES},
+    },
+    'balanced': {
+        'default': Route('gemini-2.0-flash', 256, fallback='gemini-2.0-flash-lite', slow_after=20.0),
+        **{role: Route('gemini-2.0-flash', 384, fallback='gemini-2.0-flash-lite', slow_after=20.0)
+           for role in SYNTHESIS_ROLES},
+    },
+    'thorough': {
+        'default': Route('gemini-2.0-flash', 512, fallback='gemini-2.0-flash-lite', slow_after=30.0),
+        **{role: Route('gemini-1.5-pro', 768, fallback='gemini-2.0-flash', slow_after=45.0)
+           for role in SYNTHESIS_ROLES},
+    },
+}
+
+_profile = contextvars.ContextVar('thinktank_profile', default=None)
+
+
+@contextlib.contextmanager
+def use_profile(name: str = None):
+    """Route calls made in this context (and tasks started from it) with profile name.
+
+    None keeps the current profile.
+    """
+    if name is None:
+        yield
+        return
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile {name!r}; expected one of {', '.join(PROFILES)}")
+    token = _profile.set(name)
+    try:
+        yield
+    finally:
+        _profile.reset(token)
+
+
+def profiled(stream, name: str = None):
+    """Wrap a TaskEvent generator so it runs under profile name; returns the same value."""
+    with use_profile(name):
+        return (yield from stream)
+
+
+def current_profile() -> str:
+    return _profile.get() or DEFAULT_PROFILE
+
+
+def route_for(role: str, default_model: str) -> Route:
+    """The route for an agent under the current profile."""
+    profile = PROFILES.get(current_profile())
+    if profile is None:
+        return Route(default_model)
+    return profile.get(role) or profile.get('default') or Route(default_model)
+
+
+class Router:
+    """Tracks which models are cooling down and sends calls to the right one."""
+
+    def __init__(self, cooldown: float = COOLDOWN):
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._cooling = {}  # model -> monotonic time its cooldown ends
+
+    def _degrade(self, model, reason, agent):
+        with self._lock:
+            self._cooling[model] = time.monotonic() + self.cooldown
+        instrumentation.emit('fallback', agent=agent, model=model, reason=reason)
+
+    def healthy(self, model: str) -> bool:
+        with self._lock:
+            return self._cooling.get(model, 0.0) <= time.monotonic()
+
+    def pick(self, route: Route) -> str:
+        if route.fallback and not self.healthy(route.model):
+            return route.fallback
+        return route.model
+
+    def _falls_back(self, route, model, error, retryable):
+        """True if a failed call to model should be sent again to the route's fallback."""
+        if not (ratelimit.is_throttle(error) and route.fallback and model != route.fallback):
+            return False
+        return retryable is None or retryable(error)
+
+    def _answered(self, route, model, started, stats, agent):
+        if route.slow_after is not None and model == route.model and \
+                time.perf_counter() - started > route.slow_after:
+            self._degrade(model, 'slow', agent)
+        if stats is not None:
+            stats['model'] = model
+
+    def call(self, route: Route, send, stats: dict = None, agent: str = None, retryable=None, tokens: int = 0):
+        """Return send(model) for the route's model, switching to the fallback when it is throttled.
+
+        retryable(error), if given, must also be true to fall back. The
+        throttle is reported to the shared rate limiter, and the fallback
+        request takes its own turn (of tokens) there. The model that answered
+        is stored in stats['model'].
+        """
+        model = self.pick(route)
+        started = time.perf_counter()
+        try:
+            response = send(model)
+        except Exception as e:
+            if not self._falls_back(route, model, e, retryable):
+                raise
+            ratelimit.record(e)
+            self._degrade(model, 'throttled', agent)
+            model = route.fallback
+            ratelimit.acquire(tokens)
+            started = time.perf_counter()
+            response = send(model)
+        self._answered(route, model, started, stats, agent)
+        return response
+
+    async def call_async(self, route: Route, send, stats: dict = None, agent: str = None, retryable=None,
+                         tokens: int = 0):
+        """Async counterpart of call(); send(model) returns an awaitable."""
+        model = self.pick(route)
+        started = time.perf_counter()
+        try:
+            response = await send(model)
+        except Exception as e:
+            if not self._falls_back(route, model, e, retryable):
+                raise
+            ratelimit.record(e)
+            self._degrade(model, 'throttled', agent)
+            model = route.fallback
+            await ratelimit.acquire_async(tokens)
+            started = time.perf_counter()
+            response = await send(model)
+        self._answered(route, model, started, stats, agent)
+        return response
+
+    def reset(self):
+        with self._lock:
+            self._cooling.clear()
+
+
+# Shared by every agent
+router = Router()
+
+
+def cost(models: dict) -> float:
+    """USD for a summary's per-model breakdown ({model: {'prompt_tokens', 'response_tokens', ...}})."""
+    total = 0.0
+    for model, usage in models.items():
+        prompt_price, response_price = PRICES.get(model, (0.0, 0.0))
+        total += usage.get('prompt_tokens', 0) * prompt_price + usage.get('response_tokens', 0) * response_price
+    return round(total / 1e6, 6)
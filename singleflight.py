@@ -0,0 +1,148 @@
+"""Coalescing of identical in-flight model calls.
+
+When several analyses send the same prompt at the same time (duplicate
+submissions, or the same idea in two batch rows), only the first caller (the
+leader) calls the model; the others wait for its result instead of sending
+their own request. Works across threads and event loops, so sync and async
+callers share flights. Waiters give up on a flight at their own deadline, and
+take over from a leader that was cancelled rather than share its cancellation.
+"""
+import asyncio
+import threading
+
+import deadlines
+
+
+class _Flight:
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self.event = threading.Event()
+        self.callbacks = []
+
+    def cancelled(self) -> bool:
+        """True if the call was interrupted (e.g. asyncio cancellation) rather than failed."""
+        return self.error is not None and not isinstance(self.error, Exception)
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers share it.
+
+    leaders counts the calls made (including those of waiters that gave up on
+    a flight) and shared the callers that were given another caller's result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def _join(self, key):
+        """Return (flight, is_leader) for key, creating the flight if none is running."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.leaders += 1
+            return flight, True
+
+    def _count(self, shared):
+        with self._lock:
+            if shared:
+                self.shared += 1
+            else:
+                self.leaders += 1
+
+    def _share(self, flight):
+        """The landed flight's result for a waiter, counted as shared once it is returned."""
+        result = flight.outcome()
+        self._count(shared=True)
+        return result, True
+
+    def _land(self, key, flight):
+        with self._lock:
+            del self._flights[key]
+            callbacks = flight.callbacks
+        flight.event.set()
+        for callback in callbacks:
+            callback()
+
+    def do(self, key, fn):
+        """Return (fn() or the result of the identical call in flight, shared).
+
+        A caller with a deadline (deadlines.scope) waits for the call in flight
+        only until then, and makes the call itself once it has waited too long.
+        If the caller making the call was cancelled, the others take over.
+        """
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            if not flight.event.wait(deadlines.remaining()):
+                self._count(shared=False)
+                return fn(), False
+            if not flight.cancelled():
+                return self._share(flight)
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.result, False
+
+    async def do_async(self, key, fn):
+        """Async counterpart of do(); fn returns an awaitable."""
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                break
+            loop = asyncio.get_running_loop()
+            landed = loop.create_future()
+
+            def wake():
+                loop.call_soon_threadsafe(lambda: landed.done() or landed.set_result(None))
+            with self._lock:
+                # The flight may have landed between _join and here
+                pending = key in self._flights and self._flights[key] is flight
+                if pending:
+                    flight.callbacks.append(wake)
+            if pending:
+                try:
+                    await asyncio.wait_for(landed, deadlines.remaining())
+                except asyncio.TimeoutError:
+                    self._count(shared=False)
+                    return await fn(), False
+            if not flight.cancelled():
+                return self._share(flight)
+        try:
+            flight.result = await fn()
+        except BaseException as e:
+            # Includes cancellation, so waiters are never handed an empty result
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+        return flight.result, False
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.leaders + self.shared
+            return {
+                'leaders': self.leaders,
+                'shared': self.shared,
+                'in_flight': len(self._flights),
+                'dedup_rate': round(self.shared / total, 4) if total else 0.0,
+            }
+
+
+# Shared by every agent in agents.py
+flights = SingleFlight()
@@ -0,0 +1,421 @@
+"""Persistent store of past analyses, searchable by text and by similarity.
+
+AnalysisStore keeps every finished analysis in SQLite: the idea, each task's
+result with its timing and status, the run summary and the config that
+produced it (crew spec, mode, routing profile and each task's model route). Two indexes sit on top:
+
+- an FTS5 full-text index over idea text (LIKE matching when the SQLite build
+  lacks FTS5), paged by id so listing stays fast however many rows there are;
+- a MinHash signature of each idea, bucketed into LSH bands, so ideas close to
+  a new one are found without scanning the table.
+
+analyze_with_store() and stream_with_store() use it in front of the crew: a
+near-identical idea that was analyzed before with the same config is served
+straight from the store, and a merely similar one with the same config
+becomes the baseline for IncrementalAnalyzer, so only the sections the
+differences touch are re-run (the run's summary['store'] records which).
+
+Example:
+    store = AnalysisStore('analyses.db')
+    results = analyze_with_store("A marketplace for local repair shops", store)
+    rows, cursor = store.search("repair", limit=20)
+    more, cursor = store.search("repair", limit=20, before=cursor)
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+import crew_spec
+import routing
+from agents import GENERATION_CONFIG, is_error_result
+from example_task_flow import (
+    build_startup_analysis_crew, create_startup_analysis_flow, stream_startup_analysis_flow
+)
+from incremental import IncrementalAnalyzer
+from tasks import CrewResults, TaskEvent
+
+# MinHash permutations per idea, split into BANDS bands of NUM_PERM // BANDS rows;
+# with 16 bands of 4, pairs above ~0.5 similarity almost always share a bucket
+NUM_PERM = 64
+BANDS = 16
+# Similar analyses whose signatures are compared for each lookup
+MAX_CANDIDATES = 200
+# At or above this similarity a stored analysis is served as-is
+SERVE_SIMILARITY = 0.9
+# At or above this similarity a stored analysis is the baseline for an incremental run
+WARM_SIMILARITY = 0.5
+# crew_config() entries a stored analysis must share with the current run to be served or warm-started from
+SERVE_CONFIG_KEYS = ('crew', 'mode', 'profile', 'routes')
+
+WORD = re.compile(r"[a-z0-9][a-z0-9']*")
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(1)
+# Fixed, so signatures stay comparable across processes and restarts
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+
+def normalize(idea: str) -> str:
+    return ' '.join(idea.split())
+
+
+def idea_hash(idea: str) -> str:
+    return hashlib.sha256(normalize(idea).lower().encode('utf-8')).hexdigest()
+
+
+def shingles(idea: str) -> set:
+    """Words and adjacent word pairs of the idea, lowercased."""
+    words = WORD.findall(idea.lower())
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def signature(idea: str) -> array:
+    """MinHash signature of the idea's shingles."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'big') % _MERSENNE
+        for s in shingles(idea)
+    ] or [0]
+    return array('Q', (min((a * h + b) % _MERSENNE for h in hashes) for a, b in _PERMUTATIONS))
+
+
+def similarity(first: array, second: array) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(first, second) if x == y) / len(first)
+
+
+def bands(sig: array):
+    """(band, bucket) pairs the signature is indexed under."""
+    rows = len(sig) // BANDS
+    for band in range(BANDS):
+        chunk = sig[band * rows:(band + 1) * rows].tobytes()
+        yield band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), 'big', signed=True)
+
+
+def parse_results(results) -> list:
+    """[(description, text)] from kickoff's "Task N: description\\nResult: text" strings."""
+    parsed = []
+    for result in results:
+        header, _, text = result.partition("\nResult: ")
+        parsed.append((header.split(': ', 1)[-1], text))
+    return parsed
+
+
+def servable(match, threshold: float = SERVE_SIMILARITY, mode: str = 'crew', profile: str = None) -> bool:
+    """True if a lookup() match can be served as-is to a run in mode under routing profile `profile`.
+
+    It has to be close enough, have every task succeed, have the sections of
+    the current crew spec, which may have changed since it was stored, and
+    have been produced with the same mode, profile and model routes.
+    """
+    if match is None or match['similarity'] < threshold or not match['complete']:
+        return False
+    if set(match['results']) != set(crew_spec.current().descriptions):
+        return False
+    return same_config(match, crew_config(mode=mode, profile=profile))
+
+
+def same_config(match, expected: dict) -> bool:
+    """True if a stored analysis was produced with the crew, mode, profile and routes of expected (a crew_config())."""
+    return all(match['config'].get(key) == expected[key] for key in SERVE_CONFIG_KEYS)
+
+
+def crew_config(crew=None, mode: str = 'crew', profile: str = None) -> dict:
+    """The settings behind a crew's results (the current spec's crew by default) run in mode.
+
+    Each task's route (model and generation config) is resolved under
+    profile, by default the current one (routing.current_profile()).
+    """
+    crew = crew or build_startup_analysis_crew(verbose=0)
+    routes = {}
+    with routing.use_profile(profile):
+        for task in crew.tasks:
+            route = routing.route_for(task.agent.role, task.agent.model_name)
+            routes[task.description] = {'model': route.model,
+                                        'generation_config': route.generation_config(GENERATION_CONFIG)}
+        profile = routing.current_profile()
+    return {
+        'crew': crew_spec.current().name,
+        'mode': mode,
+        'profile': profile,
+        'routes': routes,
+    }
+
+
+class AnalysisStore:
+    """SQLite store of analyses with full-text search and MinHash similarity lookup."""
+
+    def __init__(self, path: str = ':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS analyses ('
+            'id INTEGER PRIMARY KEY, idea TEXT NOT NULL, idea_hash TEXT NOT NULL, '
+            'created_at REAL NOT NULL, mode TEXT NOT NULL, complete INTEGER NOT NULL, '
+            'wall_time REAL, config TEXT, summary TEXT, signature BLOB NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS analyses_hash ON analyses (idea_hash)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'analysis_id INTEGER NOT NULL, position INTEGER NOT NULL, task TEXT NOT NULL, '
+            'result TEXT NOT NULL, duration REAL, status TEXT, '
+            'PRIMARY KEY (analysis_id, position)) WITHOUT ROWID'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS lsh ('
+            'band INTEGER NOT NULL, bucket INTEGER NOT NULL, analysis_id INTEGER NOT NULL, '
+            'PRIMARY KEY (band, bucket, analysis_id)) WITHOUT ROWID'
+        )
+        try:
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5("
+                "idea, content='analyses', content_rowid='id')"
+            )
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False  # SQLite built without FTS5: search falls back to LIKE
+        self._conn.commit()
+
+    def save(self, idea: str, results, config: dict = None, mode: str = 'crew', profile: str = None) -> int:
+        """Store a finished analysis (a CrewResults or list of kickoff strings); returns its id.
+
+        config defaults to crew_config() for the standard crew run in mode
+        under routing profile `profile` (the current one by default).
+        """
+        parsed = parse_results(results)
+        summary = getattr(results, 'summary', None) or {}
+        timings = summary.get('tasks', {})
+        sig = signature(idea)
+        complete = all(not is_error_result(text) for _, text in parsed)
+        if config is None:
+            config = crew_config(mode=mode, profile=profile)
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO analyses (idea, idea_hash, created_at, mode, complete, wall_time, config, summary, '
+                'signature) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (normalize(idea), idea_hash(idea), time.time(), mode, int(complete), summary.get('wall_time'),
+                 json.dumps(config), json.dumps(summary, default=str), sig.tobytes()),
+            )
+            analysis_id = cursor.lastrowid
+            self._conn.executemany(
+                'INSERT INTO results (analysis_id, position, task, result, duration, status) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (analysis_id, i, task, text, timings.get(task, {}).get('duration'),
+                     timings.get(task, {}).get('status') or ('error' if is_error_result(text) else 'ok'))
+                    for i, (task, text) in enumerate(parsed)
+                ],
+            )
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO lsh (band, bucket, analysis_id) VALUES (?, ?, ?)',
+                [(band, bucket, analysis_id) for band, bucket in bands(sig)],
+            )
+            if self.full_text:
+                self._conn.execute('INSERT INTO analyses_fts (rowid, idea) VALUES (?, ?)',
+                                   (analysis_id, normalize(idea)))
+            self._conn.commit()
+        return analysis_id
+
+    def get(self, analysis_id: int):
+        """The stored analysis as a dict, or None if there is no such id."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, idea, created_at, mode, complete, config, summary FROM analyses WHERE id = ?',
+                (analysis_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            tasks = self._conn.execute(
+                'SELECT task, result, duration, status FROM results WHERE analysis_id = ? ORDER BY position',
+                (analysis_id,),
+            ).fetchall()
+        return {
+            'id': row[0],
+            'idea': row[1],
+            'created_at': row[2],
+            'mode': row[3],
+            'complete': bool(row[4]),
+            'config': json.loads(row[5] or '{}'),
+            'summary': json.loads(row[6] or '{}'),
+            'results': {task: result for task, result, _, _ in tasks},
+            'timings': {task: {'duration': duration, 'status': status} for task, _, duration, status in tasks},
+        }
+
+    def similar(self, idea: str, threshold: float = WARM_SIMILARITY, limit: int = 5) -> list:
+        """[(similarity, id)] of stored analyses at least threshold-similar to idea, closest first."""
+        exact = idea_hash(idea)
+        sig = signature(idea)
+        keys = list(bands(sig))
+        where = ' OR '.join(['(band = ? AND bucket = ?)'] * len(keys))
+        with self._lock:
+            candidates = self._conn.execute(
+                f'SELECT analysis_id FROM lsh WHERE {where} GROUP BY analysis_id '
+                f'ORDER BY COUNT(*) DESC, analysis_id DESC LIMIT ?',
+                [value for key in keys for value in key] + [MAX_CANDIDATES],
+            ).fetchall()
+            ids = [row[0] for row in candidates]
+            rows = self._conn.execute(
+                f'SELECT id, idea_hash, signature FROM analyses WHERE id IN ({",".join("?" * len(ids))})', ids
+            ).fetchall() if ids else []
+        scored = []
+        for analysis_id, stored_hash, blob in rows:
+            if stored_hash == exact:
+                score = 1.0
+            else:
+                score = similarity(sig, array('Q', blob))
+            if score >= threshold:
+                scored.append((score, analysis_id))
+        # Newest first among equally close matches
+        scored.sort(key=lambda item: (-item[0], -item[1]))
+        return scored[:limit]
+
+    def lookup(self, idea: str, threshold: float = WARM_SIMILARITY, complete: bool = False):
+        """The closest stored analysis (with its 'similarity') at or above threshold, or None.
+
+        complete=True only considers analyses in which every task succeeded.
+        """
+        for score, analysis_id in self.similar(idea, threshold, limit=MAX_CANDIDATES if complete else 1):
+            record = self.get(analysis_id)
+            if record is not None and (record['complete'] or not complete):
+                record['similarity'] = round(score, 3)
+                return record
+        return None
+
+    def _closest(self, idea, threshold, accept):
+        for score, analysis_id in self.similar(idea, threshold, limit=MAX_CANDIDATES):
+            record = self.get(analysis_id)
+            if record is None:
+                continue
+            record['similarity'] = round(score, 3)
+            if accept(record):
+                return record
+        return None
+
+    def serve(self, idea: str, threshold: float = SERVE_SIMILARITY, mode: str = 'crew', profile: str = None):
+        """The closest stored analysis that servable() allows for a run in mode under profile, or None."""
+        return self._closest(idea, threshold, lambda record: servable(record, threshold, mode, profile))
+
+    def warm_start(self, idea: str, threshold: float = WARM_SIMILARITY, mode: str = 'crew', profile: str = None):
+        """The closest stored analysis produced with the config of a run in mode under profile, or None.
+
+        Unlike serve() it may be incomplete: the run re-runs the sections that failed.
+        """
+        expected = crew_config(mode=mode, profile=profile)
+        return self._closest(idea, threshold, lambda record: same_config(record, expected))
+
+    def search(self, query: str = None, limit: int = 20, before: int = None):
+        """Page through analyses matching query (all of them without one), newest first.
+
+        Returns (rows, cursor); pass cursor back as before= for the next page,
+        it is None once there are no more rows.
+        """
+        params = []
+        if query and self.full_text:
+            # Quote every word so user input is never parsed as FTS syntax
+            phrase = ' '.join('"' + word.replace('"', '""') + '"' for word in query.split())
+            sql = ('SELECT a.id, a.idea, a.created_at, a.mode, a.complete, a.wall_time '
+                   'FROM analyses_fts JOIN analyses a ON a.id = analyses_fts.rowid WHERE analyses_fts MATCH ?')
+            params.append(phrase)
+        else:
+            sql = 'SELECT a.id, a.idea, a.created_at, a.mode, a.complete, a.wall_time FROM analyses a WHERE 1'
+            for word in (query or '').split():
+                sql += " AND a.idea LIKE ? ESCAPE '\\'"
+                params.append('%' + re.sub(r'([%_\\])', r'\\\1', word) + '%')
+        if before is not None:
+            sql += ' AND a.id < ?'
+            params.append(before)
+        sql += ' ORDER BY a.id DESC LIMIT ?'
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        page = [
+            {'id': r[0], 'idea': r[1], 'created_at': r[2], 'mode': r[3], 'complete': bool(r[4]), 'wall_time': r[5]}
+            for r in rows
+        ]
+        return page, (page[-1]['id'] if len(page) == limit else None)
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM analyses').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def store_from_env() -> AnalysisStore:
+    """Build the shared store: on disk at THINKTANK_STORE_PATH when set, else in memory."""
+    return AnalysisStore(os.getenv('THINKTANK_STORE_PATH') or ':memory:')
+
+
+def served_results(record) -> CrewResults:
+    """Rebuild kickoff-style results from a stored analysis, noting where they came from."""
+    summary = dict(record['summary'])
+    summary['store'] = {'id': record['id'], 'similarity': record['similarity'], 'served': True}
+    return CrewResults(
+        [f"Task {i+1}: {task}\nResult: {text}" for i, (task, text) in enumerate(record['results'].items())],
+        summary,
+    )
+
+
+def _warm_analyzer(record, compact_context, verbose):
+    analyzer = IncrementalAnalyzer(compact_context=compact_context, verbose=verbose)
+    analyzer.restore(record['idea'], record['results'])
+    return analyzer
+
+
+def _annotate(results, record, served=False):
+    if record is not None:
+        results.summary['store'] = {'id': record['id'], 'similarity': record['similarity'], 'served': served}
+    return results
+
+
+def analyze_with_store(idea: str, store: AnalysisStore, serve_threshold: float = SERVE_SIMILARITY,
+                       warm_threshold: float = WARM_SIMILARITY, compact_context: bool = False, verbose: int = 0,
+                       mode: str = 'crew') -> CrewResults:
+    """Analyze idea, serving or warm-starting from the closest stored analysis; saves the result.
+
+    Warm starts only apply to mode='crew'; other modes run in full when nothing is close enough to serve.
+    Only analyses run in the same mode and routing profile as this one are served.
+    """
+    served = store.serve(idea, serve_threshold, mode)
+    if served is not None:
+        if verbose:
+            print(f"Serving analysis {served['id']} from the store ({served['similarity']:.0%} similar)")
+        return served_results(served)
+    match = store.warm_start(idea, warm_threshold, mode) if mode == 'crew' else None
+    if match is not None:
+        if verbose:
+            print(f"Warm-starting from analysis {match['id']} ({match['similarity']:.0%} similar)")
+        results = _warm_analyzer(match, compact_context, verbose).analyze(idea)
+    else:
+        results = create_startup_analysis_flow(idea, compact_context, verbose, mode=mode)
+    # Stored with the summary['store'] note, so a warm-started analysis says where it started from
+    _annotate(results, match)
+    store.save(idea, results, mode=mode)
+    return results
+
+
+def stream_with_store(idea: str, store: AnalysisStore, serve_threshold: float = SERVE_SIMILARITY,
+                      warm_threshold: float = WARM_SIMILARITY, compact_context: bool = False, verbose: int = 0,
+                      mode: str = 'crew'):
+    """Generator form of analyze_with_store(), yielding tasks.TaskEvent objects."""
+    served = store.serve(idea, serve_threshold, mode)
+    if served is not None:
+        for i, (task, text) in enumerate(served['results'].items()):
+            yield TaskEvent('completed', i, task, text)
+        return served_results(served)
+    match = store.warm_start(idea, warm_threshold, mode) if mode == 'crew' else None
+    if match is not None:
+        results = yield from _warm_analyzer(match, compact_context, verbose).stream(idea)
+    else:
+        results = yield from stream_startup_analysis_flow(idea, compact_context, verbose=verbose, mode=mode)
+    _annotate(results, match)
+    store.save(idea, results, mode=mode)
+    return results
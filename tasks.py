@@ -1,42 +1,628 @@
-from typing import List
-from agents import Agent
+import asyncio
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, Iterator, List, Optional
+import deadlines
+import instrumentation
+import routing
+from agents import Agent, PENDING_RESULT, SKIPPED_RESULT, is_error_result
+from bullets import parse_bullets
+from context import ContextSelector
 
 class Task:
-    def __init__(self, description: str, agent: Agent):
+    def __init__(self, description: str, agent: Agent, depends_on: Optional[List['Task']] = None,
+                 context: Optional[List['Task']] = None, context_budget: Optional[int] = None,
+                 optional: bool = False):
         self.description = description
         self.agent = agent
+        # None keeps the original behaviour (depend on every earlier task);
+        # an explicit list, even an empty one, declares the upstream tasks.
+        self.depends_on = depends_on
+        # Upstream tasks whose results are relevant to this one (defaults to
+        # depends_on); each must be a direct or indirect dependency.
+        self.context = context
+        # Token budget for this task's context when the crew compacts context
+        self.context_budget = context_budget
+        # Optional tasks are skipped when a run's deadline gets too close
+        self.optional = optional
         self.result = None
 
+class TaskEvent:
+    """Progress event emitted while a crew runs.
+
+    kind is 'started', 'chunk' (partial model text in text) or 'completed'
+    (the final processed result in text).
+    """
+    def __init__(self, kind: str, index: int, description: str, text: str = ''):
+        self.kind = kind
+        self.index = index
+        self.description = description
+        self.text = text
+
+    def __repr__(self):
+        return f"TaskEvent({self.kind!r}, {self.index}, {self.description!r})"
+
+class Speculation:
+    """When a crew may start a task before its upstream results are final.
+
+    A task is started speculatively once every unfinished upstream task has
+    streamed at least min_bullets complete bullets, or (if deadline is set)
+    once it has waited that many seconds, using whatever has streamed so far
+    as context. When the upstream tasks finish, the guess is kept if no bullet
+    it saw was changed and no more than max_missing of the final bullets were
+    missing from it; otherwise the task is run again with the final context.
+    """
+    def __init__(self, min_bullets: int = 2, deadline: Optional[float] = None, max_missing: float = 0.5,
+                 max_guesses: int = 4, poll_interval: float = 0.02):
+        self.min_bullets = min_bullets
+        self.deadline = deadline
+        self.max_missing = max_missing
+        # Guesses run on extra workers so they never hold up the final runs
+        self.max_guesses = max_guesses
+        self.poll_interval = poll_interval
+
+    def ready(self, streamed: Dict[int, str], waited: float) -> bool:
+        if self.deadline is not None and waited >= self.deadline:
+            return True
+        return all(len(parse_bullets(text)[0]) >= self.min_bullets for text in streamed.values())
+
+    def holds(self, used: str, final: str) -> bool:
+        """True if a guess made from the streamed text used is still good for final."""
+        if is_error_result(final):
+            return False
+        seen = parse_bullets(used)[0]
+        final_bullets = parse_bullets(final)[0]
+        if not final_bullets or any(bullet not in final_bullets for bullet in seen):
+            return False
+        missing = sum(1 for bullet in final_bullets if bullet not in seen)
+        return missing / len(final_bullets) <= self.max_missing
+
+class CrewResults(list):
+    """The formatted task results, plus the run's profiling summary.
+
+    summary['task_status'] maps each task description to 'done', 'brief',
+    'reused', 'error', 'skipped' or 'pending' (see deadlines).
+    """
+    def __init__(self, results: List[str], summary: dict):
+        super().__init__(results)
+        self.summary = summary
+
 class Crew:
-    def __init__(self, agents: List[Agent], tasks: List[Task], verbose: int = 1):
+    def __init__(self, agents: List[Agent], tasks: List[Task], verbose: int = 1, max_workers: int = 3,
+                 context_selector: Optional[ContextSelector] = None, speculation: Optional[Speculation] = None,
+                 graph: Optional[dict] = None):
         self.agents = agents
         self.tasks = tasks
         self.verbose = verbose
+        self.max_workers = max_workers
+        self.context_selector = context_selector or ContextSelector()
+        # Opt-in early start of tasks on partial upstream output (kickoff only)
+        self.speculation = speculation
+        # Input tokens sent vs. full-context baseline for the last run
+        self.context_report = None
+        # Profiling summary of the last run (see instrumentation.RunRecorder)
+        self.last_summary = None
+        # Compiled task graph (see compile_graph), e.g. shared by crews built from one crew_spec.CrewSpec
+        self.graph = graph
+
+    def _dependencies(self) -> Dict[int, List[int]]:
+        """Map each task index to the indices of the tasks it waits on."""
+        index_of = {id(task): i for i, task in enumerate(self.tasks)}
+        dependencies = {}
+        for i, task in enumerate(self.tasks):
+            if task.depends_on is None:
+                dependencies[i] = list(range(i))
+                continue
+            upstream = []
+            for dep in task.depends_on:
+                if id(dep) not in index_of:
+                    raise ValueError(f"Task '{task.description}' depends on a task that is not part of this crew")
+                upstream.append(index_of[id(dep)])
+            dependencies[i] = sorted(set(upstream))
+        self._topological_order(dependencies)
+        return dependencies
 
-    def kickoff(self, startup_idea: str) -> List[str]:
-        results = []
-        
-        # Execute tasks sequentially
+    def _context_sources(self, dependencies: Dict[int, List[int]], ancestors: Dict[int, set]) -> Dict[int, List[int]]:
+        """Map each task index to the upstream task indices it receives results from."""
+        index_of = {id(task): i for i, task in enumerate(self.tasks)}
+        sources = {}
         for i, task in enumerate(self.tasks):
-            if self.verbose >= 1:
-                print(f"\nExecuting task {i+1}/{len(self.tasks)}: {task.description}")
-            
-            # Prepare context from previous results
-            context = {
-                'startup_idea': startup_idea,
-                'previous_results': {
-                    f"Task {idx+1}": t.result 
-                    for idx, t in enumerate(self.tasks[:i]) 
-                    if t.result is not None
-                }
+            if task.context is None:
+                sources[i] = dependencies[i]
+                continue
+            selected = sorted({index_of.get(id(t), -1) for t in task.context})
+            if any(idx not in ancestors[i] for idx in selected):
+                raise ValueError(f"Task '{task.description}' takes context from a task it does not depend on")
+            sources[i] = selected
+        return sources
+
+    def compile_graph(self) -> dict:
+        """Validate the task graph and work out what every run needs from it, once.
+
+        Returns the dependencies, ancestors, context sources and chains of
+        each task index, and a topological order. Runs only read it, so it is
+        kept on the crew (and can be passed to other crews with the same tasks).
+        """
+        if self.graph is None:
+            dependencies = self._dependencies()
+            ancestors = self._ancestors(dependencies)
+            self.graph = {
+                'dependencies': dependencies,
+                'ancestors': ancestors,
+                'sources': self._context_sources(dependencies, ancestors),
+                'chains': self._chains(dependencies),
+                'order': self._topological_order(dependencies),
             }
-            
-            # Execute the task
-            response = task.agent.run(context)
-            task.result = response
-            results.append(f"Task {i+1}: {task.description}\nResult: {response}")
-            
-            if self.verbose >= 2:
-                print(f"Task completed. Result: {response}")
-        
-        return results
\ No newline at end of file
+        return self.graph
+
+    def downstream(self, descriptions) -> set:
+        """Descriptions of the given tasks plus every task that depends on them."""
+        graph = self.compile_graph()
+        dependencies = graph['dependencies']
+        affected = {i for i, task in enumerate(self.tasks) if task.description in descriptions}
+        for i in graph['order']:
+            if any(dep in affected for dep in dependencies[i]):
+                affected.add(i)
+        return {self.tasks[i].description for i in affected}
+
+    def _chains(self, dependencies: Dict[int, List[int]]) -> Dict[int, int]:
+        """Map each task index to the length of the longest chain of tasks waiting on it."""
+        chains = {}
+        for i in reversed(self._topological_order(dependencies)):
+            chains[i] = max((chains[j] + 1 for j, deps in dependencies.items() if i in deps), default=0)
+        return chains
+
+    def _ancestors(self, dependencies: Dict[int, List[int]]) -> Dict[int, set]:
+        ancestors = {}
+        for i in self._topological_order(dependencies):
+            ancestors[i] = set(dependencies[i])
+            for dep in dependencies[i]:
+                ancestors[i] |= ancestors[dep]
+        return ancestors
+
+    def _plan(self, deadline=None) -> dict:
+        """Reset state for a new run around the compiled task graph."""
+        graph = self.compile_graph()
+        deadline = deadlines.budget(deadline) or deadlines.current()
+        if deadline is not None:
+            deadline.begin()
+        plan = {
+            **graph,
+            'started': time.perf_counter(),
+            'lock': threading.Lock(),
+            # Task index -> 'done', 'brief', 'reused', 'error', 'skipped' or 'pending'
+            'status': {},
+            'deadline': deadline,
+            # Durations of tasks run normally, to estimate the next ones
+            'durations': [],
+        }
+        for task in self.tasks:
+            task.result = None
+        self.context_selector.start_run()
+        return plan
+
+    def _topological_order(self, dependencies: Dict[int, List[int]]) -> List[int]:
+        """Order task indices so every task comes after its upstream tasks."""
+        order = []
+        remaining = {i: set(deps) for i, deps in dependencies.items()}
+        while remaining:
+            ready = sorted(i for i, deps in remaining.items() if not deps)
+            if not ready:
+                cycle = ", ".join(self.tasks[i].description for i in sorted(remaining))
+                raise ValueError(f"Task dependencies contain a cycle: {cycle}")
+            for i in ready:
+                del remaining[i]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+            order.extend(ready)
+        return order
+
+    def _upstream_results(self, indices, overrides: Optional[Dict[int, str]] = None) -> Dict[str, str]:
+        results = {idx: self.tasks[idx].result for idx in indices}
+        results.update((idx, text) for idx, text in (overrides or {}).items() if idx in results)
+        return {
+            f"Task {idx+1}": results[idx]
+            for idx in sorted(results)
+            # Failed (or not yet started) tasks are left out rather than passed on as "context"
+            if results[idx] and not is_error_result(results[idx])
+        }
+
+    def _context(self, i: int, startup_idea: str, plan: dict, overrides: Optional[Dict[int, str]] = None) -> dict:
+        """Prepare context from the relevant results of upstream tasks.
+
+        overrides stands in for upstream results that are not final yet.
+        """
+        task = self.tasks[i]
+        if self.verbose >= 1:
+            early = " (speculative)" if overrides else ""
+            print(f"\nExecuting task {i+1}/{len(self.tasks)}{early}: {task.description}")
+        previous_results = self.context_selector.select(
+            task.description,
+            self._upstream_results(plan['sources'][i], overrides),
+            self._upstream_results(plan['ancestors'][i], overrides),
+            token_budget=task.context_budget
+        )
+        return {
+            'startup_idea': startup_idea,
+            'previous_results': previous_results
+        }
+
+    def _complete(self, i: int, response: str) -> str:
+        self.tasks[i].result = response
+        if self.verbose >= 2:
+            print(f"Task completed. Result: {response}")
+        return response
+
+    def _streamed(self, plan: dict, i: int) -> str:
+        """Complete lines task i has streamed so far in a speculative run."""
+        with plan['lock']:
+            text = plan['streamed'].get(i, '')
+        return text[:text.rfind('\n') + 1]
+
+    def _record_task(self, i: int, plan: dict, started: float):
+        task = self.tasks[i]
+        instrumentation.emit(
+            'task',
+            task=task.description,
+            agent=task.agent.role,
+            status='error' if is_error_result(task.result) else 'ok',
+            start=started - plan['started'],
+            duration=time.perf_counter() - started
+        )
+
+    def _stage(self, i: int, plan: dict):
+        """Degradation stage and sub-deadline of task i under the run's deadline (see deadlines)."""
+        deadline = plan['deadline']
+        if deadline is None:
+            return 'normal', None
+        with plan['lock']:
+            durations = list(plan['durations'])
+        estimate = sum(durations) / len(durations) if durations else None
+        stage, at = deadline.stage(plan['chains'][i], estimate, self.tasks[i].optional)
+        if stage == 'brief':
+            instrumentation.emit('deadline', task=self.tasks[i].description, action='brief')
+        return stage, at
+
+    def _stand_in(self, i: int, plan: dict, status: str, callback=None):
+        """Give task i a pending or skipped stand-in result instead of running it."""
+        description = self.tasks[i].description
+        result = PENDING_RESULT if status == 'pending' else SKIPPED_RESULT
+        with plan['lock']:
+            self.tasks[i].result = result
+            plan['status'][i] = status
+        if self.verbose >= 1:
+            print(f"\nTask {i+1}/{len(self.tasks)} {status}: {description}")
+        instrumentation.emit('deadline', task=description, action=status)
+        if callback is not None:
+            callback(TaskEvent('completed', i, description, result))
+
+    def _abandon(self, plan: dict, indices, callback=None):
+        """The run's deadline has passed: report the unfinished tasks as pending."""
+        with plan['lock']:
+            plan['abandoned'] = True
+        for i in sorted(indices):
+            self._stand_in(i, plan, 'pending', callback)
+
+    def _settle(self, i: int, plan: dict, response: str, stage: str, started: float, callback=None) -> bool:
+        """Record task i's response; False if the run already reported it as pending."""
+        with plan['lock']:
+            if plan.get('abandoned'):
+                return False
+            self._complete(i, response)
+            if is_error_result(response):
+                plan['status'][i] = 'error'
+            else:
+                plan['status'][i] = 'brief' if stage == 'brief' else 'done'
+            if stage == 'normal':
+                plan['durations'].append(time.perf_counter() - started)
+        self._record_task(i, plan, started)
+        if callback is not None:
+            callback(TaskEvent('completed', i, self.tasks[i].description, response))
+        return True
+
+    def _run_task(self, i: int, startup_idea: str, plan: dict,
+                  callback: Optional[Callable[[TaskEvent], None]] = None, stream: bool = False,
+                  stage: str = 'normal', deadline: Optional[float] = None) -> str:
+        description = self.tasks[i].description
+        instrumentation.set_task(description)
+        started = time.perf_counter()
+        context = self._context(i, startup_idea, plan)
+        # Speculative crews watch every task's output as it streams
+        watch = 'streamed' in plan
+        on_chunk = None
+        if callback is not None or watch:
+            def on_chunk(text):
+                if watch:
+                    with plan['lock']:
+                        plan['streamed'][i] = plan['streamed'].get(i, '') + text
+                if callback is not None and stream:
+                    callback(TaskEvent('chunk', i, description, text))
+
+        if callback is not None:
+            callback(TaskEvent('started', i, description))
+        response = self.tasks[i].agent.run(context, stream=stream or watch, on_chunk=on_chunk,
+                                           deadline=deadline, brief=stage == 'brief')
+        self._settle(i, plan, response, stage, started, callback)
+        return response
+
+    def _guess(self, i: int, startup_idea: str, plan: dict, overrides: Dict[int, str]) -> str:
+        """Run task i on partial upstream output; the result is not kept until confirmed."""
+        instrumentation.set_task(self.tasks[i].description)
+        return self.tasks[i].agent.run(self._context(i, startup_idea, plan, overrides))
+
+    def _accept(self, i: int, guess: dict, unblocked: float, plan: dict, callback):
+        """Keep a confirmed guess as task i's result."""
+        description = self.tasks[i].description
+        response = guess['future'].result()
+        with plan['lock']:
+            if plan.get('abandoned'):
+                return
+            self._complete(i, response)
+            plan['status'][i] = 'error' if is_error_result(response) else 'done'
+        if callback is not None:
+            callback(TaskEvent('started', i, description))
+        # Only the part after the upstream tasks finished is on the critical path
+        self._record_task(i, plan, min(unblocked, guess['finished']))
+        saved = min(guess['finished'] - guess['started'], unblocked - guess['started'])
+        instrumentation.emit('speculation', task=description, outcome='accepted', saved_seconds=round(saved, 4))
+        if callback is not None:
+            callback(TaskEvent('completed', i, description, response))
+
+    def _schedule_speculative(self, executor, pending: set, done: set, startup_idea: str, plan: dict,
+                              callback, stream):
+        """Like the plain scheduling loop, but guesses tasks early (see Speculation)."""
+        policy = self.speculation
+        dependencies = plan['dependencies']
+        plan['streamed'] = {}
+        running = {}      # future -> ('run' | 'guess', task index)
+        started_at = {}   # task index -> when its final run started
+        finished_at = {}  # task index -> when its final result was known
+        guesses = {}      # task index -> {'future', 'used', 'started', 'finished'}
+
+        def submit(kind, fn, i, *args):
+            future = executor.submit(contextvars.copy_context().run, fn, i, startup_idea, plan, *args)
+            running[future] = (kind, i)
+            return future
+
+        def run(i):
+            pending.discard(i)
+            started_at[i] = time.perf_counter()
+            submit('run', self._run_task, i, callback, stream)
+
+        while pending or running:
+            now = time.perf_counter()
+            for i in sorted(pending):
+                deps = dependencies[i]
+                guess = guesses.get(i)
+                if all(dep in done for dep in deps):
+                    if guess is None:
+                        run(i)
+                    elif not all(policy.holds(used, self.tasks[dep].result) for dep, used in guess['used'].items()):
+                        del guesses[i]
+                        instrumentation.emit('speculation', task=self.tasks[i].description, outcome='redone')
+                        run(i)
+                    elif guess['finished'] is not None:
+                        del guesses[i]
+                        pending.discard(i)
+                        unblocked = max((finished_at.get(dep, plan['started']) for dep in deps), default=now)
+                        self._accept(i, guess, unblocked, plan, callback)
+                        finished_at[i] = time.perf_counter()
+                        done.add(i)
+                    continue
+                # Guess only from upstream runs that are final, never from other guesses
+                unfinished = [dep for dep in deps if dep not in done]
+                if guess is not None or len(guesses) >= policy.max_guesses \
+                        or not all(dep in started_at for dep in unfinished):
+                    continue
+                streamed = {dep: self._streamed(plan, dep) for dep in unfinished}
+                if policy.ready(streamed, now - max(started_at[dep] for dep in unfinished)):
+                    guesses[i] = {'used': streamed, 'started': now, 'finished': None}
+                    guesses[i]['future'] = submit('guess', self._guess, i, streamed)
+
+            if not running:
+                continue
+            finished, _ = wait(running, timeout=policy.poll_interval, return_when=FIRST_COMPLETED)
+            for future in finished:
+                kind, i = running.pop(future)
+                future.result()
+                if kind == 'run':
+                    done.add(i)
+                    finished_at[i] = time.perf_counter()
+                elif i in guesses and guesses[i]['future'] is future:
+                    guesses[i]['finished'] = time.perf_counter()
+
+    def _summarize(self, recorder, plan: dict) -> CrewResults:
+        self.context_report = self.context_selector.report()
+        dependencies = {
+            task.description: [self.tasks[dep].description for dep in plan['dependencies'][i]]
+            for i, task in enumerate(self.tasks)
+        }
+        summary = recorder.summary(dependencies)
+        summary['context_tokens'] = self.context_report
+        summary['cost_usd'] = routing.cost(summary['models'])
+        status = {task.description: plan['status'].get(i, 'pending') for i, task in enumerate(self.tasks)}
+        summary['task_status'] = status
+        deadline = plan['deadline']
+        if deadline is not None:
+            counts = {name: sum(1 for value in status.values() if value == name)
+                      for name in ('brief', 'skipped', 'pending')}
+            summary['deadline'] = {'seconds': round(deadline.seconds, 3), 'met': not counts['pending'], **counts}
+        self.last_summary = summary
+        return CrewResults(self._results(), summary)
+
+    def _results(self) -> List[str]:
+        # Results keep the order in which the tasks were declared
+        return [
+            f"Task {i+1}: {task.description}\nResult: {task.result}"
+            for i, task in enumerate(self.tasks)
+        ]
+
+    def kickoff(self, startup_idea: str, callback: Optional[Callable[[TaskEvent], None]] = None,
+                stream: bool = False, completed: Optional[Dict[str, str]] = None, deadline=None) -> List[str]:
+        """Run all tasks and return their results in declaration order.
+
+        If callback is given it receives a TaskEvent for every task start and
+        completion, called from worker threads; with stream=True agents stream
+        their responses and partial chunks are reported too. completed maps
+        task descriptions to results from an earlier run; those tasks are not
+        run again and their results are reused as context.
+
+        deadline (a deadlines.Deadline or seconds; defaults to the one set
+        with deadlines.use()) bounds the run: tasks degrade as it gets close
+        and kickoff returns when it passes, with unfinished tasks pending.
+        It cannot be combined with speculation.
+
+        The returned list also carries a profiling summary in its .summary
+        attribute (timings, tokens, retries, cache hits, critical path, task status).
+        """
+        recorder = instrumentation.start_run()
+        try:
+            return self._kickoff(startup_idea, callback, stream, completed, deadline, recorder)
+        finally:
+            instrumentation.finish_run(recorder)
+
+    def _kickoff(self, startup_idea, callback, stream, completed, deadline, recorder) -> CrewResults:
+        plan = self._plan(deadline)
+        dependencies = plan['dependencies']
+
+        # Execute each task as soon as all of its upstream tasks have finished
+        pending = set(range(len(self.tasks)))
+        done = set()
+        running = {}
+        for i, task in enumerate(self.tasks):
+            if completed and task.description in completed:
+                task.result = completed[task.description]
+                plan['status'][i] = 'reused'
+                pending.discard(i)
+                done.add(i)
+        if self.speculation is not None:
+            if plan['deadline'] is not None:
+                raise ValueError("A deadline cannot be combined with speculation")
+            workers = max(1, self.max_workers) + self.speculation.max_guesses
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                self._schedule_speculative(executor, pending, done, startup_idea, plan, callback, stream)
+            return self._summarize(recorder, plan)
+
+        deadline = plan['deadline']
+        executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers))
+        try:
+            while pending or running:
+                for i in sorted(pending):
+                    if all(dep in done for dep in dependencies[i]):
+                        pending.discard(i)
+                        stage, at = self._stage(i, plan)
+                        if stage in ('skipped', 'pending'):
+                            self._stand_in(i, plan, stage, callback)
+                            done.add(i)
+                            continue
+                        # Each task runs in its own copy of the context so run and
+                        # task labels for instrumentation follow it into the worker
+                        task_context = contextvars.copy_context()
+                        running[executor.submit(task_context.run, self._run_task, i, startup_idea, plan,
+                                                callback, stream, stage, at)] = i
+                if not running:
+                    continue
+                timeout = deadline.remaining() if deadline is not None else None
+                finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                    done.add(running.pop(future))
+                if not finished and deadline is not None and deadline.expired():
+                    self._abandon(plan, pending | set(running.values()), callback)
+                    break
+        finally:
+            # Past the deadline, calls still in flight finish on their own and are ignored
+            executor.shutdown(wait=not plan.get('abandoned'), cancel_futures=True)
+
+        return self._summarize(recorder, plan)
+
+    def kickoff_stream(self, startup_idea: str, completed: Optional[Dict[str, str]] = None,
+                       deadline=None) -> Iterator[TaskEvent]:
+        """Generator form of kickoff(callback=..., stream=True).
+
+        Yields TaskEvents in the caller's thread as they happen; the list that
+        kickoff() would return becomes the generator's return value.
+        """
+        events = queue.Queue()
+        outcome = {}
+        finished = object()
+
+        def run():
+            try:
+                outcome['results'] = self.kickoff(startup_idea, callback=events.put, stream=True,
+                                                  completed=completed, deadline=deadline)
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                events.put(finished)
+
+        # The run inherits the caller's context, e.g. its routing profile
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(run,), daemon=True)
+        worker.start()
+        while True:
+            event = events.get()
+            if event is finished:
+                break
+            yield event
+        worker.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['results']
+
+    async def akickoff(self, startup_idea: str, semaphore: Optional[asyncio.Semaphore] = None,
+                       deadline=None) -> List[str]:
+        """Async counterpart of kickoff().
+
+        Pass a shared semaphore to bound the number of in-flight model calls
+        across many concurrent analyses; by default each run allows max_workers.
+        At the deadline, tasks still running are cancelled and reported pending.
+        """
+        recorder = instrumentation.start_run()
+        try:
+            return await self._akickoff(startup_idea, semaphore, deadline, recorder)
+        finally:
+            instrumentation.finish_run(recorder)
+
+    async def _akickoff(self, startup_idea, semaphore, deadline, recorder) -> CrewResults:
+        plan = self._plan(deadline)
+        dependencies = plan['dependencies']
+        deadline = plan['deadline']
+        if semaphore is None:
+            semaphore = asyncio.BoundedSemaphore(max(1, self.max_workers))
+
+        runs = {}
+
+        async def run_task(i: int) -> str:
+            await asyncio.gather(*(runs[dep] for dep in dependencies[i]))
+            # Every asyncio task has its own context, so this label stays local
+            instrumentation.set_task(self.tasks[i].description)
+            stage, at = self._stage(i, plan)
+            if stage in ('skipped', 'pending'):
+                self._stand_in(i, plan, stage)
+                return self.tasks[i].result
+            started = time.perf_counter()
+            context = self._context(i, startup_idea, plan)
+            async with semaphore:
+                response = await self.tasks[i].agent.arun(context, deadline=at, brief=stage == 'brief')
+            self._settle(i, plan, response, stage, started)
+            return response
+
+        # Create the runs in topological order so each one can await its upstream
+        for i in plan['order']:
+            runs[i] = asyncio.ensure_future(run_task(i))
+        if deadline is None:
+            await asyncio.gather(*runs.values())
+        else:
+            finished, unfinished = await asyncio.wait(runs.values(), timeout=deadline.remaining())
+            for run in unfinished:
+                run.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+            for run in finished:
+                run.result()
+            if unfinished:
+                self._abandon(plan, [i for i, run in runs.items() if run in unfinished])
+
+        return self._summarize(recorder, plan)
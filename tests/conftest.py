@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import crew_spec  # noqa: E402
+import fused  # noqa: E402
+import hedging  # noqa: E402
+import ratelimit  # noqa: E402
+import routing  # noqa: E402
+from clients import registry  # noqa: E402
+from fake_model import FakeModel  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def offline():
+    """Quiet agents that always reach the model, with no limiter, hedger or cooldowns left over."""
+    options = dict(crew_spec.agent_options)
+    fused_cache, fused_flights = fused.cache, fused.flights
+    crew_spec.configure_agents(verbose=False, cache=None, flights=None)
+    fused.cache = fused.flights = None
+    yield
+    crew_spec.configure_agents(**options)
+    fused.cache, fused.flights = fused_cache, fused_flights
+    registry.set_backend(None)
+    ratelimit.configure(None)
+    hedging.configure(enabled=False)
+    routing.router.reset()
+
+
+@pytest.fixture
+def fake():
+    """One FakeModel serving every model name."""
+    model = FakeModel(latency=0.01)
+    registry.set_backend(lambda name: model)
+    return model
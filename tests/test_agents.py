@@ -0,0 +1,77 @@
+import asyncio
+
+from agents import Agent
+from clients import registry
+from fake_model import FakeRateLimitError, FakeResponse, FakeUsage
+from tasks import Crew, Task
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+FIRST = "• Repair shops have idle capacity\n• Customers struggle to find trusted repairers"
+EXTRA = "1. Warranty partners could refer customers"
+
+
+class ShortAnswers:
+    """Answers with two bullets, and with one more when asked for the missing ones.
+
+    Models in throttled answer the follow-up request with a 429.
+    """
+
+    def __init__(self, model_name, extra=EXTRA, throttled=()):
+        self.model_name = model_name
+        self.extra = extra
+        self.throttled = throttled
+        self.prompts = []
+
+    def _answer(self, prompt):
+        self.prompts.append(prompt)
+        follow_up = "more key insight" in prompt
+        if follow_up and self.model_name in self.throttled:
+            raise FakeRateLimitError("429")
+        text = self.extra if follow_up else FIRST
+        return FakeResponse(text, FakeUsage(prompt, text))
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        response = self._answer(prompt)
+        return iter([response]) if stream else response
+
+    async def generate_content_async(self, prompt, generation_config=None, **kwargs):
+        return self._answer(prompt)
+
+
+def agent(model):
+    return Agent("Market Research Agent", "Research the market", "An analyst.", verbose=False, model=model)
+
+
+def test_missing_bullets_are_asked_for_and_merged():
+    model = ShortAnswers('fake')
+    expected = FIRST + "\n• Warranty partners could refer customers"
+    assert agent(model).run(IDEA) == expected
+    assert len(model.prompts) == 2
+    follow_up = model.prompts[1]
+    assert "give exactly 1 more key insight(s)" in follow_up
+    assert "Do not repeat these existing insights:\n" + FIRST in follow_up
+
+    chunks = []
+    assert agent(model).run(IDEA, stream=True, on_chunk=chunks.append) == expected
+    assert chunks == [FIRST]
+    assert asyncio.run(agent(model).arun(IDEA)) == expected
+
+
+def test_a_follow_up_that_only_repeats_fails():
+    model = ShortAnswers('fake', extra=FIRST)
+    result = agent(model).run(IDEA)
+    assert result.startswith("Error in Market Research Agent") and "Not enough bullet points" in result
+
+
+def test_follow_up_calls_count_in_the_run_summary():
+    # The follow-up is throttled on the routed model and answered by its fallback
+    registry.set_backend(lambda name: ShortAnswers(name, throttled={'gemini-2.0-flash'}))
+    task = Task("Research the market", agent(None), depends_on=[])
+    results = Crew([], [task], verbose=0).kickoff(IDEA)
+    assert task.result.count("•") == 3
+    models = results.summary['models']
+    assert {name: usage['calls'] for name, usage in models.items()} == {
+        'gemini-2.0-flash': 1, 'gemini-2.0-flash-lite': 1}
+    assert models['gemini-2.0-flash-lite']['response_tokens'] > 0
+    assert results.summary['parse_paths'] == {'follow_up': 1, 'recovered': 1}
+    assert results.summary['fallbacks'] == 1
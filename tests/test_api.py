@@ -0,0 +1,94 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import api
+from api import make_server
+from clients import registry
+from fake_model import FakeModel
+from jobs import JobQueue
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+
+
+@pytest.fixture
+def server():
+    model = FakeModel(latency=0.1)
+    registry.set_backend(lambda name: model)
+    queue = JobQueue(workers=1, max_queued=2, per_client=2)
+    server = make_server('127.0.0.1', 0, queue)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    queue.shutdown()
+
+
+def request(server, method, path, body=None, headers=None):
+    """(status, headers, JSON payload) of one request to server."""
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        if body is not None and not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.headers, json.loads(response.read() or b'null')
+    finally:
+        connection.close()
+
+
+def test_job_paths_ignore_the_query_string(server):
+    status, headers, job = request(server, 'POST', '/jobs?source=test', {'idea': IDEA})
+    assert status == 202
+    assert headers['Location'] == f"/jobs/{job['id']}"
+
+    status, _, progress = request(server, 'GET', f"/jobs/{job['id']}?verbose=1")
+    assert status == 200 and progress['id'] == job['id']
+    status, _, _ = request(server, 'GET', f"/jobs/{job['id']}/result?wait=0")
+    assert status in (200, 409)
+    assert request(server, 'GET', '/health?full=1')[0] == 200
+    assert request(server, 'GET', '/jobs/0123abcd?x=1')[0] == 404
+
+
+@pytest.mark.parametrize('body, message', [
+    (b'not json', "Body must be JSON"),
+    ({'mode': 'crew'}, "Field 'idea' is required"),
+    ({'idea': "   "}, "Field 'idea' is required"),
+    ({'idea': IDEA, 'mode': 'solo'}, "Field 'mode' must be one of crew, fused"),
+    ({'idea': IDEA, 'profile': 'cheapest'}, "Field 'profile' must be one of"),
+    ({'idea': IDEA, 'deadline': 0}, "Field 'deadline' must be a positive number"),
+    ({'idea': IDEA, 'deadline': True}, "Field 'deadline' must be a positive number"),
+])
+def test_invalid_jobs_are_rejected(server, body, message):
+    status, _, payload = request(server, 'POST', '/jobs', body)
+    assert status == 400
+    assert payload['error'].startswith(message)
+
+
+def test_invalid_content_length_is_rejected(server):
+    status, _, payload = request(server, 'POST', '/jobs', headers={'Content-Length': 'lots'})
+    assert (status, payload['error']) == (400, "Invalid Content-Length header")
+
+
+def test_large_bodies_are_rejected(server):
+    body = json.dumps({'idea': 'x' * api.MAX_BODY}).encode('utf-8')
+    status, _, payload = request(server, 'POST', '/jobs', body)
+    assert (status, payload['error']) == (413, "Request body too large")
+
+
+def test_full_queues_answer_429_with_retry_after(server):
+    # One client may have two jobs in progress
+    for n in range(2):
+        assert request(server, 'POST', '/jobs', {'idea': f"{IDEA} {n}"}, {'X-Client-Id': 'a'})[0] == 202
+    status, headers, payload = request(server, 'POST', '/jobs', {'idea': IDEA}, {'X-Client-Id': 'a'})
+    assert status == 429 and "2 jobs in progress" in payload['error']
+    assert headers['Retry-After'] == '5'
+
+    # One running and two queued jobs fill the queue for everyone else
+    assert request(server, 'POST', '/jobs', {'idea': IDEA}, {'X-Client-Id': 'b'})[0] == 202
+    status, _, payload = request(server, 'POST', '/jobs', {'idea': IDEA}, {'X-Client-Id': 'c'})
+    assert (status, payload['error']) == (429, "Job queue is full")
+    assert request(server, 'GET', '/health')[2]['capacity'] == 3
@@ -0,0 +1,32 @@
+import asyncio
+
+from agents import is_error_result
+from example_task_flow import build_startup_analysis_crew, create_startup_analysis_flow_async
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+
+
+def test_akickoff_runs_every_task(fake):
+    crew = build_startup_analysis_crew(verbose=0)
+    results = asyncio.run(crew.akickoff(IDEA))
+    assert len(results) == len(crew.tasks)
+    assert not any(is_error_result(task.result) for task in crew.tasks)
+
+
+def test_akickoff_defaults_to_max_workers_calls_at_once(fake):
+    crew = build_startup_analysis_crew(verbose=0)
+    asyncio.run(crew.akickoff(IDEA))
+    assert 1 < fake.max_in_flight <= crew.max_workers
+
+
+def test_shared_semaphore_bounds_calls_across_analyses(fake):
+    async def main():
+        semaphore = asyncio.Semaphore(3)
+        return await asyncio.gather(*(
+            create_startup_analysis_flow_async(f"{IDEA} #{n}", semaphore=semaphore, verbose=0) for n in range(4)
+        ))
+
+    results = asyncio.run(main())
+    assert len(results) == 4
+    assert fake.calls >= 4 * len(build_startup_analysis_crew(verbose=0).tasks)
+    assert fake.max_in_flight == 3
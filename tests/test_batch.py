@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+import crew_spec
+import ratelimit
+from batch import BatchRunner, Checkpoint, read_ideas
+from clients import registry
+from fake_model import FakeModel
+
+IDEAS = [
+    {'id': 'repair', 'idea': "A marketplace that matches local repair shops with people whose appliances broke"},
+    {'id': 'tutor', 'idea': "Peer tutoring for university students, paid per session"},
+]
+
+
+class FailingPitch:
+    """FakeModel whose Investor Pitch Agent always fails."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def with_system_instruction(self, system_instruction):
+        if "Investor Pitch Agent" in system_instruction:
+            return self
+        return self.model.with_system_instruction(system_instruction)
+
+    def generate_content(self, prompt, **kwargs):
+        raise ValueError("bad request")
+
+
+def lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def runner(tmp_path, name='results.jsonl', **kwargs):
+    return BatchRunner(str(tmp_path / name), **kwargs)
+
+
+def test_read_ideas_from_csv_jsonl_and_text(tmp_path):
+    csv_file = tmp_path / 'ideas.csv'
+    csv_file.write_text('id,idea\nrepair,Repair marketplace\n,Peer tutoring\nempty,\n', encoding='utf-8')
+    assert list(read_ideas(str(csv_file))) == [{'id': 'repair', 'idea': 'Repair marketplace'},
+                                               {'id': '2', 'idea': 'Peer tutoring'}]
+    jsonl_file = tmp_path / 'ideas.jsonl'
+    jsonl_file.write_text('{"id": "a", "idea": "Repair marketplace"}\n\n{"idea": "Peer tutoring"}\n',
+                          encoding='utf-8')
+    assert list(read_ideas(str(jsonl_file))) == [{'id': 'a', 'idea': 'Repair marketplace'},
+                                                 {'id': '3', 'idea': 'Peer tutoring'}]
+    text_file = tmp_path / 'ideas.txt'
+    text_file.write_text('Repair marketplace\n\nPeer tutoring\n', encoding='utf-8')
+    assert [record['id'] for record in read_ideas(str(text_file))] == ['1', '3']
+
+
+def test_csv_without_an_idea_column_is_rejected(tmp_path):
+    path = tmp_path / 'ideas.csv'
+    path.write_text('id,title\n1,Repair marketplace\n', encoding='utf-8')
+    with pytest.raises(ValueError, match="no 'idea' column"):
+        list(read_ideas(str(path)))
+    empty = tmp_path / 'empty.csv'
+    empty.write_text('', encoding='utf-8')
+    assert list(read_ideas(str(empty))) == []
+
+
+def test_unreadable_jsonl_lines_are_reported_not_fatal(tmp_path):
+    path = tmp_path / 'ideas.jsonl'
+    path.write_text('{"idea": "Repair marketplace"}\nnot json\n["a list"]\n{"idea": 5}\n', encoding='utf-8')
+    records = list(read_ideas(str(path)))
+    assert records[0] == {'id': '1', 'idea': 'Repair marketplace'}
+    assert [(record['id'], 'error' in record) for record in records[1:]] == [('2', True), ('3', True), ('4', True)]
+
+
+def test_batch_writes_failed_lines_and_goes_on(tmp_path, fake):
+    path = tmp_path / 'ideas.jsonl'
+    path.write_text('not json\n' + json.dumps(IDEAS[0]) + '\n', encoding='utf-8')
+    stats = runner(tmp_path).run(read_ideas(str(path)))
+    assert (stats['completed'], stats['failed']) == (1, 1)
+    statuses = {line['id']: line['status'] for line in lines(tmp_path / 'results.jsonl')}
+    assert statuses == {'1': 'failed', 'repair': 'complete'}
+
+
+def test_interrupted_batch_resumes_only_unfinished_tasks(tmp_path):
+    model = FakeModel()
+    registry.set_backend(lambda name: FailingPitch(model))
+    tasks = len(crew_spec.current().tasks)
+
+    first = runner(tmp_path).run(IDEAS)
+    assert first['incomplete'] == 2
+    assert model.calls == 2 * (tasks - 1)
+    checkpoint = Checkpoint(str(tmp_path / 'results.jsonl.checkpoint'))
+    assert len(checkpoint.completed('repair')) == tasks - 1
+    checkpoint.close()
+
+    registry.set_backend(lambda name: model)
+    second = runner(tmp_path).run(IDEAS)
+    assert second['completed'] == 2
+    # Only the investor pitch of each idea is run again
+    assert model.calls == 2 * (tasks - 1) + 2
+    latest = {line['id']: line for line in lines(tmp_path / 'results.jsonl')}
+    assert latest['repair']['reused_tasks'] == tasks - 1
+    assert latest['repair']['failed_tasks'] == []
+
+    third = runner(tmp_path).run(IDEAS)
+    assert (third['skipped'], third['completed']) == (2, 0)
+    assert model.calls == 2 * (tasks - 1) + 2
+
+
+def test_concurrency_caps_model_calls_across_ideas(tmp_path):
+    model = FakeModel(latency=0.02)
+    registry.set_backend(lambda name: model)
+    ideas = [{'id': str(n), 'idea': f"{IDEAS[0]['idea']} #{n}"} for n in range(4)]
+    stats = runner(tmp_path, concurrency=2).run(ideas)
+    assert stats['completed'] == 4
+    assert model.max_in_flight == 2
+
+
+def test_limits_apply_to_the_batch_only(tmp_path, fake):
+    process_limiter = ratelimit.configure(6000)
+    runner(tmp_path, requests_per_minute=3000).run(IDEAS[:1])
+    assert ratelimit.limiter is process_limiter
+    assert ratelimit.slots is None
+
+    runner(tmp_path, 'more.jsonl', concurrency=2).run(IDEAS[1:])
+    assert ratelimit.limiter is process_limiter
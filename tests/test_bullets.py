@@ -0,0 +1,32 @@
+import pytest
+
+from bullets import MAX_BULLET_LENGTH, parse_bullets
+
+
+@pytest.mark.parametrize('response, normalized', [
+    ("• First\n• Second", False),
+    ("•First\n•Second", False),
+    ("● First\n▪ Second", False),
+    ("- First\n- Second", True),
+    ("* First\n* Second", True),
+    ("– First\n– Second", True),
+    ("1. First\n2. Second", True),
+    ("1) First\n2) Second", True),
+    ("  • First  \n\t- Second", True),
+])
+def test_every_bullet_style_is_normalized(response, normalized):
+    assert parse_bullets(response) == (["• First", "• Second"], normalized)
+
+
+def test_lines_that_are_not_bullets_are_dropped():
+    response = "Here is my analysis:\n\n• First\n-not a bullet\n100. Too many digits\n**Bold** text\n• Second\n"
+    assert parse_bullets(response) == (["• First", "• Second"], False)
+    assert parse_bullets("") == ([], False)
+
+
+def test_long_bullets_are_clipped_to_100_characters():
+    exact = 'x' * (MAX_BULLET_LENGTH - 2)
+    bullets, _ = parse_bullets(f"• {exact}\n- {'y' * 150}")
+    assert bullets[0] == f"• {exact}"
+    assert len(bullets[1]) == MAX_BULLET_LENGTH
+    assert bullets[1] == "• " + 'y' * (MAX_BULLET_LENGTH - 5) + '...'
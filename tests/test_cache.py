@@ -0,0 +1,91 @@
+import time
+
+import pytest
+
+from cache import MemoryCache, SQLiteCache, make_key
+
+CONFIG = {'temperature': 0.7, 'max_output_tokens': 256}
+PROMPT = "Analyze this startup idea:\nA marketplace for local repair shops"
+
+
+def test_keys_ignore_whitespace_and_config_order():
+    key = make_key('gemini-2.0-flash', CONFIG, PROMPT, "You are the Market Research Agent.")
+    assert key == make_key('gemini-2.0-flash', {'max_output_tokens': 256, 'temperature': 0.7},
+                           f"  {PROMPT.replace(' ', '   ')}\n", "You are the  Market Research Agent. ")
+    assert len(key) == 64
+
+
+@pytest.mark.parametrize('other', [
+    ('gemini-2.0-flash-lite', CONFIG, PROMPT, "You are the Market Research Agent."),
+    ('gemini-2.0-flash', dict(CONFIG, max_output_tokens=512), PROMPT, "You are the Market Research Agent."),
+    ('gemini-2.0-flash', CONFIG, PROMPT + " for bikes", "You are the Market Research Agent."),
+    ('gemini-2.0-flash', CONFIG, PROMPT, "You are the Investor Pitch Agent."),
+    ('gemini-2.0-flash', CONFIG, PROMPT, None),
+])
+def test_keys_separate_model_config_prompt_and_system_instruction(other):
+    assert make_key(*other) != make_key('gemini-2.0-flash', CONFIG, PROMPT, "You are the Market Research Agent.")
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = MemoryCache(max_entries=2)
+    cache.set('a', "first")
+    cache.set('b', "second")
+    assert cache.get('a') == "first"
+    cache.set('c', "third")
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == ("first", None, "third")
+    assert len(cache) == 2
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+
+
+def test_memory_cache_keeps_to_its_byte_limit():
+    cache = MemoryCache(max_bytes=10)
+    cache.set('a', "12345")
+    cache.set('b', "12345")
+    cache.set('b', "1234")
+    assert len(cache) == 2
+    cache.set('c', "é")
+    assert cache.get('a') is None
+    assert (cache.get('b'), cache.get('c')) == ("1234", "é")
+
+
+def test_memory_cache_entries_expire():
+    cache = MemoryCache(ttl=0.05)
+    cache.set('a', "first")
+    assert cache.get('a') == "first"
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+    forever = MemoryCache(ttl=None)
+    forever.set('a', "first")
+    assert forever.get('a') == "first"
+
+
+def test_sqlite_cache_persists_across_instances(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    cache = SQLiteCache(path)
+    cache.set('a', "first")
+    cache.set('a', "replaced")
+    cache.close()
+    reopened = SQLiteCache(path)
+    try:
+        assert reopened.get('a') == "replaced"
+        assert reopened.get('b') is None
+    finally:
+        reopened.close()
+
+
+def test_sqlite_cache_expires_and_evicts_least_recently_used(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.db'), ttl=0.2, max_entries=2)
+    try:
+        cache.set('a', "first")
+        time.sleep(0.01)
+        cache.set('b', "second")
+        time.sleep(0.01)
+        assert cache.get('a') == "first"
+        cache.set('c', "third")
+        assert (cache.get('a'), cache.get('b'), cache.get('c')) == ("first", None, "third")
+        time.sleep(0.25)
+        assert cache.get('a') is None
+        assert cache._conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] == 1
+    finally:
+        cache.close()
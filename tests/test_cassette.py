@@ -0,0 +1,118 @@
+import gzip
+import itertools
+import time
+
+import pytest
+
+from cassette import Cassette, CassetteMiss
+from example_task_flow import create_startup_analysis_flow
+from fake_model import FakeModel, FakeResponse
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+CONFIG = {'temperature': 0.7, 'max_output_tokens': 256}
+
+
+class Numbered:
+    """Model answering "answer 1", "answer 2", ... in call order."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = itertools.count(1)
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        time.sleep(self.latency)
+        return FakeResponse(f"answer {next(self.calls)}")
+
+
+def record(path, model, prompts, config=CONFIG):
+    cassette = Cassette(str(path), mode='record', inner=lambda name: model)
+    client = cassette.model('gemini-2.0-flash')
+    answers = [client.generate_content(prompt, generation_config=config).text for prompt in prompts]
+    cassette.close()
+    return answers
+
+
+def test_analysis_round_trip(tmp_path):
+    path = str(tmp_path / 'calls.jsonl.gz')
+    fake = FakeModel(latency=0.01)
+    recorder = Cassette(path, mode='record', inner=lambda name: fake).install()
+    recorded = create_startup_analysis_flow(IDEA, verbose=0)
+    recorder.close()
+    calls = fake.calls
+
+    player = Cassette(path, mode='replay', timing='zero').install()
+    replayed = create_startup_analysis_flow(IDEA, verbose=0)
+
+    assert list(replayed) == list(recorded)
+    assert fake.calls == calls
+    report = player.report()
+    assert report['hits'] == recorder.report()['recorded'] == calls
+    assert report['misses'] == 0
+
+
+def test_repeated_prompts_replay_in_recorded_order(tmp_path):
+    path = tmp_path / 'calls.jsonl.gz'
+    assert record(path, Numbered(), ['same prompt'] * 2) == ['answer 1', 'answer 2']
+
+    client = Cassette(str(path), timing='zero').model('gemini-2.0-flash')
+    answers = [client.generate_content('same prompt', generation_config=CONFIG).text for _ in range(3)]
+    assert answers == ['answer 1', 'answer 2', 'answer 1']
+
+
+def test_replay_miss_raises_and_is_reported(tmp_path):
+    path = tmp_path / 'calls.jsonl.gz'
+    record(path, Numbered(), ['known prompt'])
+    cassette = Cassette(str(path), timing='zero')
+    with pytest.raises(CassetteMiss):
+        cassette.model('gemini-2.0-flash').generate_content('unknown   prompt', generation_config=CONFIG)
+    report = cassette.report()
+    assert report['misses'] == 1
+    assert report['missed'][0]['prompt'] == 'unknown prompt'
+
+
+def test_other_config_is_a_loose_hit_unless_strict(tmp_path):
+    path = tmp_path / 'calls.jsonl.gz'
+    record(path, Numbered(), ['a prompt'])
+    other = dict(CONFIG, max_output_tokens=128)
+
+    loose = Cassette(str(path), timing='zero')
+    assert loose.model('gemini-2.0-flash').generate_content('a prompt', generation_config=other).text == 'answer 1'
+    assert loose.report()['loose_hits'] == 1
+
+    strict = Cassette(str(path), timing='zero', strict=True)
+    with pytest.raises(CassetteMiss):
+        strict.model('gemini-2.0-flash').generate_content('a prompt', generation_config=other)
+
+
+def test_auto_mode_records_misses(tmp_path):
+    path = tmp_path / 'calls.jsonl.gz'
+    record(path, Numbered(), ['old prompt'])
+    model = Numbered()
+    cassette = Cassette(str(path), mode='auto', timing='zero', inner=lambda name: model)
+    client = cassette.model('gemini-2.0-flash')
+    assert client.generate_content('old prompt', generation_config=CONFIG).text == 'answer 1'
+    assert client.generate_content('new prompt', generation_config=CONFIG).text == 'answer 1'
+    cassette.close()
+    assert (cassette.report()['hits'], cassette.report()['recorded']) == (1, 1)
+    assert len(Cassette(str(path))) == 2
+
+
+def test_original_timing_replays_latency(tmp_path):
+    path = tmp_path / 'calls.jsonl.gz'
+    record(path, Numbered(latency=0.1), ['slow prompt'])
+    for timing, at_least, below in (('original', 0.09, 1.0), ('zero', 0.0, 0.05)):
+        client = Cassette(str(path), timing=timing).model('gemini-2.0-flash')
+        started = time.perf_counter()
+        client.generate_content('slow prompt', generation_config=CONFIG)
+        assert at_least <= time.perf_counter() - started < below
+
+
+def test_truncated_cassette_keeps_complete_records(tmp_path):
+    path = tmp_path / 'calls.jsonl.gz'
+    record(path, Numbered(), [f"prompt {n}" for n in range(50)])
+    data = path.read_bytes()
+    cut = tmp_path / 'cut.jsonl.gz'
+    cut.write_bytes(data[:len(data) // 2])
+    with pytest.raises(EOFError):
+        gzip.decompress(cut.read_bytes())
+    assert 0 < len(Cassette(str(cut))) < 50
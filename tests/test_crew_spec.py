@@ -0,0 +1,128 @@
+import json
+import os
+
+import pytest
+
+import crew_spec
+from crew_spec import SpecError, parse
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+
+
+def spec_data(**changes):
+    """A small valid spec: research feeding a pitch, with an optional review of both."""
+    data = {
+        'name': 'small',
+        'agents': {
+            'research': {'role': "Market Research Agent", 'goal': "Research the market", 'backstory': "An analyst."},
+            'pitch': {'role': "Investor Pitch Agent", 'goal': "Write the pitch", 'backstory': "A founder."},
+        },
+        'tasks': [
+            {'id': 'market', 'description': "Research the market", 'agent': 'research'},
+            {'id': 'pitch', 'description': "Write the pitch", 'agent': 'pitch', 'depends_on': ['market']},
+            {'id': 'review', 'description': "Review the pitch", 'agent': 'research',
+             'depends_on': ['market', 'pitch'], 'context': ['pitch'], 'optional': True},
+        ],
+        'layout': {'columns': [[{'title': "Pitch", 'sections': [{'task': 'pitch', 'label': "The pitch"}]}]]},
+    }
+    data.update(changes)
+    return data
+
+
+def with_task(n, **fields):
+    data = spec_data()
+    data['tasks'][n].update(fields)
+    return data
+
+
+def write(path, data, mtime_ns):
+    path.write_text(json.dumps(data), encoding='utf-8')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_parse_compiles_the_graph_and_layout():
+    spec = parse(spec_data())
+    assert spec.name == 'small'
+    assert spec.descriptions == ["Research the market", "Write the pitch", "Review the pitch"]
+    assert spec.graph['order'] == [0, 1, 2]
+    assert spec.max_workers == 1
+    assert spec.layout['columns'] == [[("Pitch", [("Write the pitch", "The pitch")])]]
+    # Tasks the layout leaves out get a card of their own
+    assert spec.layout['full_width'] == [(crew_spec.UNPLACED_TITLE, [("Research the market",) * 2,
+                                                                     ("Review the pitch",) * 2])]
+
+
+@pytest.mark.parametrize('data, message', [
+    (with_task(1, depends_on=['marker']), "Task 'pitch' depends_on names unknown task(s) marker"),
+    (with_task(0, depends_on=['review']), "Task dependencies contain a cycle"),
+    (with_task(1, agent='designer'), "Task 'pitch' uses unknown agent 'designer'"),
+    (with_task(1, id='market'), "Task 'market' is defined twice"),
+    (with_task(2, context_budget=0), "Task 'review' context_budget must be a positive number of tokens"),
+    (with_task(2, priority=1), "Task 3 has unknown field(s) priority"),
+    (spec_data(agents={}), "'agents' must be an object with at least one agent"),
+    (spec_data(max_workers=0), "'max_workers' must be a positive integer"),
+    (spec_data(layout={'full_width': [{'title': "X", 'sections': [{'task': 'growth'}]}]}),
+     "Card 'X' shows unknown task 'growth'"),
+])
+def test_invalid_specs_are_rejected(data, message):
+    with pytest.raises(SpecError) as error:
+        parse(data)
+    assert message in str(error.value)
+
+
+def test_load_reports_unreadable_files(tmp_path):
+    with pytest.raises(SpecError, match="cannot read crew spec"):
+        crew_spec.load(str(tmp_path / 'missing.json'))
+    broken = tmp_path / 'broken.json'
+    broken.write_text("{", encoding='utf-8')
+    with pytest.raises(SpecError, match="not valid JSON"):
+        crew_spec.load(str(broken))
+
+
+def test_current_reloads_when_the_file_changes(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'crew.json'
+    write(path, spec_data(), 1_000_000_000)
+    monkeypatch.setattr(crew_spec, 'CREW_PATH', str(path))
+    monkeypatch.setattr(crew_spec, '_current', None)
+    monkeypatch.setattr(crew_spec, '_failed', None)
+
+    first = crew_spec.current()
+    assert first.name == 'small'
+    assert crew_spec.current() is first
+
+    write(path, spec_data(name='edited'), 2_000_000_000)
+    edited = crew_spec.current()
+    assert edited.name == 'edited'
+    assert "Reloaded crew spec 'edited'" in capsys.readouterr().out
+
+    # An edit that fails validation is reported once and the loaded spec stays
+    write(path, with_task(1, agent='designer'), 3_000_000_000)
+    assert crew_spec.current() is edited
+    assert crew_spec.current() is edited
+    assert capsys.readouterr().out.count("Keeping crew spec 'edited'") == 1
+
+    write(path, spec_data(name='fixed'), 4_000_000_000)
+    assert crew_spec.current().name == 'fixed'
+
+
+def test_current_raises_without_a_spec_to_keep(tmp_path, monkeypatch):
+    monkeypatch.setattr(crew_spec, 'CREW_PATH', str(tmp_path / 'missing.json'))
+    monkeypatch.setattr(crew_spec, '_current', None)
+    with pytest.raises(SpecError):
+        crew_spec.current()
+
+
+def test_build_crew_shares_agents_and_graph_but_not_tasks(fake):
+    spec = parse(spec_data())
+    first, second = spec.build_crew(verbose=0), spec.build_crew(verbose=0, speculate=True)
+    assert first.tasks[0] is not second.tasks[0]
+    assert first.tasks[0].agent is second.tasks[0].agent is spec.agents['research']
+    assert first.graph is second.graph is spec.graph
+    assert [task.depends_on for task in first.tasks[1:]] == [[first.tasks[0]], first.tasks[:2]]
+    assert first.tasks[2].context == [first.tasks[1]] and first.tasks[2].optional
+    assert first.speculation is None and second.speculation is not None
+
+    results = first.kickoff(IDEA)
+    assert [result.split('\n')[0] for result in results] == [f"Task {n}: {description}"
+                                                            for n, description in enumerate(spec.descriptions, 1)]
+    assert fake.calls == 3
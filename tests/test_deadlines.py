@@ -0,0 +1,149 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import deadlines
+import routing
+from agents import Agent, PENDING_RESULT, SKIPPED_RESULT
+from clients import registry
+from deadlines import Deadline, DeadlineExceeded
+from example_task_flow import create_startup_analysis_flow_async
+from fake_model import FakeModel
+from jobs import AnalysisJob, JobQueue, submit
+from tasks import Crew, Task, TaskEvent
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+
+
+class SlowPitch:
+    """Backend where only the Investor Pitch Agent is slow."""
+
+    def __init__(self, seconds):
+        self.fast = FakeModel(latency=0.01)
+        self.slow = FakeModel(latency=seconds)
+
+    def with_system_instruction(self, system_instruction):
+        model = self.slow if "Investor Pitch Agent" in system_instruction else self.fast
+        return model.with_system_instruction(system_instruction)
+
+
+def agent(role, latency):
+    return Agent(role, f"analyze the idea as {role}", "An analyst.", verbose=False, model=FakeModel(latency=latency))
+
+
+def test_stage_splits_the_budget_over_the_remaining_chain():
+    deadline = Deadline(10, task_seconds=2, brief_ratio=0.5)
+    end = deadline.begin()
+    stage, at = deadline.stage(chain=3)
+    assert stage == 'normal'
+    # Leaves the three tasks after it enough time to run brief
+    assert at == pytest.approx(end - 3 * 2 * 0.5)
+    assert deadline.stage(chain=5)[0] == 'brief'
+    assert deadline.stage(chain=10, optional=True) == ('skipped', None)
+    assert deadline.stage(chain=10)[0] == 'brief'
+    # Measured task durations replace task_seconds
+    assert deadline.stage(chain=10, estimate=0.5)[0] == 'normal'
+
+
+def test_stage_keeps_a_minimum_per_task_and_ends_pending():
+    deadline = Deadline(0.05, task_seconds=1, min_task_seconds=1.0)
+    stage, at = deadline.stage(chain=0)
+    assert stage == 'brief'
+    assert at == deadline.end
+    time.sleep(0.06)
+    assert deadline.expired()
+    assert deadline.stage(chain=0) == ('pending', None)
+
+
+def test_scopes_only_tighten_and_check_raises_once_passed():
+    assert deadlines.remaining() is None
+    assert deadlines.request_options() == {}
+    with deadlines.scope(time.monotonic() + 10):
+        with deadlines.scope(time.monotonic() + 20):
+            assert deadlines.remaining() < 10
+        assert deadlines.request_options()['request_options']['timeout'] > 9
+        with deadlines.scope(time.monotonic() - 1):
+            with pytest.raises(DeadlineExceeded):
+                deadlines.check()
+            assert deadlines.request_options()['request_options']['timeout'] == deadlines.MIN_REQUEST_TIMEOUT
+
+
+def test_kickoff_returns_at_the_deadline_with_brief_skipped_and_pending_tasks():
+    market = Task("Market", agent("Market Agent", 0.4), depends_on=[])
+    trends = Task("Trends", agent("Trends Agent", 0.01), depends_on=[market], optional=True)
+    pitch = Task("Pitch", agent("Pitch Agent", 2.0), depends_on=[market, trends])
+    crew = Crew([], [market, trends, pitch], verbose=0)
+
+    started = time.perf_counter()
+    results = crew.kickoff(IDEA, deadline=Deadline(0.8, task_seconds=0.1))
+    # The pitch call still in flight is left behind rather than waited for
+    assert time.perf_counter() - started < 1.2
+    assert results.summary['task_status'] == {'Market': 'done', 'Trends': 'skipped', 'Pitch': 'pending'}
+    assert (trends.result, pitch.result) == (SKIPPED_RESULT, PENDING_RESULT)
+    assert results.summary['deadline'] == {'seconds': 0.8, 'met': False, 'brief': 0, 'skipped': 1, 'pending': 1}
+
+
+def test_tasks_short_of_time_run_brief():
+    market = Task("Market", agent("Market Agent", 0.01), depends_on=[])
+    pitch = Task("Pitch", agent("Pitch Agent", 0.01), depends_on=[market])
+    briefs = []
+    run = market.agent.run
+    market.agent.run = lambda context, **kwargs: briefs.append(kwargs['brief']) or run(context, **kwargs)
+
+    with deadlines.use(Deadline(5, task_seconds=3)):
+        results = Crew([], [market, pitch], verbose=0).kickoff(IDEA)
+    assert briefs == [True]
+    assert results.summary['task_status'] == {'Market': 'brief', 'Pitch': 'done'}
+    assert results.summary['deadline']['met']
+
+
+def test_async_flow_cancels_running_tasks_at_the_deadline():
+    registry.set_backend(lambda name: SlowPitch(5.0))
+    started = time.perf_counter()
+    results = asyncio.run(create_startup_analysis_flow_async(IDEA, verbose=0, deadline=0.5))
+    assert time.perf_counter() - started < 1.5
+    # Everything but the pitch finishes in time, brief or skipped under the tight budget
+    assert sorted(set(results.summary['task_status'].values())) == ['brief', 'pending', 'skipped']
+    assert results.summary['deadline']['pending'] == 1
+
+
+def test_pending_sections_are_completed_by_a_follow_up_job():
+    registry.set_backend(lambda name: SlowPitch(1.0))
+    queue = JobQueue(workers=2)
+    try:
+        job = queue.submit(IDEA, deadline=0.5)
+        assert job.wait(10)
+        status = job.results.summary['task_status']
+        unfinished = {task for task, value in status.items() if value in ('pending', 'skipped')}
+        assert unfinished and 'pending' in status.values()
+
+        followup = job.followup
+        assert followup is not None and followup.wait(10)
+        assert followup.status == 'done'
+        status = followup.results.summary['task_status']
+        assert {task for task, value in status.items() if value != 'reused'} == unfinished
+        assert set(status.values()) == {'reused', 'done'}
+        assert followup.followup is None
+    finally:
+        queue.shutdown()
+
+
+def test_job_profile_and_deadline_hold_for_the_drain_and_stay_on_the_job():
+    seen = []
+
+    def stream():
+        for index in range(3):
+            seen.append((routing.current_profile(), deadlines.current()))
+            yield TaskEvent('completed', index, f"Task {index}", "done")
+        return ["done"]
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        job = submit(executor, AnalysisJob(IDEA, stream, deadline=5, profile='thorough'))
+        assert job.wait(5) and job.status == 'done'
+        # The next job on the same worker thread starts from the defaults
+        after = executor.submit(lambda: (routing.current_profile(), deadlines.current())).result()
+    assert [profile for profile, _ in seen] == ['thorough'] * 3
+    assert all(0 < deadline.remaining() <= 5 for _, deadline in seen)
+    assert after == (routing.DEFAULT_PROFILE, None)
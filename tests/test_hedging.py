@@ -0,0 +1,126 @@
+import asyncio
+import itertools
+import threading
+import time
+
+import pytest
+
+from hedging import Hedger
+
+
+def warmed(budget=1.0, samples=5):
+    """A hedger that has seen `samples` instant calls, so it hedges after min_delay."""
+    hedger = Hedger(budget=budget, min_samples=samples, min_delay=0.02)
+    for _ in range(samples):
+        hedger.call(lambda: None)
+    return hedger
+
+
+def slow_then_fast(seconds=0.5):
+    """fn whose first call takes `seconds` and later ones return at once; each returns its number."""
+    counter = itertools.count(1)
+
+    def fn():
+        n = next(counter)
+        if n == 1:
+            time.sleep(seconds)
+        return n
+    return fn
+
+
+def test_no_hedging_before_enough_samples():
+    hedger = Hedger(min_samples=5)
+    assert hedger.threshold() is None
+    assert hedger.call(slow_then_fast(0.05)) == 1
+    assert hedger.hedges == 0
+
+
+def test_fast_calls_are_not_hedged():
+    hedger = warmed()
+    assert hedger.call(lambda: 'ok') == 'ok'
+    assert hedger.hedges == 0
+
+
+def test_slow_call_is_hedged_and_the_duplicate_wins():
+    hedger = warmed()
+    started = time.perf_counter()
+    assert hedger.call(slow_then_fast()) == 2
+    assert time.perf_counter() - started < 0.3
+    assert (hedger.hedges, hedger.hedge_wins) == (1, 1)
+
+
+def test_budget_caps_duplicates():
+    hedger = warmed(budget=0.0)
+    assert hedger.call(slow_then_fast(0.1)) == 1
+    assert hedger.hedges == 0
+
+
+def test_both_failing_reports_the_original_error():
+    hedger = warmed()
+    counter = itertools.count(1)
+
+    def fn():
+        n = next(counter)
+        time.sleep(0.05 if n == 1 else 0)
+        raise RuntimeError(f"request {n}")
+
+    with pytest.raises(RuntimeError, match="request 1"):
+        hedger.call(fn)
+    assert hedger.hedges == 1
+
+
+def test_async_hedge_cancels_the_losing_request():
+    hedger = warmed()
+    cancelled = []
+    counter = itertools.count(1)
+
+    async def fn():
+        if next(counter) == 1:
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return 'primary'
+        return 'hedge'
+
+    async def main():
+        result = await hedger.call_async(fn)
+        # Let the cancellation reach the losing request
+        await asyncio.sleep(0)
+        return result
+
+    started = time.perf_counter()
+    assert asyncio.run(main()) == 'hedge'
+    assert time.perf_counter() - started < 1
+    assert cancelled == [True]
+    assert hedger.hedge_wins == 1
+
+
+def test_calls_reuse_pool_threads_and_only_duplicates_get_their_own():
+    hedger = warmed()
+    threads = set()
+
+    def fn():
+        threads.add(threading.current_thread().name)
+        return 'ok'
+    started = threading.active_count()
+    for _ in range(20):
+        assert hedger.call(fn) == 'ok'
+    assert hedger.hedges == 0
+    assert len(threads) <= 2 and all(name.startswith('hedged-call') for name in threads)
+    assert threading.active_count() - started <= 2
+
+
+def test_calls_beyond_the_pool_run_inline_unhedged():
+    hedger = Hedger(budget=1.0, min_samples=1, min_delay=0.02, max_workers=1)
+    hedger.call(lambda: None)
+    busy = threading.Thread(target=hedger.call, args=(lambda: time.sleep(0.2),))
+    busy.start()
+    time.sleep(0.05)
+    caller = threading.current_thread().name
+    assert hedger.call(lambda: threading.current_thread().name) == caller
+    assert hedger.call(slow_then_fast(0.1)) == 1
+    busy.join()
+    # The busy call itself was hedged after min_delay; the inline ones were not
+    assert hedger.hedges == 1
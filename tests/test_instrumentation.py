@@ -0,0 +1,26 @@
+from instrumentation import PrometheusSink
+
+
+def test_prometheus_text_format():
+    sink = PrometheusSink()
+    sink.handle({'type': 'cache', 'hit': True})
+    sink.handle({'type': 'cache', 'hit': True})
+    sink.handle({'type': 'task', 'task': "Research the market", 'duration': 1.5})
+    assert sink.render().splitlines() == [
+        "# HELP thinktank_cache_lookups_total Response cache lookups",
+        "# TYPE thinktank_cache_lookups_total counter",
+        'thinktank_cache_lookups_total{result="hit"} 2',
+        "# HELP thinktank_task_seconds Task wall time",
+        "# TYPE thinktank_task_seconds summary",
+        'thinktank_task_seconds_count{task="Research the market"} 1',
+        'thinktank_task_seconds_sum{task="Research the market"} 1.5',
+    ]
+
+
+def test_label_values_are_escaped():
+    sink = PrometheusSink()
+    task = 'Compare "Uber for X" pitches\nC:\\ideas'
+    sink.handle({'type': 'task', 'task': task, 'duration': 2.0})
+    lines = sink.render().splitlines()
+    assert 'thinktank_task_seconds_sum{task="Compare \\"Uber for X\\" pitches\\nC:\\\\ideas"} 2' in lines
+    assert len(lines) == 4 and all(line.startswith(('#', 'thinktank_')) for line in lines)
@@ -0,0 +1,96 @@
+import pytest
+
+import crew_spec
+import ratelimit
+from clients import registry
+from fake_model import FakeModel, FakeRateLimitError
+from ratelimit import RateLimiter, RetryPolicy, TokenBucket
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ratelimit, 'retry_policy', RetryPolicy(max_retries=2, base_delay=0.001))
+
+
+def test_bucket_serves_a_burst_then_paces_at_the_rate():
+    bucket = TokenBucket(rate=2.0, capacity=2)
+    now = bucket._updated
+    assert bucket.reserve(1, now) == 0.0
+    assert bucket.reserve(1, now) == 0.0
+    assert bucket.reserve(1, now) == pytest.approx(0.5)
+    # A second later the debt is repaid and one more unit has accrued
+    assert bucket.reserve(1, now + 1.0) == pytest.approx(0.0)
+
+
+def test_bucket_never_asks_for_more_than_it_holds():
+    bucket = TokenBucket(rate=1.0, capacity=2)
+    assert bucket.reserve(10, bucket._updated) == 0.0
+
+
+def test_throttle_halves_the_rate_down_to_the_floor():
+    limiter = RateLimiter(600, min_fraction=0.1)
+    limiter.on_throttle()
+    assert limiter.current_rpm == pytest.approx(300)
+    for _ in range(10):
+        limiter.on_throttle()
+    assert limiter.current_rpm == pytest.approx(60)
+    assert limiter.throttled == 11
+
+
+def test_success_recovers_additively_up_to_the_quota():
+    limiter = RateLimiter(600, increase_per_success=0.1)
+    limiter.on_throttle()
+    limiter.on_success()
+    assert limiter.current_rpm == pytest.approx(360)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.current_rpm == pytest.approx(600)
+
+
+def test_fixed_rate_limiter_does_not_adapt():
+    limiter = RateLimiter(600, adaptive=False)
+    limiter.on_throttle()
+    assert limiter.current_rpm == pytest.approx(600)
+    assert limiter.throttled == 1
+
+
+def test_call_retries_throttles_and_backs_off(no_backoff):
+    limiter = ratelimit.configure(600)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise FakeRateLimitError("429")
+        return 'ok'
+
+    stats = {}
+    assert ratelimit.call(flaky, stats=stats) == 'ok'
+    assert stats['attempts'] == 2
+    assert stats['retried_errors'] == ['FakeRateLimitError']
+    assert limiter.throttled == 1
+    assert limiter.current_rpm < 600
+
+
+def test_call_does_not_retry_other_errors(no_backoff):
+    with pytest.raises(ValueError):
+        ratelimit.call(lambda: (_ for _ in ()).throw(ValueError("bad request")))
+
+
+def test_fallback_after_a_throttle_still_backs_off_and_takes_a_token(no_backoff):
+    primary = FakeModel(throttle_rate=1.0)
+    fallback = FakeModel()
+    registry.set_backend(lambda name: primary if name == 'gemini-2.0-flash' else fallback)
+    limiter = ratelimit.configure(600)
+    reservations = []
+    reserve = limiter._reserve
+    limiter._reserve = lambda tokens=0: reservations.append(tokens) or reserve(tokens)
+
+    agent = crew_spec.current().agents['market_research']
+    result = agent.run("A marketplace for local repair shops")
+
+    assert not result.startswith("Error in ")
+    assert (primary.calls, fallback.calls) == (1, 1)
+    assert limiter.throttled == 1
+    assert limiter.current_rpm < 600
+    assert len(reservations) == 2
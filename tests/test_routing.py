@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+
+import routing
+from fake_model import FakeRateLimitError
+from routing import Route, Router
+
+ROUTE = Route('gemini-1.5-pro', 512, fallback='gemini-2.0-flash', slow_after=0.05)
+
+
+def sender(failing=(), seconds=0.0):
+    """send(model) recording the models it was called with; models in failing are throttled."""
+    sent = []
+
+    def send(model):
+        sent.append(model)
+        if model in failing:
+            raise FakeRateLimitError("429")
+        time.sleep(seconds)
+        return f"answer from {model}"
+    return send, sent
+
+
+def test_healthy_model_answers_directly():
+    send, sent = sender()
+    stats = {}
+    assert Router().call(ROUTE, send, stats) == "answer from gemini-1.5-pro"
+    assert sent == ['gemini-1.5-pro']
+    assert stats['model'] == 'gemini-1.5-pro'
+
+
+def test_throttled_model_falls_back_and_cools_down():
+    router = Router(cooldown=0.2)
+    send, sent = sender(failing={'gemini-1.5-pro'})
+    stats = {}
+    assert router.call(ROUTE, send, stats) == "answer from gemini-2.0-flash"
+    assert stats['model'] == 'gemini-2.0-flash'
+    assert not router.healthy('gemini-1.5-pro')
+
+    # While it cools down the fallback is called straight away
+    assert router.call(ROUTE, send) == "answer from gemini-2.0-flash"
+    assert sent == ['gemini-1.5-pro', 'gemini-2.0-flash', 'gemini-2.0-flash']
+    assert router.pick(ROUTE) == 'gemini-2.0-flash'
+
+    time.sleep(0.25)
+    assert router.pick(ROUTE) == 'gemini-1.5-pro'
+
+
+def test_slow_answer_puts_the_model_in_cooldown():
+    router = Router()
+    send, _ = sender(seconds=0.1)
+    assert router.call(ROUTE, send) == "answer from gemini-1.5-pro"
+    assert router.pick(ROUTE) == 'gemini-2.0-flash'
+    router.reset()
+    assert router.pick(ROUTE) == 'gemini-1.5-pro'
+
+
+def test_only_throttles_fall_back():
+    def send(model):
+        raise ValueError("bad request")
+    with pytest.raises(ValueError):
+        Router().call(ROUTE, send)
+
+    send, sent = sender(failing={'gemini-1.5-pro'})
+    with pytest.raises(FakeRateLimitError):
+        Router().call(ROUTE, send, retryable=lambda e: False)
+    assert sent == ['gemini-1.5-pro']
+
+
+def test_a_throttled_fallback_is_not_retried_on_itself():
+    send, sent = sender(failing={'gemini-1.5-pro', 'gemini-2.0-flash'})
+    with pytest.raises(FakeRateLimitError):
+        Router().call(ROUTE, send)
+    assert sent == ['gemini-1.5-pro', 'gemini-2.0-flash']
+    send, sent = sender(failing={'gemini-2.0-flash-lite'})
+    with pytest.raises(FakeRateLimitError):
+        Router().call(Route('gemini-2.0-flash-lite'), send)
+    assert sent == ['gemini-2.0-flash-lite']
+
+
+def test_async_call_falls_back():
+    sent = []
+
+    async def send(model):
+        sent.append(model)
+        if model == 'gemini-1.5-pro':
+            raise FakeRateLimitError("429")
+        return f"answer from {model}"
+
+    stats = {}
+    assert asyncio.run(Router().call_async(ROUTE, send, stats)) == "answer from gemini-2.0-flash"
+    assert sent == ['gemini-1.5-pro', 'gemini-2.0-flash']
+    assert stats['model'] == 'gemini-2.0-flash'
+
+
+def test_profiles_route_agents():
+    assert routing.current_profile() == routing.DEFAULT_PROFILE
+    with routing.use_profile('thorough'):
+        assert routing.route_for('Investor Pitch Agent', 'x').model == 'gemini-1.5-pro'
+        assert routing.route_for('Market Research Agent', 'x').model == 'gemini-2.0-flash'
+        with routing.use_profile(None):
+            assert routing.current_profile() == 'thorough'
+    with routing.use_profile('fast'):
+        assert routing.route_for('Investor Pitch Agent', 'x').max_output_tokens == 320
+    with pytest.raises(ValueError, match="Unknown profile"):
+        with routing.use_profile('cheapest'):
+            pass
+
+
+def test_cost_prices_tokens_per_model():
+    models = {
+        'gemini-2.0-flash': {'calls': 2, 'prompt_tokens': 1_000_000, 'response_tokens': 500_000},
+        'gemini-1.5-pro': {'calls': 1, 'prompt_tokens': 2000, 'response_tokens': 1000},
+        'unknown-model': {'calls': 1, 'prompt_tokens': 10_000, 'response_tokens': 10_000},
+    }
+    assert routing.cost(models) == pytest.approx(0.10 + 0.20 + 0.0025 + 0.005)
+    assert routing.cost({}) == 0.0
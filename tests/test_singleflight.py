@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import deadlines
+from singleflight import SingleFlight
+
+
+def slow(result, seconds=0.1, calls=None):
+    def fn():
+        if calls is not None:
+            calls.append(result)
+        time.sleep(seconds)
+        return result
+    return fn
+
+
+def in_thread(target):
+    outcome = {}
+    thread = threading.Thread(target=lambda: outcome.update(value=target()))
+    thread.start()
+    return thread, outcome
+
+
+def test_a_lone_caller_leads():
+    flights = SingleFlight()
+    assert flights.do('key', lambda: 'answer') == ('answer', False)
+    assert flights.stats() == {'leaders': 1, 'shared': 0, 'in_flight': 0, 'dedup_rate': 0.0}
+
+
+def test_a_follower_shares_the_leaders_result():
+    flights = SingleFlight()
+    calls = []
+    leader, led = in_thread(lambda: flights.do('key', slow('answer', calls=calls)))
+    time.sleep(0.02)
+    assert flights.do('key', slow('other', calls=calls)) == ('answer', True)
+    leader.join()
+    assert led['value'] == ('answer', False)
+    assert calls == ['answer']
+    assert flights.stats() == {'leaders': 1, 'shared': 1, 'in_flight': 0, 'dedup_rate': 0.5}
+
+
+def test_a_follower_gets_the_leaders_error_without_it_counting_as_shared():
+    flights = SingleFlight()
+
+    def failing():
+        time.sleep(0.05)
+        raise ValueError("bad request")
+    leader, _ = in_thread(lambda: pytest.raises(ValueError, flights.do, 'key', failing))
+    time.sleep(0.01)
+    with pytest.raises(ValueError):
+        flights.do('key', slow('other'))
+    leader.join()
+    assert flights.stats()['shared'] == 0
+
+
+def test_a_follower_past_its_deadline_calls_the_model_itself():
+    flights = SingleFlight()
+    calls = []
+    leader, _ = in_thread(lambda: flights.do('key', slow('answer', 0.3, calls)))
+    time.sleep(0.02)
+    started = time.perf_counter()
+    with deadlines.scope(time.monotonic() + 0.05):
+        assert flights.do('key', slow('own', 0.0, calls)) == ('own', False)
+    assert time.perf_counter() - started < 0.2
+    leader.join()
+    assert calls == ['answer', 'own']
+    assert flights.stats() == {'leaders': 2, 'shared': 0, 'in_flight': 0, 'dedup_rate': 0.0}
+
+
+def test_async_follower_shares_and_times_out():
+    flights = SingleFlight()
+
+    async def answer(text, seconds):
+        await asyncio.sleep(seconds)
+        return text
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do_async('key', lambda: answer('answer', 0.1)))
+        await asyncio.sleep(0.01)
+        shared = await flights.do_async('key', lambda: answer('other', 0))
+        late = asyncio.ensure_future(flights.do_async('slow', lambda: answer('slow', 0.3)))
+        await asyncio.sleep(0.01)
+        with deadlines.scope(time.monotonic() + 0.05):
+            own = await flights.do_async('slow', lambda: answer('own', 0))
+        return await leader, shared, own, await late
+
+    assert asyncio.run(main()) == (('answer', False), ('answer', True), ('own', False), ('slow', False))
+    assert flights.stats() == {'leaders': 3, 'shared': 1, 'in_flight': 0, 'dedup_rate': 0.25}
+
+
+def test_followers_take_over_from_a_cancelled_leader():
+    flights = SingleFlight()
+    calls = []
+
+    async def answer(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return text
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do_async('key', lambda: answer('leader')))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.ensure_future(flights.do_async('key', lambda n=n: answer(f"follower {n}")))
+                     for n in range(2)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    first, second = asyncio.run(main())
+    # One follower makes the call again and the other shares it
+    assert sorted([first, second], key=lambda outcome: outcome[1]) == [('follower 0', False), ('follower 0', True)]
+    assert calls == ['leader', 'follower 0']
+    assert flights.stats() == {'leaders': 2, 'shared': 1, 'in_flight': 0, 'dedup_rate': 0.3333}
@@ -0,0 +1,107 @@
+import pytest
+
+import crew_spec
+import routing
+from store import AnalysisStore, analyze_with_store, signature, similarity
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+SIMILAR = "A marketplace that matches local repair shops with people whose bikes broke down"
+OTHER = "Peer tutoring for university students, paid per session"
+
+
+def results_for(idea, text="• An insight about it"):
+    return [f"Task {i+1}: {description}\nResult: {text}"
+            for i, description in enumerate(crew_spec.current().descriptions)]
+
+
+@pytest.fixture
+def store():
+    store = AnalysisStore()
+    yield store
+    store.close()
+
+
+def test_minhash_estimates_similarity():
+    assert similarity(signature(IDEA), signature(IDEA)) == 1.0
+    assert similarity(signature(IDEA), signature(SIMILAR)) > 0.5
+    assert similarity(signature(IDEA), signature(OTHER)) < 0.2
+
+
+def test_save_get_and_similar(store):
+    first = store.save(IDEA, results_for(IDEA))
+    store.save(OTHER, results_for(OTHER))
+    record = store.get(first)
+    assert record['idea'] == IDEA and record['complete']
+    assert list(record['results']) == crew_spec.current().descriptions
+    assert record['config']['profile'] == routing.current_profile()
+    assert store.get(999) is None
+
+    assert store.similar(f"  {IDEA.upper()} ") == [(1.0, first)]
+    assert [analysis_id for _, analysis_id in store.similar(SIMILAR)] == [first]
+    assert store.lookup("Self-driving boats for fishing fleets") is None
+
+
+def test_serve_needs_a_complete_close_analysis_with_the_same_config(store):
+    store.save(IDEA, results_for(IDEA), profile='fast')
+    assert store.serve(IDEA) is None
+    assert store.serve(IDEA, profile='fast')['similarity'] == 1.0
+    assert store.serve(IDEA, mode='fused', profile='fast') is None
+    assert store.serve(SIMILAR, profile='fast') is None
+
+    store.save(OTHER, results_for(OTHER, "Error in Market Research Agent: bad request"))
+    assert store.serve(OTHER) is None
+
+
+def test_serve_skips_newer_matches_made_with_another_config(store):
+    served = store.save(IDEA, results_for(IDEA), profile='thorough')
+    store.save(IDEA, results_for(IDEA), profile='fast')
+    assert store.lookup(IDEA)['config']['profile'] == 'fast'
+    assert store.serve(IDEA, profile='thorough')['id'] == served
+
+
+def test_warm_start_needs_the_same_config(store):
+    store.save(IDEA, results_for(IDEA), mode='fused')
+    assert store.warm_start(SIMILAR) is None
+    warm = store.save(IDEA, results_for(IDEA, "Error in Market Research Agent: bad request"))
+    assert store.warm_start(SIMILAR)['id'] == warm
+    assert store.warm_start(SIMILAR, profile='thorough') is None
+
+
+def test_analyze_with_store_serves_warm_starts_and_records_it(store, fake):
+    first = analyze_with_store(IDEA, store)
+    assert 'store' not in first.summary
+    calls = fake.calls
+
+    served = analyze_with_store(IDEA, store)
+    assert served.summary['store']['served'] is True
+    assert fake.calls == calls
+
+    warm = analyze_with_store(SIMILAR, store)
+    assert warm.summary['store'] == {'id': 1, 'similarity': warm.summary['store']['similarity'], 'served': False}
+    assert store.get(2)['summary']['store']['served'] is False
+
+    # Another profile neither serves nor warm-starts from those analyses
+    calls = fake.calls
+    with routing.use_profile('thorough'):
+        fresh = analyze_with_store(IDEA, store)
+    assert 'store' not in fresh.summary
+    assert fake.calls - calls == len(crew_spec.current().tasks)
+
+
+@pytest.mark.parametrize('full_text', [True, False])
+def test_search_pages_newest_first(store, full_text):
+    if full_text and not store.full_text:
+        pytest.skip("SQLite built without FTS5")
+    store.full_text = full_text
+    ids = [store.save(f"Repair idea number {n}", results_for('x')) for n in range(5)]
+    store.save(OTHER, results_for(OTHER))
+
+    page, cursor = store.search("repair", limit=2)
+    assert [row['id'] for row in page] == ids[:-3:-1]
+    more, cursor = store.search("repair", limit=2, before=cursor)
+    last, cursor = store.search("repair", limit=2, before=cursor)
+    assert [row['id'] for row in more + last] == ids[2::-1]
+    assert cursor is None
+    assert len(store.search(limit=10)[0]) == 6
+    assert store.search('"100%_repair')[0] == []
+    assert store.count() == 6
@@ -0,0 +1,196 @@
+import threading
+import time
+
+import pytest
+
+from agents import Agent, is_error_result
+from fake_model import FakeModel, FakeResponse, lognormal
+from tasks import Crew, Speculation, Task
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+
+
+class Broken:
+    """Model whose every call fails with a non-retryable error."""
+
+    def generate_content(self, prompt, **kwargs):
+        raise ValueError("bad request")
+
+
+class Counting:
+    """Model whose answer says how many upstream bullets its prompt carried."""
+
+    def __init__(self):
+        self.seen = []
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        # The upstream FakeModel writes "placeholder" in every bullet
+        self.seen.append(prompt.count("placeholder"))
+        text = f"• Saw {self.seen[-1]} upstream bullets\n• Second point of the pitch\n• Third point of the pitch"
+        return iter([FakeResponse(text)]) if stream else FakeResponse(text)
+
+
+def agent(role, model=None):
+    return Agent(role, f"analyze the idea as {role}", "An analyst.", verbose=False, model=model)
+
+
+def diamond():
+    """market -> (personas, feasibility) -> pitch."""
+    market = Task("Market", agent("Market Agent"), depends_on=[])
+    personas = Task("Personas", agent("Persona Agent"), depends_on=[market])
+    feasibility = Task("Feasibility", agent("Feasibility Agent"), depends_on=[market])
+    pitch = Task("Pitch", agent("Pitch Agent"), depends_on=[personas, feasibility])
+    return [market, personas, feasibility, pitch]
+
+
+def events_of(crew, **kwargs):
+    events = []
+    lock = threading.Lock()
+
+    def callback(event):
+        with lock:
+            events.append((event.kind, event.description))
+    results = crew.kickoff(IDEA, callback=callback, **kwargs)
+    return results, events
+
+
+def test_compile_graph_orders_and_chains_tasks():
+    crew = Crew([], diamond(), verbose=0)
+    graph = crew.compile_graph()
+    assert graph['dependencies'] == {0: [], 1: [0], 2: [0], 3: [1, 2]}
+    assert graph['order'] == [0, 1, 2, 3]
+    assert graph['ancestors'][3] == {0, 1, 2}
+    assert graph['chains'] == {0: 2, 1: 1, 2: 1, 3: 0}
+    assert crew.compile_graph() is graph
+
+
+def test_implicit_dependencies_and_invalid_graphs():
+    first, second = Task("First", agent("A")), Task("Second", agent("B"))
+    assert Crew([], [first, second]).compile_graph()['dependencies'] == {0: [], 1: [0]}
+
+    a = Task("A", agent("A"), depends_on=[])
+    b = Task("B", agent("B"), depends_on=[a])
+    a.depends_on = [b]
+    with pytest.raises(ValueError, match="cycle"):
+        Crew([], [a, b]).compile_graph()
+    outsider = Task("Outsider", agent("C"), depends_on=[])
+    with pytest.raises(ValueError, match="not part of this crew"):
+        Crew([], [Task("D", agent("D"), depends_on=[outsider])]).compile_graph()
+    with pytest.raises(ValueError, match="does not depend on"):
+        Crew([], [outsider, Task("E", agent("E"), depends_on=[], context=[outsider])]).compile_graph()
+
+
+def test_downstream_includes_indirect_dependents():
+    crew = Crew([], diamond(), verbose=0)
+    assert crew.downstream({"Personas"}) == {"Personas", "Pitch"}
+    assert crew.downstream({"Market"}) == {"Market", "Personas", "Feasibility", "Pitch"}
+    assert crew.downstream(set()) == set()
+
+
+def test_tasks_start_after_their_dependencies(fake):
+    results, events = events_of(Crew([], diamond(), verbose=0, max_workers=3))
+    position = {event: n for n, event in enumerate(events)}
+    for task, upstream in (("Personas", "Market"), ("Feasibility", "Market"),
+                           ("Pitch", "Personas"), ("Pitch", "Feasibility")):
+        assert position[('completed', upstream)] < position[('started', task)]
+    assert set(results.summary['task_status'].values()) == {'done'}
+
+
+def test_independent_tasks_run_concurrently(fake):
+    tasks = [Task(f"Section {n}", agent(f"Agent {n}"), depends_on=[]) for n in range(4)]
+    Crew([], tasks, verbose=0, max_workers=3).kickoff(IDEA)
+    assert fake.max_in_flight == 3
+
+
+def test_results_keep_declaration_order_whatever_finishes_first():
+    model = FakeModel(latency=lognormal(0.02, sigma=1.0), seed=7)
+    tasks = [Task(f"Section {n}", agent(f"Agent {n}", model), depends_on=[]) for n in range(6)]
+    crew = Crew([], tasks, verbose=0, max_workers=6)
+    for _ in range(3):
+        results = crew.kickoff(IDEA)
+        assert [result.split('\n')[0] for result in results] == [f"Task {n+1}: Section {n}" for n in range(6)]
+        assert list(results.summary['task_status']) == [f"Section {n}" for n in range(6)]
+
+
+def test_failed_optional_task_does_not_block_dependents(fake):
+    market = Task("Market", agent("Market Agent"), depends_on=[])
+    trends = Task("Trends", agent("Trends Agent", Broken()), depends_on=[], optional=True)
+    pitch = Task("Pitch", agent("Pitch Agent"), depends_on=[market, trends])
+    results = Crew([], [market, trends, pitch], verbose=0).kickoff(IDEA)
+    assert is_error_result(trends.result)
+    assert not is_error_result(pitch.result)
+    assert results.summary['task_status'] == {'Market': 'done', 'Trends': 'error', 'Pitch': 'done'}
+
+
+def test_failed_results_are_not_passed_on_as_context(fake):
+    trends = Task("Trends", agent("Trends Agent", Broken()), depends_on=[], optional=True)
+    pitch = Task("Pitch", agent("Pitch Agent"), depends_on=[trends])
+    seen = []
+    run = pitch.agent.run
+    pitch.agent.run = lambda context, **kwargs: seen.append(context['previous_results']) or run(context, **kwargs)
+    Crew([], [trends, pitch], verbose=0).kickoff(IDEA)
+    assert seen == [{}]
+
+
+def test_completed_tasks_are_reused_not_rerun(fake):
+    crew = Crew([], diamond(), verbose=0)
+    first = crew.kickoff(IDEA)
+    calls = fake.calls
+    completed = {"Market": crew.tasks[0].result, "Personas": crew.tasks[1].result}
+
+    results, events = events_of(crew, completed=completed)
+    assert fake.calls == calls + 2
+    assert {description for kind, description in events if kind == 'started'} == {"Feasibility", "Pitch"}
+    assert results.summary['task_status'] == {
+        'Market': 'reused', 'Personas': 'reused', 'Feasibility': 'done', 'Pitch': 'done'}
+    assert list(results) == list(first)
+
+
+def test_completed_results_are_given_to_dependents_as_context(fake):
+    crew = Crew([], diamond(), verbose=0)
+    seen = []
+    run = crew.tasks[1].agent.run
+    crew.tasks[1].agent.run = lambda context, **kwargs: seen.append(context['previous_results']) or \
+        run(context, **kwargs)
+    crew.kickoff(IDEA, completed={"Market": "• An earlier market analysis"})
+    assert seen == [{"Task 1": "• An earlier market analysis"}]
+
+
+def test_max_workers_one_runs_tasks_one_at_a_time(fake):
+    started = time.perf_counter()
+    tasks = [Task(f"Section {n}", agent(f"Agent {n}"), depends_on=[]) for n in range(3)]
+    Crew([], tasks, verbose=0, max_workers=1).kickoff(IDEA)
+    assert fake.max_in_flight == 1
+    assert time.perf_counter() - started >= 0.03
+
+
+def speculative(min_bullets):
+    """market, streaming four bullets over 0.4s, feeding a pitch that starts on partial output."""
+    market = Task("Market", agent("Market Agent", FakeModel(latency=0.4)), depends_on=[])
+    counting = Counting()
+    pitch = Task("Pitch", agent("Pitch Agent", counting), depends_on=[market])
+    return Crew([], [market, pitch], verbose=0, speculation=Speculation(min_bullets=min_bullets)), counting
+
+
+def test_confirmed_guess_is_kept():
+    # Three of four bullets seen: only one is missing from the guess's context
+    crew, counting = speculative(min_bullets=3)
+    results = crew.kickoff(IDEA)
+    assert counting.seen == [3]
+    assert crew.tasks[1].result.startswith("• Saw 3 upstream bullets")
+    speculation = results.summary['speculation']
+    assert (speculation['accepted'], speculation['redone']) == (1, 0)
+    assert speculation['saved_seconds'] > 0
+    assert results.summary['task_status'] == {'Market': 'done', 'Pitch': 'done'}
+
+
+def test_wrong_guess_is_discarded_and_rerun():
+    # Guessing from one bullet leaves three of the four final ones unseen
+    crew, counting = speculative(min_bullets=1)
+    results = crew.kickoff(IDEA)
+    assert counting.seen == [1, 4]
+    assert crew.tasks[1].result.startswith("• Saw 4 upstream bullets")
+    assert "Saw 4 upstream bullets" in results[1]
+    speculation = results.summary['speculation']
+    assert (speculation['accepted'], speculation['redone']) == (0, 1)
+
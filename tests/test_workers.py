@@ -0,0 +1,31 @@
+import time
+
+from api import configure_process
+from workers import WorkerPool
+
+IDEA = "A marketplace that matches local repair shops with people whose appliances broke"
+
+
+def wait_for(condition, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_jobs_waiting_in_a_worker_stay_queued_until_it_starts_them():
+    # One worker process with one thread: the second job waits behind the first
+    pool = WorkerPool(processes=1, threads=1, initializer=configure_process, initargs=(True, 0.05))
+    try:
+        first = pool.submit(IDEA, client='a')
+        second = pool.submit(f"{IDEA}, for offices", client='b')
+        wait_for(lambda: first.status == 'running')
+        assert second.status == 'queued'
+        assert pool.stats()['running'] == 1
+        wait_for(lambda: second.status != 'queued')
+        assert first.done
+        assert second.wait(30)
+        assert (first.status, second.status) == ('done', 'done')
+        assert pool.stats()['running'] == 0
+    finally:
+        pool.shutdown()
@@ -0,0 +1,241 @@
+"""Multi-process worker pool for analyses.
+
+WorkerPool is a drop-in JobQueue that runs analyses in separate worker
+processes instead of threads of the serving process, so post-processing and
+parsing in one analysis never compete for the GIL with the web server or
+with other analyses. Each worker has its own model clients (clients.registry
+is per process) and runs up to `threads` analyses at a time on a thread pool.
+
+Jobs go to the worker with the fewest outstanding jobs, and count as running
+once that worker reports it has started them. Task events and results come
+back over a single multiprocessing queue that a supervisor thread in the
+parent drains into ordinary jobs.AnalysisJob objects, so callers poll and
+stream them exactly as with JobQueue. The supervisor also
+restarts workers that die and re-dispatches their jobs, passing the tasks
+that had already finished as completed; a job that takes down its worker
+MAX_ATTEMPTS times fails instead.
+
+Workers start with the 'spawn' method, so module-level state of the parent
+(fake backends, rate limits, quiet agents) does not carry over; pass an
+initializer to set it up in every worker. A rate limit configured in a
+worker applies to that worker only.
+
+Example:
+    pool = WorkerPool(processes=4, threads=4)
+    job = pool.submit("A marketplace for local repair shops")
+    job.wait()
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import deadlines
+import routing
+from jobs import JobQueue, analysis_stream
+from tasks import CrewResults, TaskEvent
+
+# Times a job may be dispatched before a crash while running it fails the job
+MAX_ATTEMPTS = 2
+# Seconds between liveness checks of the worker processes
+SUPERVISE_INTERVAL = 0.5
+# Seconds a worker gets to finish its jobs on shutdown before it is terminated
+SHUTDOWN_TIMEOUT = 10
+
+# The store a worker process opens for its own use, if any
+_store = None
+
+
+def _worker(inbox, outbox, threads, compact_context, store_path, initializer, initargs):
+    """Worker process: run analyses from inbox, report their events and results to outbox."""
+    global _store
+    if initializer is not None:
+        initializer(*initargs)
+    if store_path:
+        from store import AnalysisStore
+        _store = AnalysisStore(store_path)
+    executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='analysis')
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        executor.submit(_run_job, item, outbox, compact_context)
+    executor.shutdown(wait=True)
+
+
+def _run_job(item, outbox, compact_context):
+    job_id, attempt, idea, mode, completed, profile, deadline = item
+    # Until now the job was waiting behind others in this worker
+    outbox.put(('started', job_id, attempt))
+    try:
+        # Set around the whole drain, as in AnalysisJob.run, not inside the generator
+        with routing.use_profile(profile), deadlines.use(deadline):
+            stream = analysis_stream(idea, mode, compact_context, completed, _store)
+            while True:
+                try:
+                    event = next(stream)
+                except StopIteration as finished:
+                    results = finished.value
+                    break
+                outbox.put(('event', job_id, event.kind, event.index, event.description, event.text))
+        outbox.put(('done', job_id, list(results), getattr(results, 'summary', None)))
+    except Exception as e:
+        outbox.put(('failed', job_id, f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+    def __init__(self, index, process, inbox):
+        self.index = index
+        self.process = process
+        self.inbox = inbox
+        self.outstanding = {}  # job id -> jobs.AnalysisJob
+
+
+class WorkerPool(JobQueue):
+    """JobQueue whose analyses run in `processes` worker processes, `threads` at a time in each.
+
+    initializer(*initargs) runs in every worker before it takes jobs; it
+    must be picklable, e.g. a module-level function. Workers open the
+    SQLite store at store_path themselves (an in-memory store cannot be
+    shared between processes).
+    """
+
+    def __init__(self, processes=None, threads=4, max_queued=16, per_client=2, keep_finished=1000,
+                 compact_context=False, store_path=None, initializer=None, initargs=(), complete_pending=True):
+        self.processes = processes or os.cpu_count() or 1
+        self.threads = threads
+        self.store_path = store_path
+        self.initializer = initializer
+        self.initargs = initargs
+        self.restarts = 0
+        super().__init__(self.processes * threads, max_queued, per_client, keep_finished, compact_context,
+                         complete_pending=complete_pending)
+
+    def _start(self):
+        self._context = multiprocessing.get_context('spawn')
+        self._outbox = self._context.Queue()
+        # Stopping: workers are draining and are not restarted; closing: the supervisor exits
+        self._stopping = False
+        self._closing = False
+        self._workers = [self._spawn(index) for index in range(self.processes)]
+        self._supervisor = threading.Thread(target=self._supervise, daemon=True, name='worker-supervisor')
+        self._supervisor.start()
+
+    def _spawn(self, index):
+        inbox = self._context.Queue()
+        process = self._context.Process(
+            target=_worker,
+            args=(inbox, self._outbox, self.threads, self.compact_context, self.store_path,
+                  self.initializer, self.initargs),
+            name=f'analysis-worker-{index}',
+            daemon=True,
+        )
+        process.start()
+        return _Worker(index, process, inbox)
+
+    def _dispatch(self, job, completed):
+        job.attempts = 0
+        job.completed = dict(completed or {})
+        with self._lock:
+            self._send(job)
+
+    def _send(self, job):
+        """Hand job to the least-loaded worker; call with the lock held."""
+        worker = min(self._workers, key=lambda w: len(w.outstanding))
+        job.attempts += 1
+        worker.outstanding[job.id] = job
+        # Tasks finished by an earlier attempt are not run again
+        completed = {**job.completed, **job.finished}
+        worker.inbox.put((job.id, job.attempts, job.idea, job.mode, completed, job.profile, job.time_left()))
+
+    def _supervise(self):
+        checked = time.monotonic()
+        while not self._closing:
+            try:
+                self._handle(self._outbox.get(timeout=SUPERVISE_INTERVAL))
+            except queue.Empty:
+                pass
+            except (EOFError, OSError):
+                return  # Queue closed during shutdown
+            if time.monotonic() - checked >= SUPERVISE_INTERVAL:
+                checked = time.monotonic()
+                self._check_workers()
+
+    def _owner(self, job_id):
+        for worker in self._workers:
+            if job_id in worker.outstanding:
+                return worker
+        return None
+
+    def _handle(self, message):
+        kind, job_id = message[0], message[1]
+        with self._lock:
+            worker = self._owner(job_id)
+            job = worker.outstanding.get(job_id) if worker is not None else None
+            if job is not None and kind not in ('started', 'event'):
+                del worker.outstanding[job_id]
+        if job is None:
+            return  # Late message for a job that was already re-dispatched or finished
+        if kind == 'started':
+            # Ignore an earlier attempt's message that arrives after a restart re-queued the job
+            if message[2] == job.attempts:
+                job._begin()
+            return
+        if kind == 'event':
+            job._record(TaskEvent(*message[2:]))
+            return
+        if kind == 'done':
+            job._end(CrewResults(message[2], message[3] or {}))
+        else:
+            job._end(error=message[2])
+        self._release(job)
+
+    def _check_workers(self):
+        failed = []
+        with self._lock:
+            for i, worker in enumerate(self._workers):
+                if worker.process.is_alive() or self._stopping:
+                    continue
+                self.restarts += 1
+                print(f"Analysis worker {worker.index} exited with code {worker.process.exitcode}; restarting")
+                self._workers[i] = self._spawn(worker.index)
+                for job in worker.outstanding.values():
+                    if job.attempts >= MAX_ATTEMPTS:
+                        failed.append(job)
+                    else:
+                        job._requeue()
+                        self._send(job)
+        for job in failed:
+            job._end(error=f"Worker crashed {job.attempts} times while running this analysis")
+            self._release(job)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        with self._lock:
+            stats.update({
+                'processes': self.processes,
+                'restarts': self.restarts,
+                'queue_depths': [len(worker.outstanding) for worker in self._workers],
+            })
+        return stats
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._stopping = True
+            workers = list(self._workers)
+        for worker in workers:
+            worker.inbox.put(None)
+        if wait:
+            for worker in workers:
+                worker.process.join(SHUTDOWN_TIMEOUT)
+        for worker in workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if wait:
+            # Let the supervisor pick up results the workers sent before exiting
+            deadline = time.monotonic() + SUPERVISE_INTERVAL * 2
+            while any(w.outstanding for w in workers) and time.monotonic() < deadline:
+                time.sleep(0.05)
+        self._closing = True